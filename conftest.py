@@ -0,0 +1,19 @@
+import fakeredis
+from django.conf import settings
+
+import core.redis
+from core.celery import app as celery_app
+
+# Tasks run inline during the test session, there is no broker to talk to.
+celery_app.conf.update(task_always_eager=True, task_eager_propagates=True)
+
+# Redis is a process-local fake, shared by the whole session.
+core.redis._connection = fakeredis.FakeRedis()
+
+# The cache and the sockets of the session live in the test process.
+settings.CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+settings.CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
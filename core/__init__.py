@@ -1,5 +1,2 @@
-# This will make sure the app is always imported when
-# Django starts so that shared_task will use this app.
-from .celery import app as celery_app
-
-__all__ = ("celery_app",)
+# The Celery app is loaded by core.apps.CoreConfig when Django starts, so
+# that shared_task uses it. Importing core.settings does not pull in Celery.
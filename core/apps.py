@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class CoreConfig(AppConfig):
+    name = "core"
+
+    def ready(self):
+        # Loaded once the apps are, rather than when the core package is
+        # imported, so importing the settings stays cheap. The Celery app
+        # must exist before a shared_task is sent.
+        import cloudinary
+
+        from core.celery import app  # noqa: F401
+
+        cloudinary.config(**settings.CLOUDINARY)
@@ -9,8 +9,26 @@ https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 
 import os
 
+from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.security.websocket import AllowedHostsOriginValidator
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 
-application = get_asgi_application()
+# Initialize Django before importing anything that touches the models.
+django_asgi_application = get_asgi_application()
+
+from core.sentry import init_sentry  # noqa: E402
+from user.middleware import JWTAuthMiddleware  # noqa: E402
+from user.routing import websocket_urlpatterns  # noqa: E402
+
+init_sentry()
+
+application = ProtocolTypeRouter(
+    {
+        "http": django_asgi_application,
+        "websocket": AllowedHostsOriginValidator(
+            JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+        ),
+    }
+)
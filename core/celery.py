@@ -1,12 +1,28 @@
 import os
+import shutil
 import ssl
+import sys
+import tempfile
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 
+if "worker" in sys.argv[1:]:
+    # Tasks run in the children of the worker, each writes its metrics to
+    # this directory and the worker serves them merged, see
+    # serve_worker_metrics. Like gunicorn-cfg.py, it must be set before
+    # Django starts and imports prometheus_client; the web workers use their
+    # own directory.
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = os.environ.get(
+        "CELERY_METRICS_DIR", os.path.join(tempfile.gettempdir(), "prometheus-celery")
+    )
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+
 app = Celery("core")
 if os.getenv("ENVIRONMENT") == "staging":
     app = Celery(
@@ -23,3 +39,47 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
+
+
+@app.on_after_configure.connect
+def schedule_birthdays(sender, **kwargs):
+    # Set here rather than in CELERY_BEAT_SCHEDULE: importing crontab with the
+    # settings would slow every start. The quarter hours are the buckets of
+    # user.birthdays.
+    sender.add_periodic_task(
+        crontab(minute="*/15"),
+        sender.signature("user.tasks.birthdays_task"),
+        name="birthdays",
+    )
+
+
+@worker_process_init.connect
+def start_sentry(**kwargs):
+    from core.sentry import init_sentry
+
+    init_sentry()
+
+
+def serve_worker_metrics(port):
+    """Serve the metrics of every child of the worker, for Prometheus."""
+    from prometheus_client import start_http_server
+
+    from core.metrics import metrics_registry
+
+    return start_http_server(port, registry=metrics_registry())
+
+
+@worker_init.connect
+def start_metrics_exporter(**kwargs):
+    from django.conf import settings
+
+    if settings.CELERY_METRICS_PORT:
+        serve_worker_metrics(settings.CELERY_METRICS_PORT)
+
+
+@worker_process_shutdown.connect
+def forget_child_metrics(pid=None, **kwargs):
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -1,6 +1,9 @@
+from .cache import *
 from .celery import *
 from .cloudinary import *
 from .database import *
 from .email import *
+from .media import *
+from .metrics import *
 from .sentry import *
 from .videosdk import *
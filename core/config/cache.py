@@ -0,0 +1,25 @@
+import os
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("REDIS_CACHE", "redis://redis:6379/1"),
+    }
+}
+
+# Profiles are served from the cache for PROFILE_CACHE_TIMEOUT seconds, then
+# kept for PROFILE_CACHE_GRACE more seconds so one request can refresh them
+# while the others keep getting the stale copy.
+PROFILE_CACHE_TIMEOUT = int(os.environ.get("PROFILE_CACHE_TIMEOUT", 300))
+PROFILE_CACHE_GRACE = int(os.environ.get("PROFILE_CACHE_GRACE", 60))
+
+# Redis for data structures that do not fit the cache API (sets, counters,
+# queues, locks). Web and Celery processes coordinate through it.
+REDIS_URL = os.environ.get("REDIS_URL", "redis://redis:6379/0")
+FOLLOW_CACHE_TIMEOUT = int(os.environ.get("FOLLOW_CACHE_TIMEOUT", 86400))
+
+# StatelessJWTAuthentication keeps the auth state of a user in-process for
+# STATELESS_AUTH_LOCAL_TTL seconds and in the cache for STATELESS_AUTH_TTL.
+# Deactivations and revocations take at most the local TTL to be seen.
+STATELESS_AUTH_LOCAL_TTL = int(os.environ.get("STATELESS_AUTH_LOCAL_TTL", 5))
+STATELESS_AUTH_TTL = int(os.environ.get("STATELESS_AUTH_TTL", 300))
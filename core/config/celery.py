@@ -14,3 +14,21 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+# A socket is considered gone when no heartbeat arrived for PRESENCE_TTL
+# seconds. Presence changes are written to User.online every
+# PRESENCE_FLUSH_INTERVAL seconds.
+PRESENCE_TTL = int(os.environ.get("PRESENCE_TTL", 60))
+PRESENCE_FLUSH_INTERVAL = int(os.environ.get("PRESENCE_FLUSH_INTERVAL", 15))
+LAST_LOGIN_FLUSH_INTERVAL = int(os.environ.get("LAST_LOGIN_FLUSH_INTERVAL", 30))
+
+CELERY_BEAT_SCHEDULE = {
+    "flush-presence": {
+        "task": "user.tasks.flush_presence_task",
+        "schedule": PRESENCE_FLUSH_INTERVAL,
+    },
+    "flush-last-logins": {
+        "task": "user.tasks.flush_last_logins_task",
+        "schedule": LAST_LOGIN_FLUSH_INTERVAL,
+    },
+}
@@ -9,6 +9,35 @@ DB_USER = os.environ.get("DB_USER", None)
 DB_PASSWORD = os.environ.get("DB_PASSWORD", None)
 DB_HOST = os.environ.get("DB_HOST", None)
 DB_PORT = os.environ.get("DB_PORT", None)
+DB_SSLMODE = os.environ.get(
+    "DB_SSLMODE",
+    None if os.getenv("ENVIRONMENT", "development") == "development" else "require",
+)
+
+# Seconds a connection is kept open across requests, checked before it is
+# reused. A WSGI thread serves many requests and keeps its connection, but
+# the ASGI handler runs every request in a new thread whose connection is
+# never reused, so it closes them unless DB_CONN_MAX_AGE says otherwise.
+DB_CONN_MAX_AGE = int(
+    os.environ.get(
+        "DB_CONN_MAX_AGE", 60 if os.environ.get("SERVER_INTERFACE") == "wsgi" else 0
+    )
+)
+DB_CONN_HEALTH_CHECKS = os.environ.get("DB_CONN_HEALTH_CHECKS", "1") == "1"
+# Connections per process of the postgres pool, 0 to connect per request.
+# Meant for the ASGI deployment, see core.db.pool.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 0))
+DB_POOL = {
+    "MAX_SIZE": DB_POOL_SIZE,
+    # Seconds a request waits for a free connection before failing.
+    "TIMEOUT": float(os.environ.get("DB_POOL_TIMEOUT", 5)),
+    # Seconds after which an idle connection is closed, or any connection
+    # once returned.
+    "MAX_IDLE": float(os.environ.get("DB_POOL_MAX_IDLE", 300)),
+    "MAX_LIFETIME": float(os.environ.get("DB_POOL_MAX_LIFETIME", 3600)),
+    # Connections idle longer than this are pinged before they are handed out.
+    "CHECK_AFTER": float(os.environ.get("DB_POOL_CHECK_AFTER", 30)),
+}
 
 if DB_ENGINE is None or DB_ENGINE == "sqlite3":
     DATABASES = {
@@ -26,7 +55,48 @@ else:
             "PASSWORD": DB_PASSWORD,
             "HOST": DB_HOST,
             "PORT": DB_PORT,
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": DB_CONN_HEALTH_CHECKS,
         },
     }
-    if os.getenv("ENVIRONMENT", "development") != "development":
-        DATABASES["default"]["OPTIONS"] = {"sslmode": "require"}
+    if DB_SSLMODE:
+        DATABASES["default"]["OPTIONS"] = {"sslmode": DB_SSLMODE}
+    if DB_POOL_SIZE and DB_ENGINE == "postgresql":
+        # Closing a pooled connection returns it to the pool, so Django closes
+        # it at the end of every request.
+        DATABASES["default"].update(
+            {
+                "ENGINE": "core.db.backends.postgresql",
+                "CONN_MAX_AGE": 0,
+                "POOL": DB_POOL,
+            }
+        )
+
+# Read replicas of the default database, comma separated: host[:port] on
+# postgres, file names on sqlite. Reads of safe requests go to them, see
+# core.db.router.
+DB_REPLICAS = [
+    replica.strip() for replica in os.environ.get("DB_REPLICAS", "").split(",") if replica
+]
+DATABASE_REPLICAS = []
+for number, replica in enumerate(DB_REPLICAS, 1):
+    alias = "replica{0}".format(number)
+    DATABASES[alias] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    if DATABASES[alias]["ENGINE"] == "django.db.backends.sqlite3":
+        DATABASES[alias]["NAME"] = replica
+    else:
+        host, _, port = replica.partition(":")
+        DATABASES[alias].update({"HOST": host, "PORT": port or DB_PORT})
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["core.db.router.ReplicaRouter"]
+# Replicas lagging more than REPLICA_MAX_LAG seconds are not read, the lag
+# is measured every REPLICA_LAG_CHECK_INTERVAL seconds in each process.
+REPLICA_MAX_LAG = float(os.environ.get("REPLICA_MAX_LAG", 5))
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get("REPLICA_LAG_CHECK_INTERVAL", 5))
+# Seconds a user reads the primary after writing. Longer than REPLICA_MAX_LAG,
+# no replica they would read can miss their changes.
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 10))
+
+# Latency budget of the user search query in milliseconds, enforced with
+# statement_timeout on postgres.
+USER_SEARCH_TIMEOUT = int(os.environ.get("USER_SEARCH_TIMEOUT", 200))
@@ -1,8 +1,24 @@
 import os
 
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+EMAIL_BACKEND = os.environ.get(
+    "EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend"
+)
 EMAIL_HOST = os.environ.get("EMAIL_HOST", None)
 EMAIL_PORT = os.environ.get("EMAIL_PORT", None)
 EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", None)
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", None)
 EMAIL_USE_TLS = os.environ.get("EMAIL_USE_TLS", None)
+EMAIL_TIMEOUT = int(os.environ.get("EMAIL_TIMEOUT", 10))
+
+# Queued emails are sent together EMAIL_BATCH_WINDOW seconds after the first
+# one arrived, at most EMAIL_BATCH_SIZE per SMTP connection. A failed email is
+# retried after EMAIL_RETRY_BACKOFF seconds, doubling each time, at most
+# EMAIL_MAX_RETRIES times.
+EMAIL_BATCH_WINDOW = float(os.environ.get("EMAIL_BATCH_WINDOW", 2))
+EMAIL_BATCH_SIZE = int(os.environ.get("EMAIL_BATCH_SIZE", 100))
+EMAIL_RETRY_BACKOFF = int(os.environ.get("EMAIL_RETRY_BACKOFF", 30))
+EMAIL_MAX_RETRIES = int(os.environ.get("EMAIL_MAX_RETRIES", 5))
+EMAIL_OUTCOME_TTL = int(os.environ.get("EMAIL_OUTCOME_TTL", 86400))
+# Seconds one dispatcher may take to send a batch. A batch still unsent after
+# that is taken over by the next dispatch.
+EMAIL_DISPATCH_LEASE = int(os.environ.get("EMAIL_DISPATCH_LEASE", 600))
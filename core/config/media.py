@@ -0,0 +1,49 @@
+import os
+
+MEDIA_URL = "/media/"
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", "media")
+
+# Raw uploads wait here until the media worker has pushed them to Cloudinary.
+# Celery workers must see the same directory as the web processes.
+MEDIA_STAGING_ROOT = os.environ.get(
+    "MEDIA_STAGING_ROOT", os.path.join(MEDIA_ROOT, "staging")
+)
+# "user.media.LocalBackend" keeps uploads under MEDIA_ROOT instead of Cloudinary.
+MEDIA_UPLOAD_BACKEND = os.environ.get(
+    "MEDIA_UPLOAD_BACKEND", "user.media.CloudinaryBackend"
+)
+
+# Before the media worker sends an upload on, it is decoded, turned upright,
+# stripped of its metadata and brought down to fit these sizes, the largest
+# variant of each field.
+MEDIA_MAX_DIMENSIONS = {"avatar": (1024, 1024), "cover": (1920, 1920)}
+# Larger images are refused from their header, before they are decoded. It
+# leaves room for the 108 megapixel sensors of phones.
+MEDIA_MAX_PIXELS = int(os.environ.get("MEDIA_MAX_PIXELS", 120_000_000))
+MEDIA_NORMALIZE_QUALITY = int(os.environ.get("MEDIA_NORMALIZE_QUALITY", 85))
+# Seconds the media worker may spend on one upload, decoding included. Past
+# it the upload is given up and its worker process freed.
+MEDIA_UPLOAD_TIME_LIMIT = int(os.environ.get("MEDIA_UPLOAD_TIME_LIMIT", 60))
+
+# Sizes every avatar and cover is derived in when it is uploaded, each in
+# every format of MEDIA_VARIANT_FORMATS. The profile lists them as srcsets.
+MEDIA_VARIANTS = {
+    "avatar": {
+        "thumb": {"width": 64, "height": 64, "crop": "thumb", "gravity": "face"},
+        "medium": {"width": 256, "height": 256, "crop": "thumb", "gravity": "face"},
+        "full": {"width": 1024, "height": 1024, "crop": "limit"},
+    },
+    "cover": {
+        "thumb": {"width": 480, "height": 160, "crop": "fill"},
+        "medium": {"width": 1080, "height": 360, "crop": "fill"},
+        "full": {"width": 1920, "crop": "limit"},
+    },
+}
+MEDIA_VARIANT_FORMATS = ["avif", "webp", "jpg"]
+
+# Formats a direct upload may have, enforced by the upload backend.
+MEDIA_UPLOAD_FORMATS = ["jpg", "jpeg", "png", "gif", "webp", "avif", "heic"]
+# Where Cloudinary posts the result of a direct upload, so the asset is
+# attached even when the client never confirms it. Unset, only the confirm
+# call attaches uploads.
+MEDIA_UPLOAD_CALLBACK_URL = os.environ.get("MEDIA_UPLOAD_CALLBACK_URL", "")
@@ -0,0 +1,12 @@
+import os
+
+# /metrics answers only requests with "Authorization: Bearer <METRICS_TOKEN>"
+# when it is set, and no request at all without it unless DEBUG is on.
+# Under gunicorn, PROMETHEUS_MULTIPROC_DIR (set by
+# gunicorn-cfg.py) makes every worker write its samples there and /metrics
+# aggregates them.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", None)
+
+# Celery workers serve the metrics of their tasks (media uploads among them)
+# on this port, merged from CELERY_METRICS_DIR. 0 turns it off.
+CELERY_METRICS_PORT = int(os.environ.get("CELERY_METRICS_PORT", 9540))
@@ -1,21 +1,38 @@
 import os
 
-import sentry_sdk
-from sentry_sdk import capture_message
-from sentry_sdk.integrations.django import DjangoIntegration
+# Sentry is initialized by core.sentry.init_sentry when a server or worker
+# starts, importing the settings has no side effect.
+SENTRY_DSN = os.environ.get("SENTRY_DNS")
+SENTRY_SEND_DEFAULT_PII = True
 
-sentry_sdk.init(
-    dsn=os.environ.get("SENTRY_DNS"),
-    integrations=[
-        DjangoIntegration(),
-    ],
-    # Set traces_sample_rate to 1.0 to capture 100%
-    # of transactions for performance monitoring.
-    # We recommend adjusting this value in production.
-    traces_sample_rate=1.0,
-    # If you wish to associate users to errors (assuming you are using
-    # django.contrib.auth) you may enable sending PII data.
-    send_default_pii=True,
+# Share of healthy transactions kept, per URL name. Server errors and
+# requests slower than SENTRY_SLOW_TRANSACTION seconds are always kept,
+# client errors at least at SENTRY_TRACES_CLIENT_ERROR_RATE.
+# SENTRY_TRACES_ROUTE_RATES overrides the rates per route, e.g.
+# "user:profile=0.05,health_check=0".
+SENTRY_TRACES_SAMPLE_RATE = float(os.environ.get("SENTRY_TRACES_SAMPLE_RATE", 0.1))
+SENTRY_TRACES_ROUTE_RATES = {
+    "health_check": 0.0,
+    "ready": 0.0,
+    "metrics": 0.0,
+    "user:profile": 0.01,
+    "user:people_profile": 0.01,
+    "user:online_status": 0.01,
+    "user:relationships": 0.01,
+}
+SENTRY_TRACES_ROUTE_RATES.update(
+    (route.strip(), float(rate))
+    for route, _, rate in (
+        item.rpartition("=")
+        for item in os.environ.get("SENTRY_TRACES_ROUTE_RATES", "").split(",")
+        if item
+    )
 )
-
-capture_message("Sentry is configured correctly", level="info")
+# Share of the transactions recorded when they start, at least the route
+# rate. Errors and slow requests are only kept among the recorded ones, so
+# lowering it below 1.0 trades some of them for less tracing overhead.
+SENTRY_TRACES_UPGRADE_RATE = float(os.environ.get("SENTRY_TRACES_UPGRADE_RATE", 1.0))
+SENTRY_TRACES_CLIENT_ERROR_RATE = float(
+    os.environ.get("SENTRY_TRACES_CLIENT_ERROR_RATE", 0.25)
+)
+SENTRY_SLOW_TRANSACTION = float(os.environ.get("SENTRY_SLOW_TRANSACTION", 1.0))
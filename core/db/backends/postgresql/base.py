@@ -0,0 +1,19 @@
+from django.db.backends.postgresql import base
+
+from core.db.pool import PooledDatabaseWrapper
+
+
+class DatabaseWrapper(PooledDatabaseWrapper, base.DatabaseWrapper):
+    """PostgreSQL with pooled connections."""
+
+    def reusable(self, connection):
+        if connection.closed:
+            return False
+        # Whatever the last request left open is rolled back, the next one
+        # starts from a clean session. Idle is 0 in psycopg2 and psycopg 3.
+        if connection.info.transaction_status != 0:
+            try:
+                connection.rollback()
+            except base.Database.Error:
+                return False
+        return True
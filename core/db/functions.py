@@ -0,0 +1,57 @@
+from django.db.models import Func, IntegerField
+
+# (part, factor) of the packed MMDDHHMI value.
+PARTS = (("month", 1000000), ("day", 10000), ("hour", 100), ("minute", 1))
+
+
+class UTCMonthDayTime(Func):
+    """
+    Month, day, hour and minute of a datetime in UTC, packed as the integer
+    MMDDHHMI: 2051730 for February 5th at 17:30. It ignores the year, so a
+    range of it finds anniversaries, and can be indexed: on postgres the
+    datetime is converted with AT TIME ZONE 'UTC' first, since EXTRACT from
+    a timestamptz depends on the session time zone and is not immutable.
+    """
+
+    arity = 1
+    output_field = IntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        return self.pack(
+            [
+                connection.ops.datetime_extract_sql(part, sql, params, "UTC")
+                for part, _ in PARTS
+            ]
+        )
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # The constants are written in the SQL rather than passed as
+        # parameters, or the query would not match the indexed expression.
+        sql, params = compiler.compile(self.source_expressions[0])
+        return self.pack(
+            [
+                (
+                    "django_datetime_extract('{0}', {1}, 'UTC', '{2}')".format(
+                        part, sql, connection.timezone_name
+                    ),
+                    params,
+                )
+                for part, _ in PARTS
+            ]
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        sql = "({0} AT TIME ZONE 'UTC')".format(sql)
+        sql, params = self.pack(
+            [connection.ops.date_extract_sql(part, sql, params) for part, _ in PARTS]
+        )
+        return "({0})::integer".format(sql), params
+
+    def pack(self, extracts):
+        sql = " + ".join(
+            "{0} * {1}".format(part_sql, factor)
+            for (part_sql, _), (_, factor) in zip(extracts, PARTS)
+        )
+        return "({0})".format(sql), [param for _, params in extracts for param in params]
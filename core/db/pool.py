@@ -0,0 +1,288 @@
+"""
+A bounded pool of database connections per process and database alias.
+
+Django opens a connection per thread. Under ASGI every request runs its ORM
+calls in a new thread, so persistent connections are never reused and each
+request pays for a new connection. The pool keeps connections across those
+threads instead: the backend borrows one when Django connects and hands it
+back when Django closes it.
+"""
+
+import collections
+import os
+import threading
+import time
+from functools import partial
+
+from django.db.utils import OperationalError
+from prometheus_client import Counter, Gauge, Histogram
+
+POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Pooled database connections by state.",
+    ["alias", "state"],
+    multiprocess_mode="livesum",
+)
+POOL_WAITS = Counter(
+    "db_pool_waits_total", "Checkouts that waited for a free connection.", ["alias"]
+)
+POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total", "Checkouts that gave up waiting.", ["alias"]
+)
+POOL_WAIT_TIME = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a free connection.",
+    ["alias"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+POOL_OPENED = Counter(
+    "db_pool_connections_opened_total", "Connections opened by the pool.", ["alias"]
+)
+POOL_CLOSED = Counter(
+    "db_pool_connections_closed_total",
+    "Connections closed by the pool, by reason.",
+    ["alias", "reason"],
+)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, options):
+    """The pool of the alias in this process, created on first use."""
+    try:
+        return _pools[alias]
+    except KeyError:
+        with _pools_lock:
+            if alias not in _pools:
+                _pools[alias] = ConnectionPool(
+                    alias,
+                    max_size=options.get("MAX_SIZE", 10),
+                    timeout=options.get("TIMEOUT", 5),
+                    max_idle=options.get("MAX_IDLE", 300),
+                    max_lifetime=options.get("MAX_LIFETIME", 3600),
+                    check_after=options.get("CHECK_AFTER", 30),
+                )
+            return _pools[alias]
+
+
+def close_pools():
+    for pool in list(_pools.values()):
+        pool.close_all()
+
+
+class PooledDatabaseWrapper:
+    """
+    Mixin for a database backend borrowing its connections from the pool of
+    the process, configured by the POOL entry of the database settings.
+    Closing the connection hands it back.
+    """
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get("POOL", {}))
+
+    def get_new_connection(self, conn_params):
+        return self.pool.acquire(partial(super().get_new_connection, conn_params))
+
+    def _close(self):
+        if self.connection is not None:
+            self.pool.release(self.connection, self.reusable(self.connection))
+
+    def reusable(self, connection):
+        """
+        Whether the connection can serve the next request, reset if need be.
+        Backends knowing their driver can tell without a round trip.
+        """
+        return ping(connection)
+
+
+def ping(connection):
+    # Plain DB-API cursors are not all context managers.
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        finally:
+            cursor.close()
+    except Exception:
+        return False
+    return True
+
+
+class ConnectionPool:
+    """
+    At most max_size DB-API connections, opened with the connect callable
+    given to acquire(). Connections live max_lifetime seconds and are closed
+    after max_idle seconds unused. Those idle longer than check_after are
+    pinged before they are handed out, so a restarted database costs a
+    reconnect rather than an error.
+    """
+
+    def __init__(
+        self,
+        alias,
+        max_size=10,
+        timeout=5,
+        max_idle=300,
+        max_lifetime=3600,
+        check_after=30,
+    ):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.condition = threading.Condition()
+        # (connection, opened at, released at), the most recently used last.
+        self.idle = collections.deque()
+        # id(connection) -> opened at.
+        self.in_use = {}
+        self.size = 0
+        self.waits = self.timeouts = self.opened = self.closed = 0
+
+    def check_fork(self):
+        # A forked worker must not share the sockets of its parent. They are
+        # dropped without closing, which would end the parent's sessions.
+        if self.pid != os.getpid():
+            self.reset()
+            self.report()
+
+    def acquire(self, connect):
+        self.check_fork()
+        deadline = time.monotonic() + self.timeout
+        while True:
+            entry = self.checkout(deadline)
+            if entry is None:
+                return self.open(connect)
+            connection, opened, released = entry
+            reason = self.stale(connection, opened, released)
+            if reason is None:
+                self.report()
+                return connection
+            self.discard(connection, reason)
+
+    def checkout(self, deadline):
+        """
+        An idle connection with when it was opened and released, or None
+        once a slot for a new connection is reserved.
+        """
+        with self.condition:
+            if not self.idle and self.size >= self.max_size:
+                self.wait(deadline)
+            if self.idle:
+                connection, opened, released = entry = self.idle.pop()
+                self.in_use[id(connection)] = opened
+                return entry
+            self.size += 1
+            return None
+
+    def wait(self, deadline):
+        start = time.monotonic()
+        self.waits += 1
+        POOL_WAITS.labels(self.alias).inc()
+        while not self.idle and self.size >= self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.timeouts += 1
+                POOL_TIMEOUTS.labels(self.alias).inc()
+                raise OperationalError(
+                    "No database connection free in the {0!r} pool after {1}s.".format(
+                        self.alias, self.timeout
+                    )
+                )
+            self.condition.wait(remaining)
+        POOL_WAIT_TIME.labels(self.alias).observe(time.monotonic() - start)
+
+    def stale(self, connection, opened, released):
+        now = time.monotonic()
+        if now - opened > self.max_lifetime:
+            return "lifetime"
+        if now - released > self.max_idle:
+            return "idle"
+        if now - released > self.check_after and not ping(connection):
+            return "broken"
+        return None
+
+    def open(self, connect):
+        try:
+            connection = connect()
+        except BaseException:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.in_use[id(connection)] = time.monotonic()
+            self.opened += 1
+        POOL_OPENED.labels(self.alias).inc()
+        self.report()
+        return connection
+
+    def release(self, connection, reusable=True):
+        """Give a connection back, closing it unless it is reusable."""
+        self.check_fork()
+        with self.condition:
+            opened = self.in_use.get(id(connection))
+        if opened is None:
+            # Borrowed before a fork, or never from this pool.
+            close(connection)
+            return
+        if not reusable:
+            self.discard(connection, "unusable")
+            return
+        with self.condition:
+            del self.in_use[id(connection)]
+            self.idle.append((connection, opened, time.monotonic()))
+            self.condition.notify()
+        self.report()
+
+    def discard(self, connection, reason):
+        close(connection)
+        with self.condition:
+            self.in_use.pop(id(connection), None)
+            self.size -= 1
+            self.closed += 1
+            self.condition.notify()
+        POOL_CLOSED.labels(self.alias, reason).inc()
+        self.report()
+
+    def close_all(self):
+        with self.condition:
+            idle, self.idle = self.idle, collections.deque()
+            self.size -= len(idle)
+            self.closed += len(idle)
+            self.condition.notify_all()
+        for connection, _, _ in idle:
+            close(connection)
+        self.report()
+
+    def stats(self):
+        with self.condition:
+            return {
+                "size": self.size,
+                "idle": len(self.idle),
+                "in_use": len(self.in_use),
+                "max_size": self.max_size,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "opened": self.opened,
+                "closed": self.closed,
+            }
+
+    def report(self):
+        stats = self.stats()
+        for state in ("idle", "in_use"):
+            POOL_CONNECTIONS.labels(self.alias, state).set(stats[state])
+
+
+def close(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
@@ -0,0 +1,172 @@
+"""
+Read replicas of the default database.
+
+Only the reads of GET, HEAD and OPTIONS requests go to a replica, everything
+else reads the primary: unsafe requests, Celery tasks, management commands
+and the rest of a request once it wrote. A user who wrote keeps reading the
+primary for REPLICA_STICKY_SECONDS, so they see their own changes whatever
+the replication lag. Replicas lagging more than REPLICA_MAX_LAG seconds are
+left out until they catch up.
+"""
+
+import contextvars
+import math
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from prometheus_client import Counter, Gauge
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# Seconds since the last replayed transaction, 0 when the replica has replayed
+# everything it received.
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds",
+    "Replication lag of a read replica, +Inf when it cannot be measured.",
+    ["alias"],
+    multiprocess_mode="max",
+)
+READS = Counter("db_routed_reads_total", "Reads routed by database.", ["alias"])
+
+
+class ReadState:
+    """Where the reads of the current request go."""
+
+    def __init__(self, primary):
+        self.primary = primary
+        self.wrote = False
+        self.user_id = None
+        self.checked_user = False
+
+
+# The state of the request being answered. Like the query totals of
+# core.metrics, the object is shared with the threads sync_to_async runs ORM
+# calls in.
+_state = contextvars.ContextVar("read_state", default=None)
+# alias -> (monotonic time of the check, lag in seconds)
+_lags = {}
+
+
+def pin_key(user_id):
+    return "primary_reads:{0}".format(user_id)
+
+
+def bind_user(user_id):
+    """Tie the current request to a user, whose writes pin their reads."""
+    state = _state.get()
+    if state is not None:
+        state.user_id = user_id
+
+
+def measure_lag(connection):
+    if connection.vendor != "postgresql":
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(POSTGRES_LAG_SQL)
+        return float(cursor.fetchone()[0] or 0)
+
+
+def replica_lag(alias):
+    """The lag of a replica, measured at most every REPLICA_LAG_CHECK_INTERVAL."""
+    now = time.monotonic()
+    checked = _lags.get(alias)
+    if checked is not None and now - checked[0] < settings.REPLICA_LAG_CHECK_INTERVAL:
+        return checked[1]
+    try:
+        lag = measure_lag(connections[alias])
+    except DatabaseError:
+        lag = math.inf
+    _lags[alias] = (now, lag)
+    REPLICA_LAG.labels(alias).set(lag)
+    return lag
+
+
+def healthy_replicas():
+    return [
+        alias
+        for alias in settings.DATABASE_REPLICAS
+        if replica_lag(alias) <= settings.REPLICA_MAX_LAG
+    ]
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.primary or not settings.DATABASE_REPLICAS:
+            return DEFAULT_DB_ALIAS
+        if state.user_id is not None and not state.checked_user:
+            state.checked_user = True
+            state.primary = bool(cache.get(pin_key(state.user_id)))
+            if state.primary:
+                return DEFAULT_DB_ALIAS
+        replicas = healthy_replicas()
+        alias = random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+        READS.labels(alias).inc()
+        return alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = state.primary = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Let the reads of safe requests go to the replicas, and pin the reads of
+    a user who wrote to the primary for the next requests.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = ReadState(request.method not in SAFE_METHODS)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if self.should_pin(state):
+            cache.set(pin_key(state.user_id), True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        state = ReadState(request.method not in SAFE_METHODS)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        if self.should_pin(state):
+            await cache.aset(
+                pin_key(state.user_id), True, settings.REPLICA_STICKY_SECONDS
+            )
+        return response
+
+    def should_pin(self, state):
+        return state.wrote and state.user_id is not None and settings.DATABASE_REPLICAS
@@ -1,7 +1,11 @@
+from core.config.cache import *
 from core.config.celery import *
 from core.config.cloudinary import *
 from core.config.database import *
 from core.config.email import *
+from core.config.media import *
+from core.config.metrics import *
+from core.config.sentry import *
 from core.config.videosdk import *
 
 CSRF_TRUSTED_ORIGINS = [
@@ -0,0 +1,28 @@
+import socket
+from functools import cached_property
+
+
+class InternalIPs:
+    """
+    INTERNAL_IPS for the debug toolbar: the addresses in ``ips`` plus the
+    gateway of every network this host is on, which is where requests come
+    from when the server runs in a container. The hostname is only resolved
+    on the first lookup, not when the settings are imported.
+    """
+
+    def __init__(self, ips=()):
+        self.ips = list(ips)
+
+    @cached_property
+    def gateways(self):
+        try:
+            _, _, addresses = socket.gethostbyname_ex(socket.gethostname())
+        except OSError:
+            return []
+        return [address[: address.rfind(".")] + ".1" for address in addresses]
+
+    def __contains__(self, ip):
+        return ip in self.ips or ip in self.gateways
+
+    def __iter__(self):
+        return iter(self.gateways + self.ips)
@@ -0,0 +1,147 @@
+import contextvars
+import hmac
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+SIZE_BUCKETS = (100, 500, 1000, 5000, 10000, 50000, 100000, 500000, 1000000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+UNMATCHED = "<unmatched>"
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent answering a request.",
+    ["method", "route"],
+)
+RESPONSES = Counter(
+    "http_responses_total", "Responses by status code.", ["method", "route", "status"]
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Size of the response body.",
+    ["route"],
+    buckets=SIZE_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL queries run while answering a request.",
+    ["route"],
+    buckets=QUERY_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in SQL while answering a request.",
+    ["route"],
+)
+
+# [queries, seconds] of the request being answered. The list is shared with
+# the threads sync_to_async runs ORM calls in, since they copy the context.
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    totals = _request_queries.get()
+    if totals is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        totals[0] += 1
+        totals[1] += time.perf_counter() - start
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder, dispatch_uid="core.metrics")
+for connection in connections.all(initialized_only=True):
+    install_query_recorder(None, connection)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, SQL queries and time, response size and status of every
+    request, labelled by URL route so the series stay bounded.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        totals, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self.observe(request, response, totals, start)
+        return response
+
+    async def __acall__(self, request):
+        totals, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self.observe(request, response, totals, start)
+        return response
+
+    def start(self):
+        totals = [0, 0.0]
+        return totals, _request_queries.set(totals), time.perf_counter()
+
+    def observe(self, request, response, totals, start):
+        match = request.resolver_match
+        route = match.route if match is not None else UNMATCHED
+        REQUEST_LATENCY.labels(request.method, route).observe(time.perf_counter() - start)
+        RESPONSES.labels(request.method, route, response.status_code).inc()
+        REQUEST_QUERIES.labels(route).observe(totals[0])
+        REQUEST_DB_TIME.labels(route).observe(totals[1])
+        if not response.streaming:
+            RESPONSE_SIZE.labels(route).observe(len(response.content))
+
+
+def metrics_registry():
+    """Merge the samples of every worker in multiprocess mode."""
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif not hmac.compare_digest(
+        request.headers.get("Authorization", ""), "Bearer {0}".format(token)
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        generate_latest(metrics_registry()), content_type=CONTENT_TYPE_LATEST
+    )
@@ -0,0 +1,155 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def invert(field):
+    return field[1:] if field.startswith("-") else "-" + field
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique ``ordering``, ``(created, id)`` newest
+    first unless a subclass says otherwise. The opaque cursor holds the
+    ordering values of the row the page starts after, so every page is one
+    range scan on the matching index however deep it is. DRF's
+    CursorPagination only keys on the first field and falls back to an
+    offset for ties.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    ordering = ("-created", "-id")
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        position, reverse = self.decode_cursor(request)
+        if position is not None:
+            position = self.parse_position(queryset, position)
+        ordering = (
+            [invert(field) for field in self.ordering] if reverse else self.ordering
+        )
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+
+        page = list(queryset[: self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[: self.page_size]
+        if reverse:
+            page.reverse()
+
+        # Going forward there is a previous page when we started from a
+        # cursor, going back there is a next page: the one we came from.
+        self.next_position = self.previous_position = None
+        if page and (has_more if not reverse else True):
+            self.next_position = self.position(page[-1])
+        if page and (position is not None if not reverse else has_more):
+            self.previous_position = self.position(page[0])
+        return page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, settings.MAX_PAGE_SIZE))
+
+    def after(self, ordering, position):
+        """Rows that sort after ``position``, as an OR of ANDed prefixes."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{"{0}__{1}".format(name, lookup): value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def position(self, row):
+        values = [getattr(row, field.lstrip("-")) for field in self.ordering]
+        return [
+            value.isoformat() if hasattr(value, "isoformat") else value
+            for value in values
+        ]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position, reverse = cursor["p"], bool(cursor.get("r"))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def parse_position(self, queryset, position):
+        """
+        The cursor values converted by their ordering fields, so a forged
+        cursor is a 404 rather than an error of the database.
+        """
+        query = queryset.query.clone()
+        try:
+            return [
+                query.resolve_ref(field.lstrip("-")).output_field.to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position, reverse=False):
+        cursor = {"p": position}
+        if reverse:
+            cursor["r"] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,15 @@
+import redis
+from django.conf import settings
+
+_connection = None
+
+
+def get_redis():
+    """
+    Client for data that needs Redis types rather than the cache API. Every
+    web and Celery process must share it, so it is always a real server.
+    """
+    global _connection
+    if _connection is None:
+        _connection = redis.Redis.from_url(settings.REDIS_URL)
+    return _connection
@@ -0,0 +1,108 @@
+import datetime
+import decimal
+import uuid
+
+import msgpack
+import orjson
+from cloudinary import CloudinaryResource
+from django.db.models.query import QuerySet
+from django.http import HttpResponse
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def encode_default(obj):
+    """
+    Types neither encoder handles natively, converted like DRF's
+    JSONEncoder does so the payloads do not change.
+    """
+    if isinstance(obj, CloudinaryResource):
+        # Same value as CloudinaryField.value_to_string in serializers.
+        return obj.get_prep_value()
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, QuerySet):
+        return tuple(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "__iter__"):
+        return tuple(obj)
+    raise TypeError("Type is not serializable: {0}".format(type(obj).__name__))
+
+
+def msgpack_default(obj):
+    """orjson writes these natively, msgpack needs the same strings."""
+    if isinstance(obj, datetime.datetime):
+        representation = obj.isoformat()
+        if representation.endswith("+00:00"):
+            representation = representation[:-6] + "Z"
+        return representation
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    return encode_default(obj)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """JSON renderer backed by orjson, a drop-in for DRF's JSONRenderer."""
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        option = ORJSON_OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=encode_default, option=option)
+
+    def get_indent(self, accepted_media_type, renderer_context):
+        if accepted_media_type and "indent" in accepted_media_type:
+            return True
+        return bool(renderer_context.get("indent"))
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Compact binary payloads for clients that send Accept: application/msgpack."""
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=msgpack_default, use_bin_type=True)
+
+
+def render_response(request, data, status=200, headers=None):
+    """
+    Response of a plain Django view, negotiated like the DRF views:
+    MessagePack when the client asks for it, orjson otherwise.
+    """
+    renderer = ORJSONRenderer()
+    for accepted in request.accepted_types:
+        if accepted.match(ORJSONRenderer.media_type):
+            break
+        if accepted.match(MessagePackRenderer.media_type):
+            renderer = MessagePackRenderer()
+            break
+    return HttpResponse(
+        renderer.render(data),
+        content_type=renderer.media_type,
+        status=status,
+        headers=headers,
+    )
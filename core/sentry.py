@@ -0,0 +1,116 @@
+import random
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+_initialized = False
+
+
+def init_sentry():
+    """
+    Start the Sentry SDK once per process, a no-op without a DSN. Called by
+    the WSGI and ASGI entry points and by Celery workers, never on import.
+    """
+    global _initialized
+    dsn = getattr(settings, "SENTRY_DSN", None)
+    if _initialized or not dsn:
+        return
+    _initialized = True
+
+    import sentry_sdk
+    from sentry_sdk.integrations.celery import CeleryIntegration
+    from sentry_sdk.integrations.django import DjangoIntegration
+
+    sentry_sdk.init(
+        dsn=dsn,
+        integrations=[DjangoIntegration(), CeleryIntegration()],
+        # traces_sampler decides which transactions are recorded from their
+        # route, before_send_transaction which of those are sent once the
+        # status and duration are known.
+        traces_sampler=traces_sampler,
+        before_send_transaction=before_send_transaction,
+        send_default_pii=settings.SENTRY_SEND_DEFAULT_PII,
+    )
+
+
+def traces_sampler(sampling_context):
+    parent_sampled = sampling_context.get("parent_sampled")
+    if parent_sampled is not None:
+        return parent_sampled
+    return record_rate(route_name(request_path(sampling_context)))
+
+
+def request_path(sampling_context):
+    """Path of the request a transaction starts for, None for tasks."""
+    environ = sampling_context.get("wsgi_environ")
+    if environ:
+        return environ.get("PATH_INFO")
+    scope = sampling_context.get("asgi_scope")
+    if scope:
+        return scope.get("path")
+    return None
+
+
+def route_name(url):
+    if not url:
+        return None
+    try:
+        return resolve(urlsplit(url).path).view_name
+    except Resolver404:
+        return None
+
+
+def route_rate(route):
+    """Share of the healthy transactions of a route that are sent."""
+    return settings.SENTRY_TRACES_ROUTE_RATES.get(
+        route, settings.SENTRY_TRACES_SAMPLE_RATE
+    )
+
+
+def record_rate(route):
+    """
+    Share of the transactions of a route that are recorded, errors and slow
+    requests can only be kept out of those. All of them by default, routes
+    at 0.0 included; before_send_transaction thins out the healthy ones.
+    """
+    return max(route_rate(route), settings.SENTRY_TRACES_UPGRADE_RATE)
+
+
+def duration(event):
+    start, end = event.get("start_timestamp"), event.get("timestamp")
+    if start is None or end is None:
+        return 0.0
+    if isinstance(start, str):
+        start, end = datetime.fromisoformat(start), datetime.fromisoformat(end)
+    return (end - start).total_seconds()
+
+
+def sample_rate(event):
+    """Chance of sending a finished transaction, capped by its record_rate."""
+    status = event.get("tags", {}).get("http.status_code")
+    status = int(status) if status else None
+    trace_status = event.get("contexts", {}).get("trace", {}).get("status")
+    if (status is not None and status >= 500) or (
+        status is None and trace_status not in (None, "ok")
+    ):
+        return 1.0
+    if duration(event) >= settings.SENTRY_SLOW_TRANSACTION:
+        return 1.0
+
+    rate = route_rate(route_name(event.get("request", {}).get("url")))
+    if status is not None and status >= 400:
+        rate = max(rate, settings.SENTRY_TRACES_CLIENT_ERROR_RATE)
+    return rate
+
+
+def before_send_transaction(event, hint):
+    """
+    Keep a recorded transaction so it is sent at its sample_rate overall:
+    it was already recorded at the record_rate of its route.
+    """
+    recorded = record_rate(route_name(event.get("request", {}).get("url")))
+    if not recorded or random.random() < sample_rate(event) / recorded:
+        return event
+    return None
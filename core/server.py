@@ -0,0 +1,80 @@
+"""
+Sizing of the production server, read by gunicorn-cfg.py. The limits of
+the container win over what the host reports.
+"""
+
+import math
+import os
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+# Worker class and application per server interface.
+WORKER_CLASSES = {
+    "asgi": "uvicorn.workers.UvicornWorker",
+    "wsgi": "gthread",
+}
+APPLICATIONS = {
+    "asgi": "core.asgi:application",
+    "wsgi": "core.wsgi:application",
+}
+# cgroup v1 reports an unlimited memory limit as a page-aligned huge number.
+UNLIMITED_MEMORY = 2**60
+
+
+def read_first_line(path):
+    try:
+        with open(path) as file:
+            return file.readline().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit(root=CGROUP_ROOT):
+    """CPUs allowed by the CFS quota of the container, None when unlimited."""
+    quota = read_first_line(os.path.join(root, "cpu.max"))
+    if quota is not None:
+        quota, _, period = quota.partition(" ")
+    else:
+        quota = read_first_line(os.path.join(root, "cpu", "cpu.cfs_quota_us"))
+        period = read_first_line(os.path.join(root, "cpu", "cpu.cfs_period_us"))
+    try:
+        quota, period = int(quota), int(period)
+    except (TypeError, ValueError):
+        return None
+    if quota <= 0 or period <= 0:
+        return None
+    return quota / period
+
+
+def available_cpus(root=CGROUP_ROOT):
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit(root)
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, cpus)
+
+
+def available_memory(root=CGROUP_ROOT):
+    """Bytes of memory the container may use, None when unknown."""
+    for path in ("memory.max", os.path.join("memory", "memory.limit_in_bytes")):
+        limit = read_first_line(os.path.join(root, path))
+        if limit is not None and limit.isdigit() and int(limit) < UNLIMITED_MEMORY:
+            return int(limit)
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def worker_count(interface, cpus, memory=None, worker_memory=256 * 2**20):
+    """
+    An event loop per CPU for ASGI. For threaded WSGI workers, gunicorn's
+    2 x CPUs + 1, which keeps the CPUs busy while some workers wait on I/O.
+    Either way no more workers than fit in memory.
+    """
+    workers = cpus if interface == "asgi" else 2 * cpus + 1
+    if memory is not None:
+        workers = min(workers, memory // worker_memory)
+    return max(1, workers)
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 import os
 import random
 import string
+import sys
 from datetime import timedelta
 from pathlib import Path
 
@@ -48,12 +49,10 @@ CORS_ALLOW_HEADERS = [
     "x-csrftoken",
     "x-requested-with",
 ]
-os.environ["DJANGO_ALLOW_ASYNC_UNSAFE"] = "true"
 
 # Application definition
 
 INSTALLED_APPS = [
-    "daphne",
     "admin_tabler.apps.AdminTablerConfig",
     "django.contrib.admin",
     "django.contrib.auth",
@@ -68,11 +67,18 @@ INSTALLED_APPS = [
     "rest_framework_simplejwt",
     "cloudinary",
     "channels",
+    "core",
     "home",
     "user",
 ]
+# Daphne only replaces runserver with an ASGI server, and importing it loads
+# Twisted: a third of the start-up time of every other command and worker.
+if sys.argv[1:2] == ["runserver"]:
+    INSTALLED_APPS.insert(0, "daphne")
 
 MIDDLEWARE = [
+    "core.metrics.MetricsMiddleware",
+    "core.db.router.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -128,6 +134,12 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashes are checked in a pool of this many threads, so the async
+# login views never run PBKDF2 on the event loop.
+PASSWORD_HASHING_WORKERS = int(
+    os.environ.get("PASSWORD_HASHING_WORKERS", min(4, os.cpu_count() or 1))
+)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
@@ -163,14 +175,32 @@ REST_FRAMEWORK = {
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
+    # orjson for JSON, MessagePack when the client asks for it in Accept or
+    # Content-Type.
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.ORJSONRenderer",
+        "core.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.parsers.ORJSONParser",
+        "core.parsers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    # Lists are paged by cursor on (created, id), see core.pagination.
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.KeysetPagination",
+    "PAGE_SIZE": 20,
 }
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 100))
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": False,
-    "UPDATE_LAST_LOGIN": True,
+    # last_login is recorded in Redis and written in batches, see user.logins.
+    "UPDATE_LAST_LOGIN": False,
     "ALGORITHM": "HS256",
     "VERIFYING_KEY": "",
     "AUDIENCE": None,
@@ -213,12 +243,7 @@ SIMPLE_JWT = {
 }
 
 if DEBUG:
+    from core.hosts import InternalIPs
+
     INSTALLED_APPS.append("debug_toolbar")
-    import socket  # only if you haven't already imported this
-
-    hostname, _, ips = socket.gethostbyname_ex(socket.gethostname())
-    INTERNAL_IPS = [ip[: ip.rfind(".")] + ".1" for ip in ips] + [
-        "127.0.0.1",
-        "localhost",
-        "10.0.2.2",
-    ]
+    INTERNAL_IPS = InternalIPs(["127.0.0.1", "localhost", "10.0.2.2"])
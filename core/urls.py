@@ -22,6 +22,8 @@ from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
+from core.metrics import metrics_view
+
 schema_view = get_schema_view(
     openapi.Info(
         title="Social Web API",
@@ -47,6 +49,7 @@ urlpatterns = [
     path("admin", admin.site.urls),
     path("", include("admin_tabler.urls")),
     path("user", include("user.urls")),
+    path("metrics", metrics_view, name="metrics"),
 ]
 
 if settings.DEBUG:
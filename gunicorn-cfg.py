@@ -3,9 +3,137 @@
 Copyright (c) 2019 - present AppSeed.us
 """
 
-bind = "0.0.0.0:5005"
-workers = 1
+import glob
+import os
+import shutil
+import tempfile
+
+from core.server import (
+    APPLICATIONS,
+    WORKER_CLASSES,
+    available_cpus,
+    available_memory,
+    worker_count,
+)
+
+# SERVER_INTERFACE=asgi runs core.asgi in uvicorn workers, websockets
+# included. SERVER_INTERFACE=wsgi runs core.wsgi in threaded workers.
+interface = os.environ.get("SERVER_INTERFACE", "asgi")
+wsgi_app = APPLICATIONS[interface]
+worker_class = WORKER_CLASSES[interface]
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:{0}".format(os.environ.get("PORT", 8000)))
+# WEB_CONCURRENCY overrides the size picked from the CPUs and memory of the
+# container, WORKER_MEMORY_MB is the budget of one worker.
+workers = int(
+    os.environ.get("WEB_CONCURRENCY")
+    or worker_count(
+        interface,
+        available_cpus(),
+        available_memory(),
+        int(os.environ.get("WORKER_MEMORY_MB", 256)) * 2**20,
+    )
+)
+threads = int(os.environ.get("GUNICORN_THREADS", 4 if interface == "wsgi" else 1))
+
+# The app is imported once in the master, workers share its memory through
+# copy-on-write and boot without importing Django again.
+preload_app = True
+# Recycle workers after a number of requests to bound leaks, with jitter so
+# they do not all restart at once.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(
+    os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", max(1, max_requests // 10))
+)
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
 accesslog = "-"
-loglevel = "debug"
-capture_output = True
-enable_stdio_inheritance = True
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+# Exists while at least one worker is serving, for exec readiness probes.
+# GET /ready also checks the database and Redis. Each booted worker leaves a
+# marker next to it, the file goes with the last marker.
+ready_file = os.environ.get(
+    "SERVER_READY_FILE", os.path.join(tempfile.gettempdir(), "gunicorn.ready")
+)
+
+# Workers write their metrics to this directory and /metrics merges them, see
+# core.metrics. It is set before any worker imports prometheus_client.
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "prometheus")
+)
+
+
+def on_starting(server):
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    for marker in live_workers():
+        remove_file(marker)
+    remove_file(ready_file)
+
+
+def when_ready(server):
+    # Nothing the preloaded app opened in the master may be shared by the
+    # forked workers.
+    from django.db import connections
+
+    import core.redis
+    from core.db.pool import close_pools
+
+    connections.close_all()
+    close_pools()
+    core.redis._connection = None
+
+
+def post_worker_init(worker):
+    # The marker first: the master only removes the ready file when it
+    # finds no marker.
+    touch(worker_marker(worker.pid))
+    touch(ready_file)
+
+
+def worker_exit(server, worker):
+    remove_file(worker_marker(worker.pid))
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+    # Also run for workers that crashed, worker_exit only for clean exits.
+    remove_file(worker_marker(worker.pid))
+    if not live_workers():
+        remove_file(ready_file)
+        # A worker may have booted while the file was removed.
+        if live_workers():
+            touch(ready_file)
+
+
+def on_exit(server):
+    for marker in live_workers():
+        remove_file(marker)
+    remove_file(ready_file)
+
+
+def worker_marker(pid):
+    return "{0}.{1}".format(ready_file, pid)
+
+
+def live_workers():
+    return glob.glob(glob.escape(ready_file) + ".*")
+
+
+def touch(path):
+    with open(path, "w"):
+        pass
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
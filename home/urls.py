@@ -5,4 +5,5 @@ from . import views
 urlpatterns = [
     path("", views.index, name="index"),
     path("health-check", views.health_check, name="health_check"),
+    path("ready", views.ready, name="ready"),
 ]
@@ -1,9 +1,13 @@
-from django.http import HttpResponse
+from django.db import DatabaseError, connection
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
+from redis.exceptions import RedisError
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+from core.redis import get_redis
+
 # Create your views here.
 
 
@@ -15,3 +19,19 @@ def index(request):
 @api_view(("GET",))
 def health_check(request):
     return Response("ok", status=status.HTTP_200_OK)
+
+
+def ready(request):
+    """
+    Readiness probe: 503 until the database and Redis answer, so the load
+    balancer only routes to workers that can serve.
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        get_redis().ping()
+    except (DatabaseError, RedisError):
+        return JsonResponse(
+            {"status": "unavailable"}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    return JsonResponse({"status": "ready"})
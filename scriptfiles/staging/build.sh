@@ -6,5 +6,5 @@ set -o pipefail
 # exits if any of your variables is not set
 set -o nounset
 python manage.py collectstatic --no-input
-python manage.py runserver 0.0.0.0:8000
-exec "$@"
+# Sized from the CPUs and memory of the container, see gunicorn-cfg.py.
+exec gunicorn -c gunicorn-cfg.py
@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from core.db.router import bind_user
+from user.cache import auth_state_key
+from user.models import User
+
+AUTH_STATE_FIELDS = ["id", "email", "is_active", "is_staff", "token_version"]
+LOCAL_STATE_SIZE = 10000
+
+_local_states = OrderedDict()
+# Request threads share the states, reordering and eviction must not
+# interleave.
+_local_states_lock = threading.Lock()
+
+
+class ClaimsUser:
+    """
+    User built from the access token and the cached auth state. Reading an
+    attribute that is not part of that state loads the full model once.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, state):
+        self.state = state
+        self.id = self.pk = state["id"]
+        self.email = state["email"]
+        self.is_active = state["is_active"]
+        self.is_staff = state["is_staff"]
+
+    @cached_property
+    def instance(self):
+        return User.objects.get(pk=self.pk)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.instance, name)
+
+    def __str__(self):
+        return self.email
+
+
+def full_user(user):
+    return user.instance if isinstance(user, ClaimsUser) else user
+
+
+def local_auth_state(user_id, now):
+    with _local_states_lock:
+        local = _local_states.get(user_id)
+    if local is not None and local[0] > now:
+        return local[1]
+    return None
+
+
+def remember_auth_state(user_id, state, now):
+    with _local_states_lock:
+        _local_states[user_id] = (now + settings.STATELESS_AUTH_LOCAL_TTL, state)
+        _local_states.move_to_end(user_id)
+        while len(_local_states) > LOCAL_STATE_SIZE:
+            _local_states.popitem(last=False)
+
+
+def get_auth_state(user_id):
+    """
+    Return the auth fields of the user, from this process, then the cache,
+    then the database.
+    """
+    now = time.monotonic()
+    state = local_auth_state(user_id, now)
+    if state is not None:
+        return state
+
+    state = cache.get(auth_state_key(user_id))
+    if state is None:
+        state = User.objects.filter(pk=user_id).values(*AUTH_STATE_FIELDS).first()
+        if state is None:
+            return None
+        cache.set(auth_state_key(user_id), state, settings.STATELESS_AUTH_TTL)
+
+    remember_auth_state(user_id, state, now)
+    return state
+
+
+async def aget_auth_state(user_id):
+    """Async ``get_auth_state``."""
+    now = time.monotonic()
+    state = local_auth_state(user_id, now)
+    if state is not None:
+        return state
+
+    state = await cache.aget(auth_state_key(user_id))
+    if state is None:
+        state = await User.objects.filter(pk=user_id).values(*AUTH_STATE_FIELDS).afirst()
+        if state is None:
+            return None
+        await cache.aset(auth_state_key(user_id), state, settings.STATELESS_AUTH_TTL)
+
+    remember_auth_state(user_id, state, now)
+    return state
+
+
+def check_auth_state(validated_token, state):
+    if state is None:
+        raise AuthenticationFailed(_("User not found"), code="user_not_found")
+    if not state["is_active"]:
+        raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+    if validated_token.get("ver", 0) != state["token_version"]:
+        raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that does not load the User row. ``request.user`` is
+    a ClaimsUser, views that need the model call ``full_user``.
+    """
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        # Before the state is read, a user who just wrote reads the primary.
+        bind_user(user_id)
+        state = get_auth_state(user_id)
+        check_auth_state(validated_token, state)
+        return ClaimsUser(state)
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        bind_user(user_id)
+        state = await aget_auth_state(user_id)
+        check_auth_state(validated_token, state)
+        return ClaimsUser(state)
+
+
+async def aauthenticate(request):
+    """
+    Authenticate the bearer token of a plain async view. Returns None when
+    the request carries no valid token. A hit on the in-process auth state
+    never leaves the event loop.
+    """
+    authentication = StatelessJWTAuthentication()
+    header = authentication.get_header(request)
+    try:
+        raw_token = None if header is None else authentication.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = authentication.get_validated_token(raw_token)
+        return await authentication.aget_user(validated_token)
+    except exceptions.AuthenticationFailed:
+        return None
@@ -0,0 +1,168 @@
+import asyncio
+import statistics
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+import core.redis
+from core.celery import app as celery_app
+
+
+@contextmanager
+def test_database():
+    """
+    Run a benchmark against a throwaway test database, so it never touches
+    the configured one. It is created on the configured engine: sqlite by
+    default, which needs no running server; on postgres or mysql the user
+    must be allowed to create databases. DEBUG is off, as in production.
+    """
+    setup_test_environment(debug=False)
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def offline():
+    """
+    Keep a benchmark off the network: uploads go to a temporary directory
+    instead of Cloudinary, emails to the locmem outbox, Celery tasks run
+    inline and Redis is a process-local fake.
+    """
+    try:
+        import fakeredis
+    except ImportError:
+        raise CommandError(
+            "The benchmarks need fakeredis, which requirements.txt leaves out: "
+            "pip install fakeredis"
+        )
+
+    with ExitStack() as stack:
+        media_root = stack.enter_context(tempfile.TemporaryDirectory())
+        stack.enter_context(
+            override_settings(
+                MEDIA_ROOT=media_root,
+                MEDIA_STAGING_ROOT=media_root + "/staging",
+                MEDIA_UPLOAD_BACKEND="user.media.LocalBackend",
+                EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+                CACHES={
+                    "default": {
+                        "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+                    }
+                },
+                CHANNEL_LAYERS={
+                    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+                },
+            )
+        )
+        eager = {
+            "task_always_eager": celery_app.conf.task_always_eager,
+            "task_eager_propagates": celery_app.conf.task_eager_propagates,
+        }
+        celery_app.conf.update(task_always_eager=True, task_eager_propagates=True)
+        stack.callback(celery_app.conf.update, **eager)
+        redis = core.redis._connection
+        core.redis._connection = fakeredis.FakeRedis()
+        stack.callback(setattr, core.redis, "_connection", redis)
+        yield
+
+
+class Timer:
+    """Collects the latency of each call, in milliseconds."""
+
+    def __init__(self):
+        self.samples = []
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.append((time.perf_counter() - start) * 1000)
+
+    def percentile(self, percent):
+        if len(self.samples) < 2:
+            return self.samples[0] if self.samples else 0.0
+        return statistics.quantiles(self.samples, n=100, method="inclusive")[percent - 1]
+
+
+class EndpointStats(Timer):
+    """Latency, queries and response size of the requests to one endpoint."""
+
+    def __init__(self):
+        super().__init__()
+        self.queries = []
+        self.sizes = []
+
+    @contextmanager
+    def measure(self):
+        with CaptureQueriesContext(connection) as queries, self.time():
+            yield self
+        self.queries.append(len(queries))
+
+    def record_response(self, response):
+        self.sizes.append(len(response.content))
+
+    def summary(self):
+        return {
+            "requests": len(self.samples),
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "queries": round(statistics.mean(self.queries), 2),
+            "bytes": round(statistics.mean(self.sizes)),
+        }
+
+
+async def asgi_request(app, method, path, headers=()):
+    """
+    Send one request straight to an ASGI application, without the test
+    client: the handler runs each request in its own thread-sensitive
+    context, as it does behind a server. Returns the status and the body.
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    received = False
+    response = {"status": None, "body": b""}
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # The client stays connected until the response is sent.
+        await asyncio.Future()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response["status"], response["body"]
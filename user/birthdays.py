@@ -0,0 +1,172 @@
+"""
+Birthday greetings.
+
+A birthday is entered as midnight where the user lives and stored in UTC,
+so the UTC month, day, hour and minute of ``User.birthday`` say when it
+starts for them: 2001-02-04 17:00 UTC is the 5th of February in UTC+7.
+Every BUCKET_MINUTES the job takes the users whose birthday started in the
+last bucket through ``user_birthday_idx``, emails them and notifies their
+followers, in chunks spread over Celery tasks.
+"""
+
+import calendar
+import uuid
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from core.db.functions import UTCMonthDayTime
+from core.redis import get_redis
+from user.mail import queue_emails
+from user.models import Follow, User
+from user.notifications import notify_user
+
+BUCKET_MINUTES = 15
+BUCKET = timedelta(minutes=BUCKET_MINUTES)
+CHUNK_SIZE = 500
+FOLLOWER_CHUNK_SIZE = 1000
+# Buckets missed while beat was down are caught up, a day back at most.
+MAX_CATCH_UP = timedelta(days=1)
+LAST_BUCKET_KEY = "birthdays:last"
+LOCK_KEY = "birthdays:lock"
+LOCK_TIMEOUT = 300
+# Set by the run that greets a bucket. A run whose lock expired, or whose
+# marker is behind, skips the buckets another run already claimed.
+CLAIM_KEY = "birthdays:bucket:{0}"
+CLAIM_TIMEOUT = int((MAX_CATCH_UP + timedelta(days=1)).total_seconds())
+
+
+def bucket_start(moment):
+    moment = moment.astimezone(dt_timezone.utc)
+    return moment.replace(
+        minute=moment.minute - moment.minute % BUCKET_MINUTES, second=0, microsecond=0
+    )
+
+
+def month_day_time(moment):
+    """The value ``UTCMonthDayTime`` has for a UTC datetime."""
+    return moment.month * 1000000 + moment.day * 10000 + moment.hour * 100 + moment.minute
+
+
+def birthdays_in(bucket):
+    """
+    Active users whose birthday starts in the bucket. On the 28th of February
+    of a common year, those born on the 29th celebrate too.
+    """
+    start = month_day_time(bucket)
+    starts = [start]
+    if (bucket.month, bucket.day) == (2, 28) and not calendar.isleap(bucket.year):
+        starts.append(start + 10000)
+    condition = Q()
+    for start in starts:
+        condition |= Q(birthday_at__gte=start, birthday_at__lt=start + BUCKET_MINUTES)
+    return User.objects.alias(birthday_at=UTCMonthDayTime("birthday")).filter(
+        condition, is_active=True
+    )
+
+
+def due_buckets(now):
+    """The buckets from the one after the last done up to the current one."""
+    current = bucket_start(now)
+    last = get_redis().get(LAST_BUCKET_KEY)
+    if last is None:
+        return [current]
+    bucket = max(datetime.fromisoformat(last.decode()) + BUCKET, current - MAX_CATCH_UP)
+    buckets = []
+    while bucket <= current:
+        buckets.append(bucket)
+        bucket += BUCKET
+    return buckets
+
+
+def claim(bucket):
+    """True for the one run that gets to greet the bucket."""
+    return bool(
+        get_redis().set(
+            CLAIM_KEY.format(bucket.isoformat()), 1, nx=True, ex=CLAIM_TIMEOUT
+        )
+    )
+
+
+def send_birthdays(now=None):
+    """Start the greetings of every due bucket, returns how many users."""
+    redis = get_redis()
+    token = uuid.uuid4().hex
+    if not redis.set(LOCK_KEY, token, nx=True, ex=LOCK_TIMEOUT):
+        return 0
+    try:
+        total = 0
+        for bucket in due_buckets(now or timezone.now()):
+            if claim(bucket):
+                total += fan_out(bucket)
+            redis.set(LAST_BUCKET_KEY, bucket.isoformat())
+    finally:
+        if redis.get(LOCK_KEY) == token.encode():
+            redis.delete(LOCK_KEY)
+    return total
+
+
+def fan_out(bucket):
+    from user.tasks import greet_birthdays_task
+
+    ids = list(birthdays_in(bucket).order_by("id").values_list("id", flat=True))
+    for start in range(0, len(ids), CHUNK_SIZE):
+        end = start + CHUNK_SIZE
+        greet_birthdays_task.delay(ids[start:end])
+    return len(ids)
+
+
+def greet_birthdays(user_ids):
+    """Email each user, then notify their followers in tasks of their own."""
+    from user.tasks import notify_birthday_followers_task
+
+    users = list(
+        User.objects.filter(pk__in=user_ids, is_active=True).only(
+            "id", "email", "first_name", "last_name", "followers_count"
+        )
+    )
+    queue_emails(
+        [
+            (
+                "Happy birthday!",
+                render_to_string(
+                    "email_birthday.html",
+                    {"user": user, "domain": settings.FRONT_END_HOST},
+                ),
+                [user.email],
+            )
+            for user in users
+        ]
+    )
+    for user in users:
+        if user.followers_count:
+            notify_birthday_followers_task.delay(
+                user.pk,
+                {
+                    "id": user.pk,
+                    "first_name": user.first_name,
+                    "last_name": user.last_name,
+                },
+            )
+    return len(users)
+
+
+def notify_followers(user_id, payload, after=None):
+    """
+    Notify one page of followers, oldest first, keyset paged on (created, id)
+    like the follower list. Returns the last edge when there may be more.
+    """
+    edges = Follow.objects.filter(followee_id=user_id).order_by("created", "id")
+    if after is not None:
+        created, edge_id = datetime.fromisoformat(after[0]), after[1]
+        edges = edges.filter(Q(created__gt=created) | Q(created=created, id__gt=edge_id))
+    page = list(edges.values_list("created", "id", "follower_id")[:FOLLOWER_CHUNK_SIZE])
+    for _, _, follower_id in page:
+        notify_user(follower_id, "birthday", payload)
+    if len(page) < FOLLOWER_CHUNK_SIZE:
+        return None
+    return [page[-1][0].isoformat(), page[-1][1]]
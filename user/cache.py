@@ -0,0 +1,208 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from prometheus_client import Counter
+
+PROFILE_CACHE_REQUESTS = Counter(
+    "user_profile_cache_requests_total",
+    "Profile cache lookups by result.",
+    ["result"],
+)
+LOCK_TIMEOUT = 10
+# How long a caller waits for the profile another one is rendering before
+# rendering it too, polling the cache every POLL_INTERVAL seconds.
+LOCK_WAIT = 2
+POLL_INTERVAL = 0.05
+
+
+def version_key(user_id):
+    return "profile:{0}:version".format(user_id)
+
+
+def profile_key(user_id):
+    return "profile:{0}".format(user_id)
+
+
+def lock_key(user_id):
+    return "profile:{0}:lock".format(user_id)
+
+
+def is_fresh(entry, version):
+    return entry is not None and version is not None and entry["version"] == version
+
+
+def profile_entry(version, data):
+    return {
+        "version": version,
+        "expires": time.time() + settings.PROFILE_CACHE_TIMEOUT,
+        "data": data,
+    }
+
+
+def cached_entry(found, user_id):
+    """The version and entry of ``user_id`` out of a ``get_many`` result."""
+    return found.get(version_key(user_id)), found.get(profile_key(user_id))
+
+
+def rendered_meanwhile(found, user_id):
+    """
+    Whether the caller holding the lock is done, and the profile it cached
+    if any.
+    """
+    version, entry = cached_entry(found, user_id)
+    if is_fresh(entry, version):
+        return True, entry["data"]
+    return lock_key(user_id) not in found, None
+
+
+def wait_for_profile(user_id):
+    """
+    Poll for the profile another caller is rendering. ``None`` when it gave
+    up without caching one or ``LOCK_WAIT`` ran out.
+    """
+    keys = [version_key(user_id), profile_key(user_id), lock_key(user_id)]
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        done, data = rendered_meanwhile(cache.get_many(keys), user_id)
+        if done:
+            return data
+    return None
+
+
+async def await_profile(user_id):
+    """Async ``wait_for_profile``."""
+    keys = [version_key(user_id), profile_key(user_id), lock_key(user_id)]
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL)
+        done, data = rendered_meanwhile(await cache.aget_many(keys), user_id)
+        if done:
+            return data
+    return None
+
+
+def get_profile(user_id, render):
+    """
+    Return the rendered profile of ``user_id``, calling ``render`` on a miss.
+
+    Entries are tagged with the profile version they were rendered from, so
+    a render racing with ``invalidate_profile`` can never be served. A single
+    caller renders a missing profile while the others wait for it, for up to
+    ``LOCK_WAIT`` seconds. Once an entry is past its timeout, a single caller
+    refreshes it while everybody else keeps the stale copy until the grace
+    period runs out.
+    """
+    version, entry = cached_entry(
+        cache.get_many([version_key(user_id), profile_key(user_id)]), user_id
+    )
+    fresh = is_fresh(entry, version)
+    if fresh and entry["expires"] > time.time():
+        PROFILE_CACHE_REQUESTS.labels("hit").inc()
+        return entry["data"]
+
+    locked = cache.add(lock_key(user_id), 1, LOCK_TIMEOUT)
+    if not locked:
+        if fresh:
+            PROFILE_CACHE_REQUESTS.labels("stale").inc()
+            return entry["data"]
+        data = wait_for_profile(user_id)
+        if data is not None:
+            PROFILE_CACHE_REQUESTS.labels("waited").inc()
+            return data
+
+    PROFILE_CACHE_REQUESTS.labels("miss").inc()
+    if version is None:
+        cache.add(version_key(user_id), 1, None)
+        version = cache.get(version_key(user_id), 1)
+    try:
+        data = dict(render())
+        cache.set(
+            profile_key(user_id),
+            profile_entry(version, data),
+            settings.PROFILE_CACHE_TIMEOUT + settings.PROFILE_CACHE_GRACE,
+        )
+    finally:
+        if locked:
+            cache.delete(lock_key(user_id))
+    return data
+
+
+async def aget_profile(user_id, render):
+    """Async ``get_profile``, ``render`` is a coroutine function."""
+    version, entry = cached_entry(
+        await cache.aget_many([version_key(user_id), profile_key(user_id)]), user_id
+    )
+    fresh = is_fresh(entry, version)
+    if fresh and entry["expires"] > time.time():
+        PROFILE_CACHE_REQUESTS.labels("hit").inc()
+        return entry["data"]
+
+    locked = await cache.aadd(lock_key(user_id), 1, LOCK_TIMEOUT)
+    if not locked:
+        if fresh:
+            PROFILE_CACHE_REQUESTS.labels("stale").inc()
+            return entry["data"]
+        data = await await_profile(user_id)
+        if data is not None:
+            PROFILE_CACHE_REQUESTS.labels("waited").inc()
+            return data
+
+    PROFILE_CACHE_REQUESTS.labels("miss").inc()
+    if version is None:
+        await cache.aadd(version_key(user_id), 1, None)
+        version = await cache.aget(version_key(user_id), 1)
+    try:
+        data = dict(await render())
+        await cache.aset(
+            profile_key(user_id),
+            profile_entry(version, data),
+            settings.PROFILE_CACHE_TIMEOUT + settings.PROFILE_CACHE_GRACE,
+        )
+    finally:
+        if locked:
+            await cache.adelete(lock_key(user_id))
+    return data
+
+
+def bump_version(user_id):
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        cache.set(version_key(user_id), 1, None)
+        cache.delete(profile_key(user_id))
+
+
+async def abump_version(user_id):
+    try:
+        await cache.aincr(version_key(user_id))
+    except ValueError:
+        await cache.aset(version_key(user_id), 1, None)
+        await cache.adelete(profile_key(user_id))
+
+
+def invalidate_profile(*user_ids):
+    """Drop the cached profiles once the current transaction has committed."""
+    for user_id in user_ids:
+        transaction.on_commit(lambda user_id=user_id: bump_version(user_id))
+
+
+async def ainvalidate_profile(*user_ids):
+    """
+    Drop the cached profiles from an async view. Those run in autocommit, so
+    the write has already committed.
+    """
+    for user_id in user_ids:
+        await abump_version(user_id)
+
+
+def auth_state_key(user_id):
+    return "auth:{0}".format(user_id)
+
+
+def forget_auth_state(user_id):
+    """Drop the cached auth state of the user once the transaction commits."""
+    transaction.on_commit(lambda: cache.delete(auth_state_key(user_id)))
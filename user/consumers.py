@@ -0,0 +1,37 @@
+from asgiref.sync import sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from user import presence
+from user.notifications import user_group
+
+
+class PresenceConsumer(AsyncJsonWebsocketConsumer):
+    """
+    One socket per open client. It keeps the user's presence alive through
+    heartbeats and relays the events sent with ``notify_user``.
+    """
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        self.user_id = user.pk
+        await self.channel_layer.group_add(user_group(self.user_id), self.channel_name)
+        await sync_to_async(presence.connect)(self.user_id, self.channel_name)
+        await self.accept()
+
+    async def receive_json(self, content, **kwargs):
+        if content.get("type") == "heartbeat":
+            await sync_to_async(presence.heartbeat)(self.user_id, self.channel_name)
+
+    async def disconnect(self, code):
+        if not hasattr(self, "user_id"):
+            return
+        await self.channel_layer.group_discard(
+            user_group(self.user_id), self.channel_name
+        )
+        await sync_to_async(presence.disconnect)(self.user_id, self.channel_name)
+
+    async def user_event(self, event):
+        await self.send_json({"event": event["event"], "data": event["data"]})
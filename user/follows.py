@@ -0,0 +1,189 @@
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from redis.exceptions import WatchError
+
+from core.redis import get_redis
+from user.cache import invalidate_profile
+from user.models import Follow, User
+
+# Every complete set holds this member. A set without it was created by a
+# write racing with its expiry and is treated as cold.
+SENTINEL = 0
+CHUNK_SIZE = 1000
+# Times a rebuild starts over when follows change while it reads them.
+REBUILD_ATTEMPTS = 3
+
+
+def following_key(user_id):
+    return "follows:{0}:following".format(user_id)
+
+
+def followers_key(user_id):
+    return "follows:{0}:followers".format(user_id)
+
+
+def warming_key(user_id):
+    return "follows:{0}:warming".format(user_id)
+
+
+def changes_key(user_id):
+    """Counter bumped by every edge cached for the user."""
+    return "follows:{0}:changes".format(user_id)
+
+
+def follow(user, target):
+    """
+    Make ``user`` follow ``target``. The edge and both counters change in one
+    transaction. Returns False when the edge already existed.
+    """
+    with transaction.atomic():
+        _, created = Follow.objects.get_or_create(
+            follower_id=user.pk, followee_id=target.pk
+        )
+        if created:
+            User.objects.filter(pk=user.pk).update(
+                following_count=F("following_count") + 1
+            )
+            User.objects.filter(pk=target.pk).update(
+                followers_count=F("followers_count") + 1
+            )
+            invalidate_profile(user.pk, target.pk)
+            transaction.on_commit(lambda: cache_edge(user.pk, target.pk, True))
+    return created
+
+
+def unfollow(user, target):
+    """Remove the edge if any, returns False when there was nothing to remove."""
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(
+            follower_id=user.pk, followee_id=target.pk
+        ).delete()
+        if deleted:
+            User.objects.filter(pk=user.pk, following_count__gt=0).update(
+                following_count=F("following_count") - 1
+            )
+            User.objects.filter(pk=target.pk, followers_count__gt=0).update(
+                followers_count=F("followers_count") - 1
+            )
+            invalidate_profile(user.pk, target.pk)
+            transaction.on_commit(lambda: cache_edge(user.pk, target.pk, False))
+    return bool(deleted)
+
+
+def cache_edge(follower_id, followee_id, exists):
+    pipe = get_redis().pipeline(transaction=False)
+    for key, member in (
+        (following_key(follower_id), followee_id),
+        (followers_key(followee_id), follower_id),
+    ):
+        if exists:
+            pipe.sadd(key, member)
+        else:
+            pipe.srem(key, member)
+        pipe.expire(key, settings.FOLLOW_CACHE_TIMEOUT)
+    for user_id in (follower_id, followee_id):
+        pipe.incr(changes_key(user_id))
+        pipe.expire(changes_key(user_id), settings.FOLLOW_CACHE_TIMEOUT)
+    pipe.execute()
+
+
+def rebuild_follow_cache(user_id):
+    """
+    Replace both follow sets of ``user_id`` with the database state. The
+    sets are built under temporary keys and renamed over the live ones only
+    if no edge of the user was cached since the database was read, otherwise
+    the rebuild starts over: renaming would drop that edge. Returns False
+    when it never got a quiet moment, the sets are then left cold.
+    """
+    redis = get_redis()
+    suffix = uuid.uuid4().hex
+    keys = {
+        following_key(user_id): "{0}:{1}".format(following_key(user_id), suffix),
+        followers_key(user_id): "{0}:{1}".format(followers_key(user_id), suffix),
+    }
+    for _ in range(REBUILD_ATTEMPTS):
+        version = redis.get(changes_key(user_id))
+        following = list(
+            Follow.objects.filter(follower_id=user_id).values_list(
+                "followee_id", flat=True
+            )
+        )
+        followers = list(
+            Follow.objects.filter(followee_id=user_id).values_list(
+                "follower_id", flat=True
+            )
+        )
+        pipe = redis.pipeline(transaction=False)
+        for key, ids in (
+            (keys[following_key(user_id)], following),
+            (keys[followers_key(user_id)], followers),
+        ):
+            pipe.delete(key)
+            pipe.sadd(key, SENTINEL)
+            for start in range(0, len(ids), CHUNK_SIZE):
+                end = start + CHUNK_SIZE
+                pipe.sadd(key, *ids[start:end])
+            pipe.expire(key, settings.FOLLOW_CACHE_TIMEOUT)
+        pipe.execute()
+
+        with redis.pipeline() as pipe:
+            try:
+                pipe.watch(changes_key(user_id))
+                if pipe.get(changes_key(user_id)) != version:
+                    continue
+                pipe.multi()
+                for key, temporary in keys.items():
+                    pipe.rename(temporary, key)
+                pipe.delete(warming_key(user_id))
+                pipe.execute()
+                return True
+            except WatchError:
+                continue
+    redis.delete(*keys.values(), warming_key(user_id))
+    return False
+
+
+def relationships(user_id, ids):
+    """
+    Return the follow state between ``user_id`` and each of ``ids``, from the
+    Redis sets when they are warm or from a single query otherwise.
+    """
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.smismember(following_key(user_id), [SENTINEL, *ids])
+    pipe.smismember(followers_key(user_id), [SENTINEL, *ids])
+    following, followers = pipe.execute()
+
+    if following[0] and followers[0]:
+        following = {pk for pk, flag in zip(ids, following[1:]) if flag}
+        followers = {pk for pk, flag in zip(ids, followers[1:]) if flag}
+    else:
+        edges = Follow.objects.filter(
+            Q(follower_id=user_id, followee_id__in=ids)
+            | Q(followee_id=user_id, follower_id__in=ids)
+        ).values_list("follower_id", "followee_id")
+        following, followers = set(), set()
+        for follower_id, followee_id in edges:
+            if follower_id == user_id:
+                following.add(followee_id)
+            else:
+                followers.add(follower_id)
+        schedule_rebuild(user_id)
+
+    return {
+        pk: {
+            "following": pk in following,
+            "followed_by": pk in followers,
+            "mutual": pk in following and pk in followers,
+        }
+        for pk in ids
+    }
+
+
+def schedule_rebuild(user_id):
+    from user.tasks import rebuild_follow_cache_task
+
+    if get_redis().set(warming_key(user_id), 1, nx=True, ex=60):
+        rebuild_follow_cache_task.delay(user_id)
@@ -0,0 +1,49 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Pool the password hashers run in. hashlib releases the GIL while it
+    derives a key, so threads hash in parallel and the pool size bounds the
+    CPU spent on hashing.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS,
+                thread_name_prefix="password-hashing",
+            )
+    return _executor
+
+
+async def run_hasher(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args))
+
+
+async def acheck_password(user, raw_password):
+    """
+    Async ``user.check_password``. A hash made with outdated parameters is
+    upgraded like the sync version does.
+    """
+    outdated = []
+    valid = await run_hasher(check_password, raw_password, user.password, outdated.append)
+    if valid and outdated:
+        user.password = await run_hasher(make_password, raw_password)
+        await user.asave(update_fields=["password"])
+    return valid
+
+
+async def arun_default_hasher(raw_password):
+    """Hash once for unknown users, so timing does not reveal which exist."""
+    await run_hasher(make_password, raw_password)
@@ -0,0 +1,122 @@
+"""
+Normalization of uploaded images before the media worker sends them to the
+upload backend: decoded once, turned upright, stripped of their metadata
+and brought down to the largest size we serve. It runs in the Celery task,
+off the request path. The task's worker processes bound how many images are
+decoded at once, and its time limit how long one may take.
+"""
+
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+from prometheus_client import Counter, Histogram
+
+UPLOAD_BYTES_SAVED = Histogram(
+    "media_upload_bytes_saved",
+    "Bytes normalization removed from an upload.",
+    ["field"],
+    buckets=(0, 10e3, 50e3, 100e3, 500e3, 1e6, 2e6, 5e6, 10e6, float("inf")),
+)
+UPLOADS_REJECTED = Counter(
+    "media_uploads_rejected_total",
+    "Uploads refused as unreadable or too large to decode.",
+    ["field"],
+)
+
+# Formats kept as they are. Everything else is written as JPEG, or PNG when
+# it has transparency.
+KEPT_FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+
+
+class ImageRejected(ValueError):
+    pass
+
+
+def check_size(image, max_pixels):
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ImageRejected(
+            "The image is {0}x{1}, more than {2} pixels.".format(
+                width, height, max_pixels
+            )
+        )
+
+
+def inspect(file, max_pixels):
+    """
+    Refuse anything that is not an image of at most max_pixels. Only the
+    header is read, so a decompression bomb is caught before it is decoded.
+    """
+    try:
+        with Image.open(file) as image:
+            check_size(image, max_pixels)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as error:
+        raise ImageRejected("The file is not a supported image.") from error
+    finally:
+        file.seek(0)
+
+
+def normalize(data, max_size, max_pixels, quality):
+    """
+    (bytes, extension) of the image brought down to fit max_size, upright
+    and without metadata.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            check_size(image, max_pixels)
+            if getattr(image, "is_animated", False):
+                # Resizing would keep the first frame only.
+                return data, image.format.lower()
+            # JPEG is decoded at the smallest scale that still covers
+            # max_size, which saves most of the decoding time and memory.
+            image.draft("RGB", max_size)
+            extension = KEPT_FORMATS.get(image.format)
+            icc_profile = image.info.get("icc_profile")
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(max_size, Image.Resampling.LANCZOS)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as error:
+        raise ImageRejected("The file is not a supported image.") from error
+
+    alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    if extension is None:
+        extension = "png" if alpha else "jpg"
+    if extension == "jpg" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    elif image.mode not in ("RGB", "RGBA", "L", "LA"):
+        image = image.convert("RGBA" if alpha else "RGB")
+
+    output = io.BytesIO()
+    # No exif is passed on, which drops the metadata, GPS position included.
+    image.save(
+        output,
+        format="JPEG" if extension == "jpg" else extension.upper(),
+        quality=quality,
+        optimize=True,
+        icc_profile=icc_profile,
+    )
+    return output.getvalue(), extension
+
+
+def normalize_upload(field_name, file):
+    """
+    The staged file normalized, as a file named like the original. Raises
+    ImageRejected for files that cannot be an image.
+    """
+    data = file.read()
+    try:
+        normalized, extension = normalize(
+            data,
+            tuple(settings.MEDIA_MAX_DIMENSIONS[field_name]),
+            settings.MEDIA_MAX_PIXELS,
+            settings.MEDIA_NORMALIZE_QUALITY,
+        )
+    except ImageRejected:
+        UPLOADS_REJECTED.labels(field_name).inc()
+        raise
+
+    UPLOAD_BYTES_SAVED.labels(field_name).observe(max(0, len(data) - len(normalized)))
+    name = os.path.splitext(os.path.basename(file.name))[0]
+    return ContentFile(normalized, name="{0}.{1}".format(name, extension))
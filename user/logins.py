@@ -0,0 +1,52 @@
+import logging
+from datetime import datetime
+
+from django.utils import timezone
+from redis.exceptions import ConnectionError, ResponseError
+
+from core.redis import get_redis
+from user.cache import invalidate_profile
+from user.models import User
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "logins:pending"
+# Login times being written. They stay here until the write succeeded, the
+# next flush picks them up again if it did not.
+FLUSHING_KEY = "logins:flushing"
+CHUNK_SIZE = 500
+
+
+def record_login(user_id):
+    """
+    Remember the login time, it reaches User.last_login on the next flush.
+    Without Redis it is written right away rather than lost.
+    """
+    now = timezone.now()
+    try:
+        get_redis().hset(PENDING_KEY, user_id, now.isoformat())
+    except ConnectionError as exc:
+        logger.warning("Writing last_login directly, Redis is unreachable: %s", exc)
+        User.objects.filter(pk=user_id).update(last_login=now)
+        invalidate_profile(user_id)
+
+
+def flush_last_logins():
+    """Write the recorded login times, one query per chunk of users."""
+    redis = get_redis()
+    if not redis.exists(FLUSHING_KEY):
+        try:
+            redis.rename(PENDING_KEY, FLUSHING_KEY)
+        except ResponseError:
+            # No login since the last flush.
+            return 0
+    pending = redis.hgetall(FLUSHING_KEY)
+
+    users = [
+        User(pk=int(user_id), last_login=datetime.fromisoformat(value.decode()))
+        for user_id, value in pending.items()
+    ]
+    User.objects.bulk_update(users, ["last_login"], batch_size=CHUNK_SIZE)
+    redis.delete(FLUSHING_KEY)
+    invalidate_profile(*[user.pk for user in users])
+    return len(users)
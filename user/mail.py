@@ -0,0 +1,233 @@
+import json
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "mail:queue"
+# Messages of the batch being sent. They leave it once their outcome is
+# recorded, so a dispatcher that dies mid-batch loses none of them.
+PROCESSING_KEY = "mail:processing"
+# Held while a batch is sent. Once it expired, whatever is left in the
+# processing list belongs to a dead dispatcher and is queued again.
+DISPATCH_LOCK_KEY = "mail:dispatching"
+RETRY_KEY = "mail:retry"
+SCHEDULED_KEY = "mail:scheduled"
+RETRY_SCHEDULED_KEY = "mail:retry:scheduled"
+# A dispatch task may fire slightly before the retry it was scheduled for.
+RETRY_TOLERANCE = 1
+
+QUEUED = "queued"
+SENT = "sent"
+RETRYING = "retrying"
+FAILED = "failed"
+
+
+def outcome_key(message_id):
+    return "mail:outcome:{0}".format(message_id)
+
+
+def queue_email(subject, body, recipients, html=True):
+    """
+    Queue an email for the next batch. Returns its id, which
+    ``email_outcome`` reports on.
+    """
+    return queue_emails([(subject, body, recipients)], html=html)[0]
+
+
+def queue_emails(emails, html=True):
+    """Queue (subject, body, recipients) emails at once, returns their ids."""
+    pipe = get_redis().pipeline()
+    ids = []
+    for subject, body, recipients in emails:
+        message = {
+            "id": uuid.uuid4().hex,
+            "subject": subject,
+            "body": body,
+            "to": list(recipients),
+            "html": html,
+            "attempts": 0,
+        }
+        pipe.rpush(QUEUE_KEY, json.dumps(message))
+        pipe.hset(outcome_key(message["id"]), mapping={"status": QUEUED, "attempts": 0})
+        pipe.expire(outcome_key(message["id"]), settings.EMAIL_OUTCOME_TTL)
+        ids.append(message["id"])
+    if ids:
+        pipe.execute()
+        schedule_dispatch(settings.EMAIL_BATCH_WINDOW)
+    return ids
+
+
+def email_outcome(message_id):
+    """Return the status, attempts and last error of a queued email."""
+    outcome = get_redis().hgetall(outcome_key(message_id))
+    if not outcome:
+        return None
+    outcome = {key.decode(): value.decode() for key, value in outcome.items()}
+    outcome["attempts"] = int(outcome["attempts"])
+    return outcome
+
+
+def schedule_dispatch(countdown):
+    """Start a dispatch unless one is already waiting for the batch window."""
+    from user.tasks import dispatch_emails_task
+
+    if get_redis().set(SCHEDULED_KEY, 1, nx=True, ex=int(countdown) + 60):
+        dispatch_emails_task.apply_async(countdown=countdown)
+
+
+def schedule_retries():
+    """Make sure a dispatch runs when the earliest retry is due."""
+    from user.tasks import dispatch_emails_task
+
+    redis = get_redis()
+    earliest = redis.zrange(RETRY_KEY, 0, 0, withscores=True)
+    if not earliest:
+        return
+    due = earliest[0][1]
+    scheduled = redis.get(RETRY_SCHEDULED_KEY)
+    if scheduled is None or due < float(scheduled):
+        delay = max(due - time.time(), 0)
+        redis.set(RETRY_SCHEDULED_KEY, due, ex=int(delay) + 60)
+        dispatch_emails_task.apply_async(countdown=delay)
+
+
+def take_batch():
+    """
+    Move the next batch to the processing list, retries that are due go
+    first. Returns the raw messages, which ``ack`` removes once handled.
+    """
+    redis = get_redis()
+    now = time.time() + RETRY_TOLERANCE
+    scheduled = redis.get(RETRY_SCHEDULED_KEY)
+    if scheduled is not None and float(scheduled) <= now:
+        redis.delete(RETRY_SCHEDULED_KEY)
+
+    pipe = redis.pipeline()
+    pipe.zrangebyscore(RETRY_KEY, "-inf", now)
+    pipe.zremrangebyscore(RETRY_KEY, "-inf", now)
+    due, _ = pipe.execute()
+    if due:
+        redis.lpush(QUEUE_KEY, *reversed(due))
+    pipe = redis.pipeline()
+    for _ in range(settings.EMAIL_BATCH_SIZE):
+        pipe.lmove(QUEUE_KEY, PROCESSING_KEY, "LEFT", "RIGHT")
+    return [raw for raw in pipe.execute() if raw is not None]
+
+
+def requeue_abandoned():
+    """Put back at the head of the queue what a dead dispatcher left."""
+    redis = get_redis()
+    while redis.lmove(PROCESSING_KEY, QUEUE_KEY, "RIGHT", "LEFT") is not None:
+        pass
+
+
+def ack(raw):
+    get_redis().lrem(PROCESSING_KEY, 1, raw)
+
+
+def build_message(message, connection):
+    email = EmailMessage(
+        message["subject"], message["body"], to=message["to"], connection=connection
+    )
+    if message["html"]:
+        email.content_subtype = "html"
+    return email
+
+
+def send_batch(messages):
+    """
+    Send the messages over one connection. Returns each message with the
+    error it failed with, or None.
+    """
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        logger.warning("Could not connect to the mail server: %s", exc)
+        return [(message, exc) for message in messages]
+
+    results = []
+    try:
+        for message in messages:
+            try:
+                connection.send_messages([build_message(message, connection)])
+            except Exception as exc:
+                results.append((message, exc))
+                # The error may have left the connection unusable.
+                connection.close()
+                try:
+                    connection.open()
+                except Exception:
+                    pass
+            else:
+                results.append((message, None))
+    finally:
+        connection.close()
+    return results
+
+
+def record_outcome(message, error):
+    redis = get_redis()
+    attempts = message["attempts"] + 1
+    if error is None:
+        status = SENT
+    elif attempts <= settings.EMAIL_MAX_RETRIES:
+        status = RETRYING
+        delay = settings.EMAIL_RETRY_BACKOFF * 2 ** (attempts - 1)
+        retry = dict(message, attempts=attempts)
+        redis.zadd(RETRY_KEY, {json.dumps(retry): time.time() + delay})
+    else:
+        status = FAILED
+        logger.error(
+            "Giving up on email %s to %s after %d attempts: %s",
+            message["id"],
+            ", ".join(message["to"]),
+            attempts,
+            error,
+        )
+
+    outcome = {"status": status, "attempts": attempts}
+    pipe = redis.pipeline()
+    if error is None:
+        pipe.hdel(outcome_key(message["id"]), "error")
+    else:
+        outcome["error"] = str(error)
+    pipe.hset(outcome_key(message["id"]), mapping=outcome)
+    pipe.expire(outcome_key(message["id"]), settings.EMAIL_OUTCOME_TTL)
+    pipe.execute()
+    return status
+
+
+def dispatch_emails():
+    """Send the next batch of queued emails, returns the count per outcome."""
+    redis = get_redis()
+    redis.delete(SCHEDULED_KEY)
+    counts = {SENT: 0, RETRYING: 0, FAILED: 0}
+    token = uuid.uuid4().hex
+    if not redis.set(DISPATCH_LOCK_KEY, token, nx=True, ex=settings.EMAIL_DISPATCH_LEASE):
+        # Another dispatcher is sending, try again after the window.
+        schedule_dispatch(settings.EMAIL_BATCH_WINDOW)
+        return counts
+    try:
+        requeue_abandoned()
+        batch = take_batch()
+        if batch:
+            messages = [json.loads(raw) for raw in batch]
+            for raw, (message, error) in zip(batch, send_batch(messages)):
+                counts[record_outcome(message, error)] += 1
+                ack(raw)
+    finally:
+        if redis.get(DISPATCH_LOCK_KEY) == token.encode():
+            redis.delete(DISPATCH_LOCK_KEY)
+
+    if redis.llen(QUEUE_KEY):
+        schedule_dispatch(0)
+    schedule_retries()
+    return counts
@@ -0,0 +1,262 @@
+import json
+import os
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.urls import reverse
+
+from user.bench import EndpointStats, offline, test_database
+from user.models import Follow, User
+from user.serializers import MyTokenObtainPairSerializer
+
+PASSWORD = "bench-password"
+DEFAULT_BASELINE = os.path.join("benchmarks", "user_api.json")
+# A 1x1 transparent PNG, uploaded by the profile update.
+AVATAR = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000001e221bc33000000"
+    "0049454e44ae426082"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic population on a throwaway test database of the "
+        "configured engine (sqlite unless DB_ENGINE says otherwise), drive the "
+        "user endpoints through the test client and report p50/p95 latency, "
+        "queries and bytes per request. Compare baselines taken on the same "
+        "engine. Runs offline: uploads, email, Celery and Redis are replaced by "
+        "local stand-ins."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--follows", type=int, default=10, help="Edges per user.")
+        parser.add_argument("--requests", type=int, default=30, help="Per endpoint.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+        parser.add_argument(
+            "--save", action="store_true", help="Save the results as the baseline."
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed slowdown of p95 and growth of bytes against the baseline.",
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        with test_database(), offline():
+            users = self.seed(options["users"], options["follows"])
+            results = self.run(users, options["requests"])
+
+        self.report(results)
+        if options["save"]:
+            self.save(options["baseline"], results)
+        elif os.path.exists(options["baseline"]):
+            self.compare(options["baseline"], results, options["tolerance"])
+
+    def seed(self, count, follows):
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            [
+                User(
+                    email="user{0}@example.com".format(i),
+                    username="user{0}".format(i),
+                    first_name="First{0}".format(i),
+                    last_name="Last{0}".format(i),
+                    password=password,
+                    birthday="2001-02-05T00:00:00Z",
+                )
+                for i in range(count)
+            ],
+            batch_size=1000,
+        )
+        ids = list(User.objects.values_list("pk", flat=True))
+        edges = {
+            (follower, followee)
+            for follower in ids
+            for followee in self.random.sample(ids, min(follows, len(ids)))
+            if follower != followee
+        }
+        Follow.objects.bulk_create(
+            [Follow(follower_id=a, followee_id=b) for a, b in edges], batch_size=5000
+        )
+        for field, edge_field in (
+            ("following_count", "follower_id"),
+            ("followers_count", "followee_id"),
+        ):
+            counts = Follow.objects.values(edge_field).annotate(total=Count("id"))
+            User.objects.bulk_update(
+                [User(pk=row[edge_field], **{field: row["total"]}) for row in counts],
+                [field],
+                batch_size=1000,
+            )
+        return list(User.objects.all())
+
+    def run(self, users, requests):
+        client = Client()
+        endpoints = {
+            "register": self.register,
+            "login": self.login,
+            "profile": self.profile,
+            "people_profile": self.people_profile,
+            "update_profile": self.update_profile,
+            "followers": self.followers,
+            "request_reset_password": self.request_reset_password,
+            "reset_password": self.reset_password,
+        }
+        results = {}
+        for name, request in endpoints.items():
+            stats = EndpointStats()
+            for number in range(requests):
+                user = self.random.choice(users)
+                response = request(client, stats, user, number)
+                if response.status_code >= 400:
+                    raise CommandError(
+                        "{0} returned {1}: {2}".format(
+                            name, response.status_code, response.content[:200]
+                        )
+                    )
+                stats.record_response(response)
+            results[name] = stats.summary()
+        return results
+
+    def auth(self, user):
+        token = MyTokenObtainPairSerializer.get_token(user).access_token
+        return {"HTTP_AUTHORIZATION": "Bearer {0}".format(token)}
+
+    def register(self, client, stats, user, number):
+        email = "new{0}@example.com".format(number)
+        with stats.measure():
+            return client.post(
+                reverse("user:register"),
+                {
+                    "email": email,
+                    "password": PASSWORD,
+                    "confirm_password": PASSWORD,
+                    "first_name": "New",
+                    "last_name": "User",
+                    "gender": "female",
+                    "birthday": "2001-02-05T00:00:00Z",
+                },
+                content_type="application/json",
+            )
+
+    def login(self, client, stats, user, number):
+        with stats.measure():
+            return client.post(
+                reverse("user:login"),
+                {"email": user.email, "password": PASSWORD},
+                content_type="application/json",
+            )
+
+    def profile(self, client, stats, user, number):
+        headers = self.auth(user)
+        with stats.measure():
+            return client.get(reverse("user:profile"), **headers)
+
+    def people_profile(self, client, stats, user, number):
+        headers = self.auth(user)
+        with stats.measure():
+            return client.get(reverse("user:people_profile", args=[user.pk]), **headers)
+
+    def update_profile(self, client, stats, user, number):
+        headers = self.auth(user)
+        avatar = SimpleUploadedFile("avatar.png", AVATAR, content_type="image/png")
+        with stats.measure():
+            return client.patch(
+                reverse("user:update_profile"),
+                encode_multipart(
+                    BOUNDARY,
+                    {"first_name": "Updated{0}".format(number), "avatar": avatar},
+                ),
+                content_type=MULTIPART_CONTENT,
+                **headers,
+            )
+
+    def followers(self, client, stats, user, number):
+        headers = self.auth(user)
+        with stats.measure():
+            return client.get(reverse("user:followers", args=[user.pk]), **headers)
+
+    def request_reset_password(self, client, stats, user, number):
+        with stats.measure():
+            return client.post(
+                reverse("user:request_reset_password"),
+                {"email": user.email},
+                content_type="application/json",
+            )
+
+    def reset_password(self, client, stats, user, number):
+        data = client.post(
+            reverse("user:request_reset_password"),
+            {"email": user.email},
+            content_type="application/json",
+        ).json()
+        url = reverse("user:reset_password", args=[data["uid"], data["token"]])
+        with stats.measure():
+            return client.post(
+                url,
+                {"password": PASSWORD, "confirm_password": PASSWORD},
+                content_type="application/json",
+            )
+
+    def report(self, results):
+        self.stdout.write(
+            "{0:<24}{1:>10}{2:>10}{3:>10}{4:>10}".format(
+                "endpoint", "p50 ms", "p95 ms", "queries", "bytes"
+            )
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                "{0:<24}{1[p50_ms]:>10.2f}{1[p95_ms]:>10.2f}"
+                "{1[queries]:>10.2f}{1[bytes]:>10d}".format(name, result)
+            )
+
+    def save(self, path, results):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as baseline:
+            json.dump(results, baseline, indent=2, sort_keys=True)
+            baseline.write("\n")
+        self.stdout.write(self.style.SUCCESS("Saved the baseline to %s" % path))
+
+    def compare(self, path, results, tolerance):
+        """Flag endpoints that got slower, chattier or bigger than the baseline."""
+        with open(path) as baseline:
+            baseline = json.load(baseline)
+
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                regressions.append(
+                    "{0}: p95 {1[p95_ms]} ms, was {2[p95_ms]} ms".format(
+                        name, result, before
+                    )
+                )
+            if result["queries"] > before["queries"]:
+                regressions.append(
+                    "{0}: {1[queries]} queries, was {2[queries]}".format(
+                        name, result, before
+                    )
+                )
+            if result["bytes"] > before["bytes"] * (1 + tolerance):
+                regressions.append(
+                    "{0}: {1[bytes]} bytes, was {2[bytes]}".format(name, result, before)
+                )
+
+        if regressions:
+            raise CommandError(
+                "Regressions against %s:\n%s" % (path, "\n".join(regressions))
+            )
+        self.stdout.write(self.style.SUCCESS("No regressions against %s" % path))
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from django.urls import path
+from rest_framework import generics
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from user.authentication import StatelessJWTAuthentication, full_user
+from user.bench import Timer, asgi_request, offline, test_database
+from user.cache import get_profile
+from user.models import User
+from user.serializers import MyTokenObtainPairSerializer, UserProfileSerializer
+from user.views import MyProfileView
+
+
+class BaselineProfileView(generics.RetrieveAPIView):
+    """MyProfileView before it was async: DRF, run in a thread per request."""
+
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    serializer_class = UserProfileSerializer
+
+    def get_object(self):
+        return full_user(self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        data = get_profile(
+            request.user.pk, lambda: self.get_serializer(self.get_object()).data
+        )
+        return Response(data)
+
+
+urlpatterns = [
+    path("sync/profile", BaselineProfileView.as_view()),
+    path("async/profile", MyProfileView.as_view()),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare how many concurrent profile requests one ASGI worker holds "
+        "with the sync DRF view and the async view, at growing concurrency. "
+        "Every query waits --latency ms, standing in for a database across "
+        "the network."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+        parser.add_argument("--requests", type=int, default=256, help="Per level.")
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--latency", type=float, default=2.0)
+
+    def handle(self, *args, **options):
+        delay = options["latency"] / 1000
+
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(delay)
+            return execute(sql, params, many, context)
+
+        def add_latency(connection, **kwargs):
+            if slow_query not in connection.execute_wrappers:
+                connection.execute_wrappers.append(slow_query)
+
+        with test_database(), offline(), override_settings(ROOT_URLCONF=__name__):
+            headers = self.seed(options["users"])
+            connection_created.connect(add_latency)
+            try:
+                for connection in connections.all(initialized_only=True):
+                    add_latency(connection)
+                app = get_asgi_application()
+                self.stdout.write(
+                    "{0:<6}{1:>12}{2:>10}{3:>10}{4:>10}{5:>11}{6:>9}".format(
+                        "view",
+                        "concurrency",
+                        "req/s",
+                        "p50 ms",
+                        "p95 ms",
+                        "in-flight",
+                        "threads",
+                    )
+                )
+                for concurrency in options["concurrency"]:
+                    for name in ("sync", "async"):
+                        cache.clear()
+                        result = asyncio.run(
+                            self.run(app, name, headers, options["requests"], concurrency)
+                        )
+                        self.report(name, concurrency, result)
+            finally:
+                connection_created.disconnect(add_latency)
+
+    def seed(self, count):
+        User.objects.bulk_create(
+            [
+                User(
+                    email="user{0}@example.com".format(i),
+                    username="user{0}".format(i),
+                    first_name="First{0}".format(i),
+                    birthday="2001-02-05T00:00:00Z",
+                )
+                for i in range(count)
+            ]
+        )
+        return [
+            [
+                (
+                    "Authorization",
+                    "Bearer {0}".format(
+                        MyTokenObtainPairSerializer.get_token(user).access_token
+                    ),
+                )
+            ]
+            for user in User.objects.all()
+        ]
+
+    async def run(self, app, name, headers, requests, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        timer = Timer()
+        timer.threads = threading.active_count()
+
+        async def get(number):
+            async with semaphore:
+                with timer.time():
+                    code, body = await asgi_request(
+                        app,
+                        "GET",
+                        "/{0}/profile".format(name),
+                        headers[number % len(headers)],
+                    )
+                timer.threads = max(timer.threads, threading.active_count())
+            if code != 200:
+                raise CommandError("{0} returned {1}: {2}".format(name, code, body[:200]))
+
+        start = time.perf_counter()
+        await asyncio.gather(*[get(number) for number in range(requests)])
+        timer.elapsed = time.perf_counter() - start
+        return timer
+
+    def report(self, name, concurrency, timer):
+        throughput = len(timer.samples) / timer.elapsed
+        # Little's law: requests held at once = throughput x time in system.
+        in_flight = throughput * sum(timer.samples) / len(timer.samples) / 1000
+        self.stdout.write(
+            "{0:<6}{1:>12}{2:>10.1f}{3:>10.1f}{4:>10.1f}{5:>11.1f}{6:>9}".format(
+                name,
+                concurrency,
+                throughput,
+                timer.percentile(50),
+                timer.percentile(95),
+                in_flight,
+                timer.threads,
+            )
+        )
@@ -0,0 +1,131 @@
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.backends.sqlite3 import base as sqlite3
+from django.db.utils import load_backend
+
+from core.db.pool import PooledDatabaseWrapper, get_pool
+from user.bench import Timer
+
+
+class PooledSQLiteWrapper(PooledDatabaseWrapper, sqlite3.DatabaseWrapper):
+    """Stands in for core.db.backends.postgresql when the database is sqlite."""
+
+    def reusable(self, connection):
+        if connection.in_transaction:
+            connection.rollback()
+        return True
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure what a connection costs each request with the settings of the "
+        "default database: a connection per request, persistent connections "
+        "kept by a WSGI thread or left behind by the ASGI thread of each "
+        "request, and the pool. Connecting waits --connect-latency ms, "
+        "standing in for the TCP, TLS and authentication round trips to a "
+        "remote database. Only runs SELECT 1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--connect-latency", type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        settings_dict = connections["default"].settings_dict
+        backend = load_backend(settings_dict["ENGINE"])
+        engine = settings_dict["ENGINE"]
+        if issubclass(backend.DatabaseWrapper, sqlite3.DatabaseWrapper):
+            pooled = PooledSQLiteWrapper
+        else:
+            pooled = load_backend("core.db.backends.postgresql").DatabaseWrapper
+            engine = "core.db.backends.postgresql"
+        modes = [
+            ("per request", backend.DatabaseWrapper, {"CONN_MAX_AGE": 0}, False),
+            ("wsgi thread", backend.DatabaseWrapper, {"CONN_MAX_AGE": 60}, False),
+            ("asgi thread", backend.DatabaseWrapper, {"CONN_MAX_AGE": 60}, True),
+            (
+                "pool",
+                pooled,
+                {
+                    "ENGINE": engine,
+                    "CONN_MAX_AGE": 0,
+                    "POOL": {"MAX_SIZE": 4, "CHECK_AFTER": 30},
+                },
+                True,
+            ),
+        ]
+        delay = options["connect_latency"] / 1000
+        connect = backend.Database.connect
+
+        def slow_connect(*args, **kwargs):
+            time.sleep(delay)
+            return connect(*args, **kwargs)
+
+        self.stdout.write(
+            "{0:<13}{1:>10}{2:>10}{3:>10}{4:>7}".format(
+                "connection", "p50 ms", "p95 ms", "connects", "open"
+            )
+        )
+        with mock.patch.object(backend.Database, "connect", slow_connect):
+            for name, wrapper_class, overrides, thread_per_request in modes:
+                settings = {**settings_dict, "CONN_HEALTH_CHECKS": True, **overrides}
+                self.run(
+                    name,
+                    wrapper_class,
+                    settings,
+                    thread_per_request,
+                    options["requests"],
+                )
+
+    def run(self, name, wrapper_class, settings, thread_per_request, requests):
+        alias = "bench-{0}".format(name.replace(" ", "-"))
+        timer = Timer()
+        wrappers = []
+        connects = 0
+
+        def count(sender, connection, **kwargs):
+            nonlocal connects
+            if connection.alias == alias:
+                connects += 1
+
+        connection_created.connect(count)
+        try:
+            for number in range(requests):
+                if thread_per_request or not wrappers:
+                    # Each thread has its own connection object.
+                    wrapper = wrapper_class(settings, alias)
+                    wrappers.append(wrapper)
+                with timer.time():
+                    self.request(wrapper)
+        finally:
+            connection_created.disconnect(count)
+        if issubclass(wrapper_class, PooledDatabaseWrapper):
+            pool = get_pool(alias, settings["POOL"])
+            connects = pool.stats()["opened"]
+            still_open = pool.stats()["size"]
+            pool.close_all()
+        else:
+            still_open = sum(wrapper.connection is not None for wrapper in wrappers)
+        for wrapper in wrappers:
+            wrapper.close()
+        self.stdout.write(
+            "{0:<13}{1:>10.2f}{2:>10.2f}{3:>10}{4:>7}".format(
+                name,
+                timer.percentile(50),
+                timer.percentile(95),
+                connects,
+                still_open,
+            )
+        )
+
+    def request(self, wrapper):
+        # What the request_started and request_finished signals do.
+        wrapper.close_if_unusable_or_obsolete()
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        wrapper.close_if_unusable_or_obsolete()
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+from django.contrib.auth.models import update_last_login
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+from django.urls import path
+
+from user.bench import Timer, offline, test_database
+from user.models import User
+from user.serializers import MyTokenObtainPairSerializer
+from user.views import LoginView, MyTokenObtainPairView
+
+PASSWORD = "bench-password"
+
+
+class BaselineTokenObtainPairSerializer(MyTokenObtainPairSerializer):
+    """The login before the async view, it wrote last_login inline."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        update_last_login(None, self.user)
+        return data
+
+
+urlpatterns = [
+    path(
+        "sync",
+        MyTokenObtainPairView.as_view(serializer_class=BaselineTokenObtainPairSerializer),
+    ),
+    path("async", LoginView.as_view()),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare login throughput of the sync DRF view and the async view "
+        "under concurrent ASGI requests, on a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=32)
+        parser.add_argument("--concurrency", type=int, default=8)
+
+    def handle(self, *args, **options):
+        with test_database(), offline(), override_settings(ROOT_URLCONF=__name__):
+            users = [
+                User.objects.create_user(
+                    email="bench{0}@example.com".format(i),
+                    password=PASSWORD,
+                    birthday="2001-02-05T00:00:00Z",
+                )
+                for i in range(options["concurrency"])
+            ]
+            for name in ("sync", "async"):
+                self.report(name, asyncio.run(self.run(name, users, **options)))
+
+    async def run(self, name, users, requests, concurrency, **options):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+        timer = Timer()
+
+        async def login(user):
+            async with semaphore:
+                with timer.time():
+                    res = await client.post(
+                        "/{0}".format(name),
+                        {"email": user.email, "password": PASSWORD},
+                        content_type="application/json",
+                    )
+            if res.status_code != 200:
+                raise RuntimeError("Login failed: {0}".format(res.content))
+
+        start = time.perf_counter()
+        await asyncio.gather(*[login(users[i % len(users)]) for i in range(requests)])
+        timer.elapsed = time.perf_counter() - start
+        return timer
+
+    def report(self, name, timer):
+        self.stdout.write(
+            "{0:>5}: {1:7.1f} logins/s  p50 {2:7.1f} ms  p95 {3:7.1f} ms".format(
+                name,
+                len(timer.samples) / timer.elapsed,
+                timer.percentile(50),
+                timer.percentile(95),
+            )
+        )
@@ -0,0 +1,76 @@
+import timeit
+
+from cloudinary import CloudinaryResource
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+from user.models import User
+from user.serializers import UserProfileSerializer, UserSummarySerializer
+
+RENDERERS = [
+    ("drf-json", JSONRenderer()),
+    ("orjson", ORJSONRenderer()),
+    ("msgpack", MessagePackRenderer()),
+]
+
+
+def sample_user(pk):
+    now = timezone.now()
+    user = User(
+        pk=pk,
+        email="user{0}@example.com".format(pk),
+        first_name="First{0}".format(pk),
+        last_name="Last{0}".format(pk),
+        birthday=now,
+        date_joined=now,
+        created=now,
+        updated=now,
+        last_login=now,
+        followers_count=pk * 7,
+        following_count=pk * 3,
+    )
+    user.avatar = CloudinaryResource(
+        "avatar/{0}".format(pk),
+        format="jpg",
+        version=1700000000,
+        type="upload",
+        resource_type="image",
+    )
+    return user
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare encode time and payload size of the renderers for a profile "
+        "response and a page of user summaries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--number", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        payloads = {
+            "profile": UserProfileSerializer(sample_user(1)).data,
+            "page": {
+                "next": "http://testserver/user/1/followers?cursor=eyJwIjogWzFdfQ",
+                "previous": None,
+                "results": UserSummarySerializer(
+                    [sample_user(pk) for pk in range(1, 21)], many=True
+                ).data,
+            },
+        }
+        for name, payload in payloads.items():
+            self.stdout.write(name)
+            for renderer_name, renderer in RENDERERS:
+                seconds = timeit.timeit(
+                    lambda: renderer.render(payload), number=options["number"]
+                )
+                self.stdout.write(
+                    "  {0:>8}: {1:8.2f} us/op {2:6d} bytes".format(
+                        renderer_name,
+                        seconds / options["number"] * 1e6,
+                        len(renderer.render(payload)),
+                    )
+                )
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from user.follows import rebuild_follow_cache
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Redis follow sets from the Follow table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", type=int, nargs="+", dest="users", help="Only these user ids."
+        )
+
+    def handle(self, *args, **options):
+        users = options["users"]
+        if users is None:
+            users = (
+                User.objects.filter(Q(followers_count__gt=0) | Q(following_count__gt=0))
+                .values_list("pk", flat=True)
+                .iterator(chunk_size=1000)
+            )
+        rebuilt = 0
+        for user_id in users:
+            rebuild_follow_cache(user_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS("Rebuilt follow sets of %d users" % rebuilt))
@@ -0,0 +1,147 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Cold-start budget of importing the settings module, in milliseconds.
+SETTINGS_BUDGET = 100
+# Run in a fresh interpreter, prints how long each start-up phase took.
+PHASES_SCRIPT = """
+import importlib, json, os, time
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+phases = {}
+start = time.perf_counter()
+# An import statement, importlib.import_module is not logged by -X importtime.
+__import__(os.environ["DJANGO_SETTINGS_MODULE"])
+phases["settings"] = time.perf_counter() - start
+start = time.perf_counter()
+import django
+django.setup()
+phases["django.setup"] = time.perf_counter() - start
+start = time.perf_counter()
+from django.conf import settings
+importlib.import_module(settings.ROOT_URLCONF)
+phases["urls"] = time.perf_counter() - start
+print(json.dumps(phases))
+"""
+IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+class Import:
+    def __init__(self, name, own, cumulative, depth):
+        self.name = name
+        self.own = own / 1000
+        self.cumulative = cumulative / 1000
+        self.depth = depth
+        self.children = []
+
+    def names(self):
+        yield self.name
+        for child in self.children:
+            yield from child.names()
+
+
+def parse_importtime(output):
+    """
+    Build the import tree from ``python -X importtime`` output, where a
+    module is listed after the modules it imported, one level deeper.
+    """
+    roots = []
+    for line in output.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match is None:
+            continue
+        own, cumulative, indent, name = match.groups()
+        node = Import(name, int(own), int(cumulative), len(indent) // 2)
+        while roots and roots[-1].depth > node.depth:
+            node.children.insert(0, roots.pop())
+        roots.append(node)
+    return roots
+
+
+def profile_startup(settings_module=None):
+    """Start Django in a fresh interpreter, returns its phases and import tree."""
+    env = dict(os.environ)
+    env["DJANGO_SETTINGS_MODULE"] = settings_module or os.environ.get(
+        "DJANGO_SETTINGS_MODULE", "core.settings"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PHASES_SCRIPT],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode:
+        raise CommandError("Start-up failed:\n%s" % result.stderr[-2000:])
+    phases = json.loads(result.stdout.strip().splitlines()[-1])
+    phases = {name: seconds * 1000 for name, seconds in phases.items()}
+    return phases, parse_importtime(result.stderr)
+
+
+class Command(BaseCommand):
+    help = (
+        "Start Django in fresh interpreters and report the time spent importing "
+        "the settings, in django.setup and loading the URLs, the cost of each "
+        "settings block and the slowest imports."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Runs, the fastest is reported."
+        )
+        parser.add_argument("--limit", type=int, default=15)
+        parser.add_argument(
+            "--budget",
+            type=float,
+            default=None,
+            help="Fail when importing the settings takes longer, in milliseconds.",
+        )
+
+    def handle(self, *args, **options):
+        settings_module = os.environ.get("DJANGO_SETTINGS_MODULE", "core.settings")
+        runs = [
+            profile_startup(settings_module) for _ in range(max(1, options["repeat"]))
+        ]
+        phases, roots = min(runs, key=lambda run: sum(run[0].values()))
+
+        self.stdout.write("{0:<48}{1:>10}".format("phase", "ms"))
+        for name, elapsed in phases.items():
+            self.stdout.write("{0:<48}{1:>10.1f}".format(name, elapsed))
+
+        settings_import = next(
+            (root for root in roots if root.name == settings_module), None
+        )
+        if settings_import is not None:
+            self.stdout.write("\n{0:<48}{1:>10}{2:>10}".format("settings", "ms", "own"))
+            self.write_tree(settings_import, settings_module.split(".")[0])
+
+        self.stdout.write(
+            "\n{0:<48}{1:>10}{2:>10}".format("slowest imports", "ms", "own")
+        )
+        slowest = sorted(roots, key=lambda root: root.cumulative, reverse=True)
+        for root in slowest[: options["limit"]]:
+            self.stdout.write(
+                "{0:<48}{1:>10.1f}{2:>10.1f}".format(root.name, root.cumulative, root.own)
+            )
+
+        budget = options["budget"]
+        if budget is not None and phases["settings"] > budget:
+            raise CommandError(
+                "Importing the settings took %.1f ms, the budget is %.1f ms"
+                % (phases["settings"], budget)
+            )
+
+    def write_tree(self, node, package, depth=0):
+        """The settings module and what it imports, expanding project modules."""
+        self.stdout.write(
+            "{0:<48}{1:>10.1f}{2:>10.1f}".format(
+                "  " * depth + node.name, node.cumulative, node.own
+            )
+        )
+        if depth and not node.name.startswith(package + "."):
+            return
+        for child in sorted(node.children, key=lambda child: -child.cumulative):
+            self.write_tree(child, package, depth + 1)
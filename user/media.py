@@ -0,0 +1,401 @@
+import hmac
+import json
+import os
+import time
+import uuid
+from functools import lru_cache
+
+import cloudinary
+from celery.exceptions import SoftTimeLimitExceeded
+from cloudinary import CloudinaryResource, uploader, utils
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from user import images
+from user.cache import invalidate_profile
+from user.notifications import notify_user
+
+# Seconds a signed upload stays valid, as on Cloudinary.
+UPLOAD_SIGNATURE_MAX_AGE = 3600
+# Seconds an upload notification is accepted after it was sent.
+NOTIFICATION_MAX_AGE = 7200
+
+
+class CloudinaryBackend:
+    """Upload media to Cloudinary."""
+
+    def upload(self, file, **options):
+        return uploader.upload_resource(file, **options)
+
+    def upload_url(self, resource_type):
+        return utils.cloudinary_api_url("upload", resource_type=resource_type)
+
+    def credentials(self):
+        config = cloudinary.config()
+        return {"api_key": config.api_key, "api_secret": config.api_secret}
+
+    def uploaded_resource(self, public_id, version, format, options):
+        """Asset of a direct upload, with the URLs of its eager variants."""
+        resource = CloudinaryResource(
+            public_id,
+            version=version,
+            format=format,
+            type=options["type"],
+            resource_type=options["resource_type"],
+        )
+        resource.metadata = {
+            "public_id": public_id,
+            "url": resource.build_url(secure=True),
+            "eager": [
+                {"secure_url": resource.build_url(secure=True, **transformation)}
+                for transformation in options["eager"]
+            ],
+        }
+        return resource
+
+
+class LocalBackend:
+    """
+    Stand-in for Cloudinary that keeps uploads in the default storage, so the
+    media pipeline can run without network access. Direct uploads go to
+    ``receive_local_upload``, which takes the place of its upload API.
+    """
+
+    def upload(self, file, **options):
+        extension = os.path.splitext(getattr(file, "name", ""))[1]
+        public_id = os.path.join(options.get("folder", ""), uuid.uuid4().hex)
+        name = default_storage.save(public_id + extension, file)
+        return self.resource(public_id, "1", extension.lstrip("."), name, options)
+
+    def upload_url(self, resource_type):
+        return reverse("user:local_upload")
+
+    def credentials(self):
+        return {"api_key": "local", "api_secret": settings.SECRET_KEY}
+
+    def uploaded_resource(self, public_id, version, format, options):
+        name = "{0}.{1}".format(public_id, format)
+        if not default_storage.exists(name):
+            raise ValueError("The upload does not exist.")
+        return self.resource(public_id, version, format, name, options)
+
+    def resource(self, public_id, version, format, name, options):
+        return CloudinaryResource(
+            public_id,
+            version=version,
+            format=format or None,
+            type=options.get("type", "upload"),
+            resource_type=options.get("resource_type", "image"),
+            metadata={
+                "public_id": public_id,
+                "url": default_storage.url(name),
+                "bytes": default_storage.size(name),
+                "width": None,
+                "height": None,
+            },
+        )
+
+
+def get_backend():
+    return import_string(settings.MEDIA_UPLOAD_BACKEND)()
+
+
+def staging_storage():
+    return FileSystemStorage(location=settings.MEDIA_STAGING_ROOT)
+
+
+def stage_upload(instance, field, file):
+    """
+    Keep the raw upload in the staging area until the instance is saved and
+    remember it so ``schedule_staged_uploads`` can hand it to the worker.
+    """
+    if hasattr(file, "seekable") and file.seekable():
+        file.seek(0)
+    extension = os.path.splitext(file.name)[1]
+    staged_name = staging_storage().save(uuid.uuid4().hex + extension, file)
+    pending = instance.__dict__.setdefault("_staged_media", [])
+    pending.append((field.name, staged_name))
+    return staged_name
+
+
+def schedule_staged_uploads(instance):
+    from user.tasks import process_media_upload
+
+    for field_name, staged_name in instance.__dict__.pop("_staged_media", []):
+        transaction.on_commit(
+            lambda pk=instance.pk, name=field_name, staged=staged_name: (
+                process_media_upload.delay(pk, name, staged)
+            )
+        )
+
+
+def upload_options(instance, field):
+    options = {"type": field.type, "resource_type": field.resource_type}
+    options.update(
+        {
+            key: val(instance) if callable(val) else val
+            for key, val in field.options.items()
+        }
+    )
+    options.update(field.upload_options(instance))
+    # Derived during the upload, so no request waits for them to be made.
+    options["eager"] = [
+        transformation for _, _, transformation in variant_transformations(field.name)
+    ]
+    return options
+
+
+def variant_transformations(field_name):
+    """(variant, format, transformation) of each variant of a media field."""
+    return [
+        (name, extension, dict(transformation, format=extension, quality="auto"))
+        for name, transformation in settings.MEDIA_VARIANTS.get(field_name, {}).items()
+        for extension in settings.MEDIA_VARIANT_FORMATS
+    ]
+
+
+def uploaded_variants(resource, field_name):
+    """
+    {variant: {format: url}} from the eager results of an upload. A backend
+    without them serves the original for every variant.
+    """
+    eager = resource.metadata.get("eager")
+    variants = {}
+    for number, (name, extension, _) in enumerate(variant_transformations(field_name)):
+        url = eager[number]["secure_url"] if eager else resource.metadata.get("url")
+        variants.setdefault(name, {})[extension] = url
+    return variants
+
+
+@lru_cache(maxsize=1024)
+def variant_urls(field, value):
+    """
+    {variant: {format: url}} built from the stored value, for assets without
+    stored variants: the placeholders most users share and uploads older
+    than the variants. Cloudinary then derives them on the first request.
+    """
+    if not value:
+        return {}
+    resource = field.parse_cloudinary_resource(value)
+    variants = {}
+    try:
+        for name, extension, transformation in variant_transformations(field.name):
+            variants.setdefault(name, {})[extension] = resource.build_url(
+                secure=True, **transformation
+            )
+    except ValueError:
+        # Cloudinary is not configured.
+        return {}
+    return variants
+
+
+def instance_variants(instance, field_name):
+    """{variant: {format: url}} of a media field of the instance."""
+    field = instance._meta.get_field(field_name)
+    return getattr(instance, field.variants_attname) or variant_urls(
+        field, field.get_prep_value(getattr(instance, field.attname))
+    )
+
+
+def srcset(field_name, variants):
+    """{format: srcset} of the variants, each described by its width."""
+    widths = {
+        name: transformation["width"]
+        for name, transformation in settings.MEDIA_VARIANTS.get(field_name, {}).items()
+    }
+    sets = {}
+    for name, urls in variants.items():
+        for extension, url in urls.items():
+            if name in widths:
+                sets.setdefault(extension, []).append(
+                    "{0} {1}w".format(url, widths[name])
+                )
+    return {extension: ", ".join(candidates) for extension, candidates in sets.items()}
+
+
+def process_upload(model, pk, field_name, staged_name):
+    """
+    Normalize a staged file, send it to the upload backend and write the
+    resulting asset back to the row.
+    """
+    instance = model._default_manager.get(pk=pk)
+    field = model._meta.get_field(field_name)
+    storage = staging_storage()
+    if getattr(instance, field.pending_attname) != staged_name:
+        # A newer upload was made since, this one would be discarded anyway.
+        storage.delete(staged_name)
+        return None
+    try:
+        with storage.open(staged_name) as staged:
+            file = images.normalize_upload(field_name, staged)
+    except (images.ImageRejected, SoftTimeLimitExceeded) as error:
+        # The row keeps its previous asset, retrying would not help.
+        storage.delete(staged_name)
+        notify_user(pk, "media.rejected", {"field": field_name, "message": str(error)})
+        return None
+    resource = get_backend().upload(file, **upload_options(instance, field))
+
+    values = attach_upload(model, pk, field, resource, staged_name)
+    storage.delete(staged_name)
+    return values
+
+
+def attach_upload(model, pk, field, resource, pending):
+    """
+    Write an uploaded asset and the URLs of its variants to the row. Only the
+    media columns are updated, so concurrent edits to the rest of the profile
+    are left alone. Nothing is written, and None returned, unless pending is
+    still the latest upload of the field: an older upload finishing late
+    must not replace a newer one.
+    """
+    values = {field.attname: field.get_prep_value(resource)}
+    if field.width_field:
+        values[field.width_field] = resource.metadata.get("width")
+    if field.height_field:
+        values[field.height_field] = resource.metadata.get("height")
+    values[field.variants_attname] = uploaded_variants(resource, field.name)
+    latest = {field.pending_attname: pending}
+    if not model._default_manager.filter(pk=pk, **latest).update(**values):
+        return None
+    invalidate_profile(pk)
+
+    notify_user(pk, "media.uploaded", {"field": field.name, **values})
+    return values
+
+
+def direct_upload(model, instance, field):
+    """
+    Signed parameters for the client to upload a file for the field straight
+    to the backend. They fix the public_id, in the folder of the user, so the
+    bytes never pass through Django. It becomes the latest upload of the
+    field, any signed before can no longer be attached.
+    """
+    backend = get_backend()
+    options = upload_options(instance, field)
+    options["public_id"] = options.pop("folder") + uuid.uuid4().hex
+    model._default_manager.filter(pk=instance.pk).update(
+        **{field.pending_attname: options["public_id"]}
+    )
+    options["allowed_formats"] = settings.MEDIA_UPLOAD_FORMATS
+    # Bytes that skip the media worker are brought down to the same sizes by
+    # the backend, as an incoming transformation.
+    width, height = settings.MEDIA_MAX_DIMENSIONS[field.name]
+    options.update(width=width, height=height, crop="limit")
+    if settings.MEDIA_UPLOAD_CALLBACK_URL:
+        options["notification_url"] = settings.MEDIA_UPLOAD_CALLBACK_URL
+    fields = utils.sign_request(
+        utils.build_upload_params(**options), backend.credentials()
+    )
+    return {"url": backend.upload_url(field.resource_type), "fields": fields}
+
+
+def response_signature(public_id, version, secret):
+    """Signature the upload API returns with the public_id and version."""
+    return utils.api_sign_request(
+        {"public_id": public_id, "version": version}, secret, signature_version=1
+    )
+
+
+def in_folder(instance, field, public_id):
+    folder = field.upload_options(instance)["folder"]
+    head, _, name = public_id.rpartition("/")
+    return head + "/" == folder and bool(name)
+
+
+def confirm_upload(model, instance, field, public_id, version, format, signature):
+    """
+    Attach a direct upload the client reports as done. The signature proves
+    the backend stored it, the public_id must be in the folder of the user
+    and field it was signed for.
+    """
+    backend = get_backend()
+    expected = response_signature(public_id, version, backend.credentials()["api_secret"])
+    if not hmac.compare_digest(expected, signature):
+        raise ValueError("Invalid upload signature.")
+    if not in_folder(instance, field, public_id):
+        raise ValueError("The upload is not in your folder.")
+    if format not in settings.MEDIA_UPLOAD_FORMATS:
+        raise ValueError("Unsupported format.")
+    resource = backend.uploaded_resource(
+        public_id, version, format, upload_options(instance, field)
+    )
+    values = attach_upload(model, instance.pk, field, resource, public_id)
+    if values is None:
+        raise ValueError("A newer upload replaced this one.")
+    return values
+
+
+def receive_notification(model, body, timestamp, signature):
+    """
+    Attach a direct upload from the notification the backend posts to
+    MEDIA_UPLOAD_CALLBACK_URL, for clients that never confirm it. The user
+    and field are read from the folder of the public_id. None when a newer
+    upload replaced it, the notification is still acknowledged.
+    """
+    secret = get_backend().credentials()["api_secret"]
+    try:
+        fresh = int(timestamp) >= time.time() - NOTIFICATION_MAX_AGE
+    except ValueError:
+        fresh = False
+    expected = utils.compute_hex_hash(body + timestamp + secret)
+    if not fresh or not hmac.compare_digest(expected, signature):
+        raise ValueError("Invalid notification signature.")
+
+    data = json.loads(body)
+    try:
+        email, folder, _ = data["public_id"].rsplit("/", 2)
+        field = next(
+            field
+            for field in model._meta.fields
+            if getattr(field, "folder", None) == folder
+        )
+        instance = model._default_manager.only("pk", "email").get(email=email)
+    except (KeyError, ValueError, StopIteration, model.DoesNotExist):
+        raise ValueError("The upload belongs to no user.")
+    if not in_folder(instance, field, data["public_id"]):
+        raise ValueError("The upload belongs to no user.")
+    resource = CloudinaryResource(
+        data["public_id"],
+        version=str(data.get("version", "")),
+        format=data.get("format"),
+        type=data.get("type", "upload"),
+        resource_type=data.get("resource_type", "image"),
+        metadata=data,
+    )
+    return attach_upload(model, instance.pk, field, resource, data["public_id"])
+
+
+def receive_local_upload(params, file):
+    """
+    The upload API of Cloudinary, for LocalBackend: check the signed
+    parameters, store the file under the public_id and answer as Cloudinary
+    does. Eager variants are not derived.
+    """
+    params = {key: value for key, value in params.items() if key != "file"}
+    signature = params.pop("signature", "")
+    params.pop("api_key", None)
+    secret = LocalBackend().credentials()["api_secret"]
+    if not hmac.compare_digest(utils.api_sign_request(params, secret), signature):
+        raise ValueError("Invalid signature.")
+    if int(params.get("timestamp", 0)) < time.time() - UPLOAD_SIGNATURE_MAX_AGE:
+        raise ValueError("Stale request.")
+    format = os.path.splitext(file.name)[1].lstrip(".").lower()
+    if format not in params.get("allowed_formats", "").split(","):
+        raise ValueError("Unsupported format.")
+
+    public_id = params["public_id"]
+    version = str(int(time.time()))
+    name = default_storage.save("{0}.{1}".format(public_id, format), file)
+    return {
+        "public_id": public_id,
+        "version": version,
+        "format": format,
+        "type": params.get("type", "upload"),
+        "resource_type": "image",
+        "bytes": default_storage.size(name),
+        "secure_url": default_storage.url(name),
+        "signature": response_signature(public_id, version, secret),
+    }
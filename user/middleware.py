@@ -0,0 +1,29 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from user.authentication import StatelessJWTAuthentication
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticate websockets with the access token passed as ``?token=``,
+    browsers can not set an Authorization header on a websocket.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        token = parse_qs(scope.get("query_string", b"").decode()).get("token")
+        scope["user"] = await self.get_user(token[0]) if token else AnonymousUser()
+        return await self.inner(scope, receive, send)
+
+    @database_sync_to_async
+    def get_user(self, raw_token):
+        authentication = StatelessJWTAuthentication()
+        try:
+            return authentication.get_user(authentication.get_validated_token(raw_token))
+        except (AuthenticationFailed, InvalidToken):
+            return AnonymousUser()
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:48
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+import user.models
+
+
+def check_duplicate_emails(apps, schema_editor):
+    """
+    Stop before the case-insensitive constraint is added when two accounts
+    share an email up to case: the index build would fail with an error
+    that names neither. They have to be merged or renamed by hand.
+    """
+    User = apps.get_model("user", "User")
+    duplicates = list(
+        User.objects.using(schema_editor.connection.alias)
+        .values(lowered=Lower("email"))
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+        .values_list("lowered", flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Emails used by several accounts up to case, resolve them before "
+            "migrating: {0}".format(", ".join(duplicates))
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="avatar",
+            field=user.models.AvatarField(
+                default="default/avatar_default.jpg", max_length=255
+            ),
+        ),
+        migrations.AlterField(
+            model_name="user",
+            name="cover",
+            field=user.models.CoverField(
+                default="default/cover_default.png", max_length=255
+            ),
+        ),
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="user",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower("email"),
+                name="user_email_ci_unique",
+            ),
+        ),
+    ]
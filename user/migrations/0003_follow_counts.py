@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:50
+
+from django.db import migrations, models
+from django.db.models import Count
+
+BATCH_SIZE = 1000
+
+
+def backfill_counts(apps, schema_editor):
+    User = apps.get_model("user", "User")
+    Follow = User.follow.through
+    db_alias = schema_editor.connection.alias
+    last_id = 0
+    while True:
+        users = list(
+            User.objects.using(db_alias)
+            .filter(id__gt=last_id)
+            .only("id")
+            .order_by("id")[:BATCH_SIZE]
+        )
+        if not users:
+            break
+        ids = [user.id for user in users]
+        following = dict(
+            Follow.objects.using(db_alias)
+            .filter(from_user_id__in=ids)
+            .values_list("from_user_id")
+            .annotate(total=Count("id"))
+        )
+        followers = dict(
+            Follow.objects.using(db_alias)
+            .filter(to_user_id__in=ids)
+            .values_list("to_user_id")
+            .annotate(total=Count("id"))
+        )
+        for user in users:
+            user.following_count = following.get(user.id, 0)
+            user.followers_count = followers.get(user.id, 0)
+        User.objects.using(db_alias).bulk_update(
+            users, ["followers_count", "following_count"]
+        )
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0002_email_ci_unique_and_media_defaults"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="following_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,247 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:52
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models, transaction
+from django.db.models.constants import OnConflict
+
+BATCH_SIZE = 5000
+OLD_TABLE = "User_follow"
+# Follow time of the edges copied from the old table, which never recorded
+# one. They sort before every follow made since.
+BACKFILL_CREATED = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Triggers copying every write to the old table into Follow, while servers
+# still running the previous release use it. Migration 0012 drops them with
+# the table.
+MIRROR_SQL = {
+    "postgresql": [
+        """
+        CREATE OR REPLACE FUNCTION follow_mirror() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO {new} (follower_id, followee_id, created)
+                VALUES (NEW.from_user_id, NEW.to_user_id, now())
+                ON CONFLICT DO NOTHING;
+                RETURN NEW;
+            END IF;
+            DELETE FROM {new}
+            WHERE follower_id = OLD.from_user_id AND followee_id = OLD.to_user_id;
+            RETURN OLD;
+        END $$
+        """,
+        """
+        CREATE TRIGGER follow_mirror AFTER INSERT OR DELETE ON {old}
+        FOR EACH ROW EXECUTE FUNCTION follow_mirror()
+        """,
+    ],
+    "sqlite": [
+        """
+        CREATE TRIGGER follow_mirror_insert AFTER INSERT ON {old}
+        BEGIN
+            INSERT OR IGNORE INTO {new} (follower_id, followee_id, created)
+            VALUES (
+                NEW.from_user_id,
+                NEW.to_user_id,
+                strftime('%Y-%m-%d %H:%M:%f', 'now')
+            );
+        END
+        """,
+        """
+        CREATE TRIGGER follow_mirror_delete AFTER DELETE ON {old}
+        BEGIN
+            DELETE FROM {new}
+            WHERE follower_id = OLD.from_user_id AND followee_id = OLD.to_user_id;
+        END
+        """,
+    ],
+    "mysql": [
+        """
+        CREATE TRIGGER follow_mirror_insert AFTER INSERT ON {old}
+        FOR EACH ROW
+            INSERT IGNORE INTO {new} (follower_id, followee_id, created)
+            VALUES (NEW.from_user_id, NEW.to_user_id, UTC_TIMESTAMP(6))
+        """,
+        """
+        CREATE TRIGGER follow_mirror_delete AFTER DELETE ON {old}
+        FOR EACH ROW
+            DELETE FROM {new}
+            WHERE follower_id = OLD.from_user_id AND followee_id = OLD.to_user_id
+        """,
+    ],
+}
+DROP_MIRROR_SQL = {
+    "postgresql": [
+        "DROP TRIGGER IF EXISTS follow_mirror ON {old}",
+        "DROP FUNCTION IF EXISTS follow_mirror()",
+    ],
+    "sqlite": [
+        "DROP TRIGGER IF EXISTS follow_mirror_insert",
+        "DROP TRIGGER IF EXISTS follow_mirror_delete",
+    ],
+    "mysql": [
+        "DROP TRIGGER IF EXISTS follow_mirror_insert",
+        "DROP TRIGGER IF EXISTS follow_mirror_delete",
+    ],
+}
+
+INDEXES = [
+    models.Index(
+        fields=["follower", "created"],
+        include=("followee",),
+        name="follow_follower_created_idx",
+    ),
+    models.Index(
+        fields=["followee", "created"],
+        include=("follower",),
+        name="follow_followee_created_idx",
+    ),
+]
+
+
+def run_for_vendor(schema_editor, statements):
+    quote = schema_editor.connection.ops.quote_name
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(
+            sql.format(old=quote(OLD_TABLE), new=quote("Follow")), params=None
+        )
+
+
+def install_mirror(apps, schema_editor):
+    run_for_vendor(schema_editor, MIRROR_SQL)
+
+
+def drop_mirror(apps, schema_editor):
+    run_for_vendor(schema_editor, DROP_MIRROR_SQL)
+
+
+def copy_edges(apps, schema_editor):
+    """
+    Copy the rows the old table had when the mirror was installed, one id
+    range per transaction so neither table is locked for longer than a
+    batch. Edges the mirror already wrote are skipped. On postgres the
+    copied rows are locked for the batch, so a concurrent unfollow waits
+    and its mirror then deletes the copy.
+    """
+    connection = schema_editor.connection
+    ops = connection.ops
+    quote = ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT MAX(id) FROM {0}".format(quote(OLD_TABLE)))
+        last_id = cursor.fetchone()[0] or 0
+    sql = (
+        "{insert} {new} (follower_id, followee_id, created)"
+        " SELECT from_user_id, to_user_id, %s FROM {old}"
+        " WHERE id > %s AND id <= %s{lock} {conflict}"
+    ).format(
+        insert=ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        new=quote("Follow"),
+        old=quote(OLD_TABLE),
+        lock=" FOR SHARE" if connection.vendor == "postgresql" else "",
+        conflict=ops.on_conflict_suffix_sql(None, OnConflict.IGNORE, None, None),
+    )
+    created = ops.adapt_datetimefield_value(BACKFILL_CREATED)
+    for start in range(0, last_id, BATCH_SIZE):
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [created, start, start + BATCH_SIZE])
+
+
+def add_indexes(apps, schema_editor):
+    """Built concurrently on postgres, follows stay writable meanwhile."""
+    Follow = apps.get_model("user", "Follow")
+    for index in INDEXES:
+        if schema_editor.connection.vendor == "postgresql":
+            schema_editor.add_index(Follow, index, concurrently=True)
+        else:
+            schema_editor.add_index(Follow, index)
+
+
+def remove_indexes(apps, schema_editor):
+    Follow = apps.get_model("user", "Follow")
+    for index in INDEXES:
+        if schema_editor.connection.vendor == "postgresql":
+            schema_editor.remove_index(Follow, index, concurrently=True)
+        else:
+            schema_editor.remove_index(Follow, index)
+
+
+class Migration(migrations.Migration):
+    # Each batch of the copy commits on its own and the indexes are built
+    # concurrently, neither can run in a transaction.
+    atomic = False
+
+    dependencies = [
+        ("user", "0003_follow_counts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Follow",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "followee",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="follower_edges",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "follower",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="following_edges",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "Follow",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="follow",
+            constraint=models.UniqueConstraint(
+                fields=("follower", "followee"), name="follow_unique_edge"
+            ),
+        ),
+        migrations.RunPython(install_mirror, drop_mirror),
+        migrations.RunPython(copy_edges, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name="follow", index=index) for index in INDEXES
+            ],
+            database_operations=[migrations.RunPython(add_indexes, remove_indexes)],
+        ),
+        # The old table stays, mirrored, for the servers of the previous
+        # release. Migration 0012 drops it.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(model_name="user", name="follow"),
+                migrations.AddField(
+                    model_name="user",
+                    name="follow",
+                    field=models.ManyToManyField(
+                        related_name="follow_user",
+                        through="user.Follow",
+                        through_fields=("follower", "followee"),
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0004_follow_model"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("online", True)),
+                fields=["online"],
+                name="user_online_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+FIELDS = ["email", "first_name", "last_name"]
+
+
+def index_name(field):
+    return "user_{0}_trgm_idx".format(field)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """
+    Trigram indexes on the expressions icontains compiles to, so the search
+    can use them instead of scanning the table. Built concurrently to keep
+    the table writable, sqlite has no equivalent and scans.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for field in FIELDS:
+        schema_editor.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{0}" ON "User" '
+            'USING gin ((UPPER("{1}"::text)) gin_trgm_ops)'.format(
+                index_name(field), field
+            )
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for field in FIELDS:
+        schema_editor.execute(
+            'DROP INDEX CONCURRENTLY IF EXISTS "{0}"'.format(index_name(field))
+        )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("user", "0006_token_version"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
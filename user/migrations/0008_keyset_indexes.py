@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0007_user_search_trigram"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="follow",
+            name="follow_follower_created_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="follow",
+            name="follow_followee_created_idx",
+        ),
+        migrations.AddIndex(
+            model_name="follow",
+            index=models.Index(
+                fields=["follower", "created", "id"],
+                include=("followee",),
+                name="follow_follower_keyset_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="follow",
+            index=models.Index(
+                fields=["followee", "created", "id"],
+                include=("follower",),
+                name="follow_followee_keyset_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(fields=["created", "id"], name="user_created_id_idx"),
+        ),
+    ]
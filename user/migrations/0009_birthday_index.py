@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:50
+
+from django.db import migrations, models
+
+import core.db.functions
+
+INDEX = models.Index(
+    core.db.functions.UTCMonthDayTime("birthday"), name="user_birthday_idx"
+)
+
+
+def create_birthday_index(apps, schema_editor):
+    """Built concurrently on postgres to keep the table writable."""
+    User = apps.get_model("user", "User")
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.add_index(User, INDEX, concurrently=True)
+    else:
+        schema_editor.add_index(User, INDEX)
+
+
+def drop_birthday_index(apps, schema_editor):
+    User = apps.get_model("user", "User")
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.remove_index(User, INDEX, concurrently=True)
+    else:
+        schema_editor.remove_index(User, INDEX)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("user", "0008_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_birthday_index, drop_birthday_index),
+            ],
+            state_operations=[
+                migrations.AddIndex(model_name="user", index=INDEX),
+            ],
+        ),
+    ]
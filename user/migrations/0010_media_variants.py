@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0009_birthday_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="avatar_variants",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="cover_variants",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
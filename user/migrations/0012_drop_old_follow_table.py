@@ -0,0 +1,39 @@
+from django.db import migrations
+
+OLD_TABLE = "User_follow"
+# 0004 left the table in place, written by the servers of the release before
+# it and mirrored into Follow. Apply once every server runs on Follow.
+DROP_SQL = {
+    "postgresql": [
+        "DROP TRIGGER IF EXISTS follow_mirror ON {old}",
+        "DROP FUNCTION IF EXISTS follow_mirror()",
+    ],
+    "sqlite": [
+        "DROP TRIGGER IF EXISTS follow_mirror_insert",
+        "DROP TRIGGER IF EXISTS follow_mirror_delete",
+    ],
+    "mysql": [
+        "DROP TRIGGER IF EXISTS follow_mirror_insert",
+        "DROP TRIGGER IF EXISTS follow_mirror_delete",
+    ],
+}
+
+
+def drop_old_table(apps, schema_editor):
+    quote = schema_editor.connection.ops.quote_name
+    for sql in DROP_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql.format(old=quote(OLD_TABLE)), params=None)
+    schema_editor.execute(
+        "DROP TABLE IF EXISTS {0}".format(quote(OLD_TABLE)), params=None
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0011_media_pending"),
+    ]
+
+    operations = [
+        # Irreversible: the edges made since live in Follow only.
+        migrations.RunPython(drop_old_table),
+    ]
@@ -1,93 +1,80 @@
-from cloudinary import uploader
 from cloudinary.models import CloudinaryField
 from django.contrib.auth.base_user import BaseUserManager
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import AbstractUser
 from django.core.files.uploadedfile import UploadedFile
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Lower
 from django.utils.translation import gettext_lazy as _
 
+from core.db.functions import UTCMonthDayTime
+from user import media
+from user.cache import forget_auth_state
+from user.hashing import run_hasher
+
 
 # Create your models here.
-class AvatarField(CloudinaryField):
-    def upload_options(self, instance):
-        return {
-            "folder": "{0}/avatar/".format(instance.email),
-            "resource_type": "image",
-            "quality": "auto:eco",
-        }
+class MediaField(CloudinaryField):
+    """
+    Cloudinary field that never uploads inside ``save()``. New files are
+    staged and the row keeps its previous asset (or the placeholder) until
+    the media worker has uploaded the file and written the new one back.
+    """
 
-    def pre_save(self, model_instance, add):
-        self.options = dict(
-            list(self.options.items()) + list(self.upload_options(model_instance).items())
-        )
-        value = super(CloudinaryField, self).pre_save(model_instance, add)
-        if isinstance(value, UploadedFile):
-            options = {"type": self.type, "resource_type": self.resource_type}
-            options.update(
-                {
-                    key: val(model_instance) if callable(val) else val
-                    for key, val in self.options.items()
-                }
-            )
-            if hasattr(value, "seekable") and value.seekable():
-                value.seek(0)
-            instance_value = uploader.upload_resource(value, **options)
-            setattr(model_instance, self.attname, instance_value)
-            if self.width_field:
-                setattr(
-                    model_instance, self.width_field, instance_value.metadata.get("width")
-                )
-            if self.height_field:
-                setattr(
-                    model_instance,
-                    self.height_field,
-                    instance_value.metadata.get("height"),
-                )
-            return self.get_prep_value(instance_value)
-        else:
-            return value
+    folder = None
+    placeholder = None
+
+    @property
+    def variants_attname(self):
+        """JSON column with the URL of each variant of the asset."""
+        return "{0}_variants".format(self.name)
 
+    @property
+    def pending_attname(self):
+        """Column naming the latest upload, the only one that may be attached."""
+        return "{0}_pending".format(self.name)
 
-class CoverField(CloudinaryField):
     def upload_options(self, instance):
         return {
-            "folder": "{0}/cover/".format(instance.email),
+            "folder": "{0}/{1}/".format(instance.email, self.folder),
             "resource_type": "image",
             "quality": "auto:eco",
         }
 
-    def pre_save(self, model_instance, add):
-        self.options = dict(
-            list(self.options.items()) + list(self.upload_options(model_instance).items())
+    def stored_value(self, model_instance):
+        return (
+            type(model_instance)
+            ._default_manager.filter(pk=model_instance.pk)
+            .values_list(self.attname, flat=True)
+            .first()
         )
+
+    def pre_save(self, model_instance, add):
         value = super(CloudinaryField, self).pre_save(model_instance, add)
         if isinstance(value, UploadedFile):
-            options = {"type": self.type, "resource_type": self.resource_type}
-            options.update(
-                {
-                    key: val(model_instance) if callable(val) else val
-                    for key, val in self.options.items()
-                }
-            )
-            if hasattr(value, "seekable") and value.seekable():
-                value.seek(0)
-            instance_value = uploader.upload_resource(value, **options)
-            setattr(model_instance, self.attname, instance_value)
-            if self.width_field:
-                setattr(
-                    model_instance, self.width_field, instance_value.metadata.get("width")
-                )
-            if self.height_field:
-                setattr(
-                    model_instance,
-                    self.height_field,
-                    instance_value.metadata.get("height"),
-                )
-            return self.get_prep_value(instance_value)
+            staged_name = media.stage_upload(model_instance, self, value)
+            # Saved in the same UPDATE, the pending column comes after the
+            # media field.
+            setattr(model_instance, self.pending_attname, staged_name)
+            previous = None if add else self.stored_value(model_instance)
+            value = self.to_python(previous or self.placeholder)
+            setattr(model_instance, self.attname, value)
+            return self.get_prep_value(value)
         else:
             return value
 
 
+class AvatarField(MediaField):
+    folder = "avatar"
+    placeholder = "default/avatar_default.jpg"
+
+
+class CoverField(MediaField):
+    folder = "cover"
+    placeholder = "default/cover_default.png"
+
+
 # Create your models here.
 class CustomUserManager(BaseUserManager):
     """
@@ -95,19 +82,31 @@ class CustomUserManager(BaseUserManager):
     for authentication instead of usernames.
     """
 
-    def create_user(self, email, password, **extra_fields):
-        """
-        Create and save a User with the given email and password.
-        """
+    def build_user(self, email, **extra_fields):
         if not email:
             raise ValueError(_("The Email must be set"))
         email = self.normalize_email(email)
         extra_fields.setdefault("username", email)
-        user = self.model(email=email, **extra_fields)
+        return self.model(email=email, **extra_fields)
+
+    def create_user(self, email, password, **extra_fields):
+        """
+        Create and save a User with the given email and password.
+        """
+        user = self.build_user(email, **extra_fields)
         user.set_password(password)
         user.save()
         return user
 
+    async def acreate_user(self, email, password, **extra_fields):
+        """
+        Async create_user, the password is hashed in the hashing pool.
+        """
+        user = self.build_user(email, **extra_fields)
+        user.password = await run_hasher(make_password, password)
+        await user.asave()
+        return user
+
     def create_superuser(self, email, password, **extra_fields):
         """
         Create and save a SuperUser with the given email and password.
@@ -126,8 +125,16 @@ class User(AbstractUser):
     email = models.EmailField(max_length=100, unique=True)
     first_name = models.CharField("first name", max_length=150, blank=True)
     last_name = models.CharField("last name", max_length=150, blank=True)
-    cover = CoverField()
-    avatar = AvatarField()
+    cover = CoverField(default=CoverField.placeholder)
+    avatar = AvatarField(default=AvatarField.placeholder)
+    # {variant: {format: url}} of the current asset, written with it by the
+    # media worker. Empty for placeholders, see media.variant_urls.
+    cover_variants = models.JSONField(default=dict, blank=True)
+    avatar_variants = models.JSONField(default=dict, blank=True)
+    # Name of the latest upload of the field, staged or signed. An older one
+    # finishing after it is not written over it.
+    cover_pending = models.CharField(max_length=255, blank=True, default="")
+    avatar_pending = models.CharField(max_length=255, blank=True, default="")
     MALE = "male"
     FEMALE = "female"
     NONBINARY = "nonbinary"
@@ -139,7 +146,17 @@ class User(AbstractUser):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     online = models.BooleanField(default=False)
-    follow = models.ManyToManyField("User", related_name="follow_user")
+    follow = models.ManyToManyField(
+        "User",
+        through="Follow",
+        through_fields=("follower", "followee"),
+        related_name="follow_user",
+    )
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Access tokens carry the version they were issued for, bumping it
+    # revokes every token of the user.
+    token_version = models.PositiveIntegerField(default=0)
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["first_name", "last_name", "birthday", "gender"]
     objects = CustomUserManager()
@@ -147,8 +164,60 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        media.schedule_staged_uploads(self)
+        forget_auth_state(self.pk)
+
     class Meta:
         db_table = "User"
+        constraints = [
+            models.UniqueConstraint(Lower("email"), name="user_email_ci_unique"),
+        ]
+        indexes = [
+            # Lets the presence flush find users still marked online.
+            models.Index(
+                fields=["online"], condition=Q(online=True), name="user_online_idx"
+            ),
+            # Default keyset ordering of user lists.
+            models.Index(fields=["created", "id"], name="user_created_id_idx"),
+            # Birthdays of the day by the minute, see user.birthdays.
+            models.Index(UTCMonthDayTime("birthday"), name="user_birthday_idx"),
+            # The trigram indexes of the user search are postgres only and
+            # created by migration 0007.
+        ]
+
+
+class Follow(models.Model):
+    follower = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="following_edges"
+    )
+    followee = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="follower_edges"
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "Follow"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["follower", "followee"], name="follow_unique_edge"
+            ),
+        ]
+        # "Who do I follow" and "who follows me", newest first and keyset
+        # paged on (created, id), answered from the index alone on postgres.
+        indexes = [
+            models.Index(
+                fields=["follower", "created", "id"],
+                include=["followee"],
+                name="follow_follower_keyset_idx",
+            ),
+            models.Index(
+                fields=["followee", "created", "id"],
+                include=["follower"],
+                name="follow_followee_keyset_idx",
+            ),
+        ]
 
 
 # class Profile(models.Model):
@@ -0,0 +1,26 @@
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+logger = logging.getLogger(__name__)
+
+
+def user_group(user_id):
+    return "user_{0}".format(user_id)
+
+
+def notify_user(user_id, event, payload):
+    """
+    Push an event to every open socket of the user. Delivery is best effort,
+    the caller has already committed whatever the event describes.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            user_group(user_id), {"type": "user.event", "event": event, "data": payload}
+        )
+    except Exception:
+        logger.exception("Could not notify user %s about %s", user_id, event)
@@ -0,0 +1,16 @@
+from core.pagination import KeysetPagination
+
+
+class FollowPagination(KeysetPagination):
+    ordering = ("-followed_at", "-edge_id")
+
+
+class UserSearchPagination(KeysetPagination):
+    # rank is computed per row by search_users, no index serves this order:
+    # every page matches, ranks and sorts all the users the query finds, then
+    # skips to the cursor. A page costs the same at any depth, but not less
+    # than the whole match set. The trigram filter keeps that set small for
+    # queries of MIN_QUERY_LENGTH characters or more, and USER_SEARCH_TIMEOUT
+    # cancels the rest. Keying on an indexed column within rank tiers would
+    # make a query per tier, for searches that rarely get past page one.
+    ordering = ("-rank", "-id")
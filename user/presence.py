@@ -0,0 +1,113 @@
+import time
+
+from django.conf import settings
+
+from core.redis import get_redis
+from user.models import User
+
+CHANGED_KEY = "presence:changed"
+CHUNK_SIZE = 500
+
+
+def presence_key(user_id):
+    """
+    Sorted set of the user's sockets, each scored with the time its last
+    heartbeat expires. A socket that vanished without disconnecting drops
+    out on its own, the others keep the user online.
+    """
+    return "presence:{0}".format(user_id)
+
+
+def touch(user_id, connection):
+    """Refresh one socket, returns True when it is the user's only one."""
+    now = time.time()
+    key = presence_key(user_id)
+    pipe = get_redis().pipeline()
+    pipe.zremrangebyscore(key, "-inf", now)
+    pipe.zadd(key, {connection: now + settings.PRESENCE_TTL})
+    pipe.expire(key, settings.PRESENCE_TTL)
+    pipe.zcard(key)
+    _, added, _, sockets = pipe.execute()
+    came_online = bool(added) and sockets == 1
+    if came_online:
+        get_redis().sadd(CHANGED_KEY, user_id)
+    return came_online
+
+
+def connect(user_id, connection):
+    """Count a new socket of the user, returns True when they came online."""
+    return touch(user_id, connection)
+
+
+def heartbeat(user_id, connection):
+    # A socket whose heartbeat expired comes back, counted once.
+    touch(user_id, connection)
+
+
+def disconnect(user_id, connection):
+    """Forget one socket of the user, returns True when they went offline."""
+    key = presence_key(user_id)
+    pipe = get_redis().pipeline()
+    pipe.zrem(key, connection)
+    pipe.zremrangebyscore(key, "-inf", time.time())
+    pipe.zcard(key)
+    _, _, sockets = pipe.execute()
+    if sockets > 0:
+        return False
+    # Redis already dropped the empty set. Deleting it here would also drop
+    # a socket that connected since.
+    get_redis().sadd(CHANGED_KEY, user_id)
+    return True
+
+
+def online_status(ids):
+    if not ids:
+        return {}
+    now = time.time()
+    pipe = get_redis().pipeline()
+    for user_id in ids:
+        pipe.zcount(presence_key(user_id), now, "+inf")
+    return {user_id: sockets > 0 for user_id, sockets in zip(ids, pipe.execute())}
+
+
+def is_online(user_id):
+    return online_status([user_id])[user_id]
+
+
+def write_status(ids):
+    status = online_status(ids)
+    online = [user_id for user_id, value in status.items() if value]
+    offline = [user_id for user_id, value in status.items() if not value]
+    # update() leaves the auto_now "updated" column alone.
+    return User.objects.filter(pk__in=online, online=False).update(
+        online=True
+    ) + User.objects.filter(pk__in=offline, online=True).update(online=False)
+
+
+def flush_presence():
+    """
+    Write presence changes back to User.online. Only users whose state
+    changed since the last flush are touched, plus users marked online whose
+    heartbeat expired without a clean disconnect.
+    """
+    written = 0
+    while True:
+        changed = get_redis().spop(CHANGED_KEY, CHUNK_SIZE)
+        if not changed:
+            break
+        written += write_status([int(user_id) for user_id in changed])
+
+    last_id = 0
+    while True:
+        ids = list(
+            User.objects.filter(online=True, pk__gt=last_id)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:CHUNK_SIZE]
+        )
+        expired = [user_id for user_id, value in online_status(ids).items() if not value]
+        if expired:
+            written += User.objects.filter(pk__in=expired).update(online=False)
+        if len(ids) < CHUNK_SIZE:
+            break
+        last_id = ids[-1]
+    return written
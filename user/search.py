@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, Exists, IntegerField, OuterRef, Q, Value, When
+
+from user.models import Follow, User
+
+SEARCH_FIELDS = ["email", "first_name", "last_name"]
+# Trigram indexes cannot narrow down shorter queries.
+MIN_QUERY_LENGTH = 3
+QUERY_CANCELED = "57014"
+
+
+def search_users(user_id, query):
+    """
+    Active users matching ``query``, without ``user_id`` and the users they
+    already follow. Exact emails rank first, then name prefixes, then any
+    substring match. On postgres the substring match is served by the
+    trigram indexes of migration 0007.
+    """
+    matches = Q()
+    for field in SEARCH_FIELDS:
+        matches |= Q(**{"{0}__icontains".format(field): query})
+
+    followed = Follow.objects.filter(follower_id=user_id, followee_id=OuterRef("pk"))
+    return (
+        User.objects.filter(matches, is_active=True)
+        .exclude(pk=user_id)
+        .exclude(Exists(followed))
+        .annotate(
+            rank=Case(
+                When(email__iexact=query, then=Value(3)),
+                When(
+                    Q(first_name__istartswith=query) | Q(last_name__istartswith=query),
+                    then=Value(2),
+                ),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        )
+    )
+
+
+def set_search_timeout(using):
+    """
+    Cancel the search query once it exceeds the latency budget. Must run
+    inside the transaction of the query, on the database it is sent to; only
+    postgres supports it.
+    """
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SET LOCAL statement_timeout = %s", [settings.USER_SEARCH_TIMEOUT]
+            )
+
+
+def is_query_canceled(exc):
+    return getattr(exc.__cause__, "pgcode", None) == QUERY_CANCELED
@@ -1,27 +1,47 @@
 from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 from rest_framework.serializers import raise_errors_on_nested_writes
 from rest_framework.utils import model_meta
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from user import images, media
+from user.logins import record_login
 from user.models import User
 
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     default_error_messages = {"no_active_account": _("Wrong Email or Password")}
 
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["email"] = user.email
+        token["ver"] = user.token_version
+        return token
+
+    @classmethod
+    def token_data(cls, user):
+        """Response body of a successful login."""
+        refresh = cls.get_token(user)
+        return {
+            "refresh": str(refresh),
+            "access": str(refresh.access_token),
+            "id": user.id,
+            "user": user.email,
+            "access_expires": int(
+                settings.SIMPLE_JWT["ACCESS_TOKEN_LIFETIME"].total_seconds()
+            ),
+            "refresh_expires": int(
+                settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"].total_seconds()
+            ),
+        }
+
     def validate(self, attrs):
-        data = super().validate(attrs)
-        data["id"] = self.user.id
-        data["user"] = self.user.email
-        data["access_expires"] = int(
-            settings.SIMPLE_JWT["ACCESS_TOKEN_LIFETIME"].total_seconds()
-        )
-        data["refresh_expires"] = int(
-            settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"].total_seconds()
-        )
-        return data
+        super(TokenObtainPairSerializer, self).validate(attrs)
+        record_login(self.user.pk)
+        return self.token_data(self.user)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -37,7 +57,9 @@ class UserSerializer(serializers.ModelSerializer):
             "last_name",
             "online",
         ]
-        extra_kwargs = {"password": {"write_only": True}}
+        # Uniqueness is enforced by the case-insensitive index, the view turns
+        # the IntegrityError into a 400 instead of querying beforehand.
+        extra_kwargs = {"password": {"write_only": True}, "email": {"validators": []}}
 
     def create(self, validated_data):
         instance = self.Meta.model.objects.create_user(**validated_data)
@@ -45,9 +67,26 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
+    # {format: srcset} of the sizes the images were derived in.
+    avatar_srcset = serializers.SerializerMethodField()
+    cover_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = User
-        fields = "__all__"
+        # Relations are paginated by their own endpoints, the profile only
+        # carries the counters stored on the row.
+        exclude = [
+            "follow",
+            "groups",
+            "user_permissions",
+            "avatar_variants",
+            "cover_variants",
+            "avatar_pending",
+            "cover_pending",
+            # Only bumped by password changes, it revokes issued tokens.
+            "token_version",
+        ]
+        read_only_fields = ["followers_count", "following_count"]
         extra_kwargs = {
             "password": {"write_only": True},
         }
@@ -56,6 +95,26 @@ class UserProfileSerializer(serializers.ModelSerializer):
         instance = self.Meta.model.objects.create_user(**validated_data)
         return instance
 
+    def validate_image(self, value):
+        if isinstance(value, UploadedFile):
+            try:
+                images.inspect(value, settings.MEDIA_MAX_PIXELS)
+            except images.ImageRejected as error:
+                raise serializers.ValidationError(str(error))
+        return value
+
+    def validate_avatar(self, value):
+        return self.validate_image(value)
+
+    def validate_cover(self, value):
+        return self.validate_image(value)
+
+    def get_avatar_srcset(self, user):
+        return media.srcset("avatar", media.instance_variants(user, "avatar"))
+
+    def get_cover_srcset(self, user):
+        return media.srcset("cover", media.instance_variants(user, "cover"))
+
     def update(self, instance, validated_data):
         raise_errors_on_nested_writes("update", self, validated_data)
         info = model_meta.get_field_info(instance)
@@ -73,15 +132,48 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
         if "password" in validated_data.keys():
             instance.set_password(validated_data.pop("password"))
+            # Tokens issued for the old password stop working.
+            instance.token_version += 1
 
         instance.save()
         return instance
 
 
-class FollowUserSerializer(serializers.ModelSerializer):
+class UserSummarySerializer(serializers.ModelSerializer):
+    # {format: url} of the avatar thumbnail, what lists show.
+    avatar_thumb = serializers.SerializerMethodField()
+
     class Meta:
         model = User
-        fields = ["id", "email", "follow"]
+        fields = [
+            "id",
+            "email",
+            "first_name",
+            "last_name",
+            "avatar",
+            "avatar_thumb",
+            "online",
+        ]
+
+    def get_avatar_thumb(self, user):
+        return media.instance_variants(user, "avatar").get("thumb", {})
+
+
+class UserIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500
+    )
+
+
+class DirectUploadSerializer(serializers.Serializer):
+    field = serializers.ChoiceField(choices=["avatar", "cover"])
+
+
+class ConfirmUploadSerializer(DirectUploadSerializer):
+    public_id = serializers.CharField(max_length=255)
+    version = serializers.CharField(max_length=20)
+    format = serializers.CharField(max_length=10)
+    signature = serializers.CharField(max_length=128)
 
 
 class MuteNotifyUserSerializer(serializers.ModelSerializer):
@@ -1,9 +1,65 @@
 from celery import shared_task
-from django.core.mail import EmailMessage
+from django.apps import apps
+from django.conf import settings
+
+from user import birthdays, follows, logins, mail, media, presence
 
 
 @shared_task
 def send_email(mail_subject, messages, recipients):
-    email = EmailMessage(mail_subject, messages, to=recipients)
-    email.content_subtype = "html"
-    email.send(fail_silently=True)
+    return mail.queue_email(mail_subject, messages, recipients)
+
+
+@shared_task
+def dispatch_emails_task():
+    return mail.dispatch_emails()
+
+
+@shared_task(
+    bind=True,
+    max_retries=5,
+    soft_time_limit=settings.MEDIA_UPLOAD_TIME_LIMIT,
+    time_limit=settings.MEDIA_UPLOAD_TIME_LIMIT + 10,
+)
+def process_media_upload(self, user_id, field_name, staged_name):
+    model = apps.get_model("user", "User")
+    try:
+        return media.process_upload(model, user_id, field_name, staged_name)
+    except Exception as exc:
+        if self.request.retries >= self.max_retries:
+            # Given up, the staged file would never be read again.
+            media.staging_storage().delete(staged_name)
+            raise
+        raise self.retry(exc=exc, countdown=2**self.request.retries)
+
+
+@shared_task
+def rebuild_follow_cache_task(user_id):
+    follows.rebuild_follow_cache(user_id)
+
+
+@shared_task
+def flush_presence_task():
+    return presence.flush_presence()
+
+
+@shared_task
+def flush_last_logins_task():
+    return logins.flush_last_logins()
+
+
+@shared_task
+def birthdays_task():
+    return birthdays.send_birthdays()
+
+
+@shared_task
+def greet_birthdays_task(user_ids):
+    return birthdays.greet_birthdays(user_ids)
+
+
+@shared_task
+def notify_birthday_followers_task(user_id, payload, after=None):
+    after = birthdays.notify_followers(user_id, payload, after)
+    if after is not None:
+        notify_birthday_followers_task.delay(user_id, payload, after)
@@ -0,0 +1,153 @@
+"""
+Tests for the async profile, registration and password reset views.
+"""
+
+import os
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.redis import get_redis
+from user import authentication
+from user.models import User
+from user.serializers import MyTokenObtainPairSerializer
+
+REGISTER_URL = reverse("user:register")
+PROFILE_URL = reverse("user:profile")
+REQUEST_RESET_URL = reverse("user:request_reset_password")
+
+
+class AsyncViewTests(TestCase):
+    """
+    Test the views on the event loop: a sync ORM call there raises, as
+    DJANGO_ALLOW_ASYNC_UNSAFE is not set.
+    """
+
+    def setUp(self):
+        get_redis().flushdb()
+        cache.clear()
+        authentication._local_states.clear()
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            password="goodpass",
+            first_name="Test",
+            birthday="2001-02-05T00:00:00Z",
+        )
+
+    def auth(self, user):
+        token = MyTokenObtainPairSerializer.get_token(user).access_token
+        return {"Authorization": "Bearer {0}".format(token)}
+
+    def test_async_unsafe_not_allowed(self):
+        self.assertNotIn("DJANGO_ALLOW_ASYNC_UNSAFE", os.environ)
+
+    async def test_profile(self):
+        res = await self.async_client.get(PROFILE_URL, headers=self.auth(self.user))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["first_name"], "Test")
+        self.assertNotIn("password", res.json())
+
+    async def test_profile_bad_token(self):
+        res = await self.async_client.get(
+            PROFILE_URL, headers={"Authorization": "Bearer abc"}
+        )
+
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(res["WWW-Authenticate"], 'Bearer realm="api"')
+
+    async def test_people_profile_not_found(self):
+        url = reverse("user:people_profile", args=[self.user.pk + 1])
+
+        res = await self.async_client.get(url)
+
+        self.assertEqual(res.status_code, 404)
+
+    async def test_register(self):
+        res = await self.async_client.post(
+            REGISTER_URL,
+            {
+                "email": "new@example.com",
+                "password": "testpass123",
+                "confirm_password": "testpass123",
+                "gender": "male",
+                "birthday": "2001-02-05T00:00:00Z",
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(res.status_code, 201)
+        user = await User.objects.aget(email="new@example.com")
+        self.assertEqual(res.json(), {"token": user.pk})
+        self.assertEqual(user.username, "new@example.com")
+        self.assertTrue(user.check_password("testpass123"))
+
+    async def test_register_invalid(self):
+        res = await self.async_client.post(
+            REGISTER_URL,
+            {
+                "email": "bad",
+                "password": "testpass123",
+                "confirm_password": "testpass123",
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("email", res.json())
+
+    async def request_reset(self):
+        res = await self.async_client.post(
+            REQUEST_RESET_URL,
+            {"email": self.user.email},
+            content_type="application/json",
+        )
+        data = res.json()
+        return reverse("user:reset_password", args=[data["uid"], data["token"]])
+
+    async def test_reset_password(self):
+        url = await self.request_reset()
+        headers = self.auth(self.user)
+
+        res = await self.async_client.get(url)
+        self.assertTrue(res.json()["status"])
+
+        res = await self.async_client.post(
+            url,
+            {"password": "newpass123", "confirm_password": "newpass123"},
+            content_type="application/json",
+        )
+
+        self.assertEqual(res.json()["status"], 1)
+        user = await User.objects.aget(pk=self.user.pk)
+        self.assertTrue(user.check_password("newpass123"))
+        self.assertEqual(user.token_version, self.user.token_version + 1)
+        authentication._local_states.clear()
+        res = await self.async_client.get(PROFILE_URL, headers=headers)
+        self.assertEqual(res.status_code, 401)
+        # The link is spent once the password changed.
+        res = await self.async_client.get(url)
+        self.assertFalse(res.json()["status"])
+
+    async def test_reset_password_needs_token(self):
+        url = await self.request_reset()
+        forged = url.rsplit("/", 1)[0] + "/forged-token"
+
+        res = await self.async_client.post(
+            forged,
+            {"password": "newpass123", "confirm_password": "newpass123"},
+            content_type="application/json",
+        )
+
+        self.assertEqual(res.json()["status"], -1)
+        user = await User.objects.aget(pk=self.user.pk)
+        self.assertTrue(user.check_password("goodpass"))
+
+    async def test_reset_link_forged_uid(self):
+        url = reverse("user:reset_password", args=["1:forged", "token"])
+
+        res = await self.async_client.get(url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(res.json()["status"])
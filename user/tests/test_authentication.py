@@ -0,0 +1,107 @@
+"""
+Tests for the stateless JWT authentication.
+"""
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import authentication
+from user.models import User
+from user.serializers import MyTokenObtainPairSerializer
+
+PROFILE_URL = reverse("user:profile")
+UPDATE_PROFILE_URL = reverse("user:update_profile")
+
+
+class StatelessAuthenticationTests(TestCase):
+    """Test tokens are checked without loading the user row."""
+
+    def setUp(self):
+        cache.clear()
+        authentication._local_states.clear()
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            password="goodpass",
+            first_name="Test",
+            birthday="2001-02-05T00:00:00Z",
+        )
+        self.client = APIClient()
+        self.authorize(self.user)
+
+    def authorize(self, user):
+        token = MyTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer {0}".format(token))
+
+    def forget_local_state(self):
+        authentication._local_states.clear()
+
+    def test_cached_profile_needs_no_query(self):
+        """Test a warm profile is served without touching the database."""
+        self.client.get(PROFILE_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(PROFILE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()["first_name"], "Test")
+
+    def test_revoked_token_rejected(self):
+        """Test bumping the token version revokes issued tokens."""
+        self.user.token_version += 1
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.forget_local_state()
+
+        res = self.client.get(PROFILE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.authorize(self.user)
+        self.assertEqual(self.client.get(PROFILE_URL).status_code, status.HTTP_200_OK)
+
+    def test_password_change_revokes_tokens(self):
+        """Test changing the password through the profile revokes issued tokens."""
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.patch(UPDATE_PROFILE_URL, {"password": "newpass"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.forget_local_state()
+
+        res = self.client.get(PROFILE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_version_hidden_and_read_only(self):
+        """Test the token version can neither be read nor set by clients."""
+        res = self.client.patch(UPDATE_PROFILE_URL, {"token_version": 7})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn("token_version", res.json())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.token_version, 0)
+        public = self.client.get(reverse("user:people_profile", args=[self.user.pk]))
+        self.assertNotIn("token_version", public.json())
+
+    def test_deactivated_user_rejected(self):
+        """Test deactivating a user takes effect once the local state expires."""
+        self.client.get(PROFILE_URL)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.forget_local_state()
+
+        res = self.client.get(PROFILE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_claims_user_loads_model_on_demand(self):
+        """Test the model is loaded once for fields outside the claims."""
+        state = authentication.get_auth_state(self.user.pk)
+        user = authentication.ClaimsUser(state)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(user.email, self.user.email)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.first_name, "Test")
+            self.assertEqual(user.gender, self.user.gender)
@@ -0,0 +1,58 @@
+"""
+Tests for the API benchmark baseline.
+"""
+
+import json
+import os
+import sys
+import tempfile
+from unittest import mock
+
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from user.bench import offline
+from user.management.commands.bench_api import Command
+
+RESULT = {"requests": 10, "p50_ms": 5.0, "p95_ms": 8.0, "queries": 2.0, "bytes": 500}
+
+
+class BaselineTests(SimpleTestCase):
+    """Test a run is compared against the saved baseline."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "baseline.json")
+        self.command = Command()
+        self.command.save(self.path, {"profile": RESULT})
+
+    def test_saved_baseline(self):
+        with open(self.path) as baseline:
+            self.assertEqual(json.load(baseline), {"profile": RESULT})
+
+    def test_within_tolerance(self):
+        """Test small slowdowns pass."""
+        result = dict(RESULT, p95_ms=9.0)
+
+        self.command.compare(self.path, {"profile": result}, 0.25)
+
+    def test_regressions_flagged(self):
+        """Test slower responses and extra queries fail the run."""
+        result = dict(RESULT, p95_ms=20.0, queries=3.0)
+
+        with self.assertRaises(CommandError) as error:
+            self.command.compare(self.path, {"profile": result}, 0.25)
+
+        self.assertIn("p95 20.0 ms", str(error.exception))
+        self.assertIn("3.0 queries", str(error.exception))
+
+
+class OfflineTests(SimpleTestCase):
+    """Test the benchmarks say what is missing to run offline."""
+
+    def test_missing_fakeredis(self):
+        with mock.patch.dict(sys.modules, {"fakeredis": None}):
+            with self.assertRaisesMessage(CommandError, "pip install fakeredis"):
+                with offline():
+                    pass
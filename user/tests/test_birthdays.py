@@ -0,0 +1,136 @@
+"""
+Tests for the birthday greetings.
+"""
+
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+
+from core.db.functions import UTCMonthDayTime
+from core.redis import get_redis
+from user import birthdays
+from user.mail import QUEUE_KEY
+from user.models import Follow, User
+
+# Midnight of February 5th in UTC+7.
+BUCKET = datetime(2026, 2, 4, 17, 0, tzinfo=dt_timezone.utc)
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class BirthdayTests(TestCase):
+    """Test birthdays are found by local midnight and greeted in chunks."""
+
+    def setUp(self):
+        get_redis().flushdb()
+        self.count = 0
+
+    def user(self, birthday, **fields):
+        self.count += 1
+        return User.objects.create(
+            email="user{0}@example.com".format(self.count),
+            username="user{0}".format(self.count),
+            first_name="User{0}".format(self.count),
+            birthday=birthday,
+            **fields,
+        )
+
+    def test_month_day_time(self):
+        user = self.user(utc(2001, 2, 4, 17, 30))
+
+        value = (
+            User.objects.annotate(value=UTCMonthDayTime("birthday"))
+            .values_list("value", flat=True)
+            .get(pk=user.pk)
+        )
+
+        self.assertEqual(value, 2041730)
+        self.assertEqual(birthdays.month_day_time(user.birthday), value)
+
+    def test_birthdays_in_bucket(self):
+        midnight = self.user(utc(2001, 2, 4, 17, 0))
+        # Midnight in UTC+6:15.
+        quarter_past = self.user(utc(1990, 2, 4, 17, 14))
+        self.user(utc(2001, 2, 4, 17, 15))
+        self.user(utc(2001, 2, 5, 17, 0))
+        self.user(utc(2001, 2, 4, 17, 0), is_active=False)
+
+        self.assertEqual(set(birthdays.birthdays_in(BUCKET)), {midnight, quarter_past})
+
+    def test_leap_day_in_common_year(self):
+        leap = self.user(utc(2000, 2, 29, 0, 0))
+
+        self.assertEqual(list(birthdays.birthdays_in(utc(2027, 2, 28, 0, 0))), [leap])
+        self.assertEqual(list(birthdays.birthdays_in(utc(2028, 2, 28, 0, 0))), [])
+        self.assertEqual(list(birthdays.birthdays_in(utc(2028, 2, 29, 0, 0))), [leap])
+
+    def test_uses_index(self):
+        sql, params = birthdays.birthdays_in(BUCKET).query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+
+        self.assertIn("user_birthday_idx", plan)
+
+    def test_due_buckets_catch_up(self):
+        now = utc(2026, 2, 4, 17, 5)
+        self.assertEqual(birthdays.due_buckets(now), [BUCKET])
+
+        get_redis().set(birthdays.LAST_BUCKET_KEY, utc(2026, 2, 4, 16, 30).isoformat())
+        self.assertEqual(birthdays.due_buckets(now), [utc(2026, 2, 4, 16, 45), BUCKET])
+
+        get_redis().set(birthdays.LAST_BUCKET_KEY, utc(2026, 1, 1).isoformat())
+        self.assertEqual(len(birthdays.due_buckets(now)), 24 * 4 + 1)
+
+    @mock.patch("user.mail.schedule_dispatch")
+    @mock.patch("user.birthdays.notify_user")
+    def test_send_birthdays(self, notify_user, schedule_dispatch):
+        user = self.user(utc(2001, 2, 4, 17, 0))
+        followers = [self.user(utc(2001, 6, 1)) for _ in range(5)]
+        for follower in followers:
+            Follow.objects.create(follower=follower, followee=user)
+        User.objects.filter(pk=user.pk).update(followers_count=len(followers))
+
+        with mock.patch.object(birthdays, "FOLLOWER_CHUNK_SIZE", 2):
+            self.assertEqual(birthdays.send_birthdays(BUCKET + timedelta(minutes=3)), 1)
+
+        self.assertEqual(get_redis().llen(QUEUE_KEY), 1)
+        self.assertEqual(
+            sorted(call.args[0] for call in notify_user.call_args_list),
+            sorted(follower.pk for follower in followers),
+        )
+        self.assertEqual(notify_user.call_args.args[1], "birthday")
+        self.assertEqual(notify_user.call_args.args[2]["id"], user.pk)
+        # The bucket is done, the next run of the same quarter finds nothing.
+        self.assertEqual(birthdays.send_birthdays(BUCKET + timedelta(minutes=10)), 0)
+        self.assertEqual(get_redis().llen(QUEUE_KEY), 1)
+
+    def test_locked(self):
+        self.user(utc(2001, 2, 4, 17, 0))
+        get_redis().set(birthdays.LOCK_KEY, 1)
+
+        self.assertEqual(birthdays.send_birthdays(BUCKET), 0)
+
+    @mock.patch("user.mail.schedule_dispatch")
+    def test_bucket_greeted_once(self, schedule_dispatch):
+        """Test a run with a stale marker skips buckets another run greeted."""
+        self.user(utc(2001, 2, 4, 17, 0))
+        self.assertEqual(birthdays.send_birthdays(BUCKET + timedelta(minutes=3)), 1)
+
+        get_redis().set(birthdays.LAST_BUCKET_KEY, utc(2026, 2, 4, 16, 0).isoformat())
+
+        self.assertEqual(birthdays.send_birthdays(BUCKET + timedelta(minutes=5)), 0)
+        self.assertEqual(get_redis().llen(QUEUE_KEY), 1)
+
+    def test_lock_of_another_run_kept(self):
+        get_redis().set(birthdays.LOCK_KEY, "other")
+
+        birthdays.send_birthdays(BUCKET)
+
+        self.assertEqual(get_redis().get(birthdays.LOCK_KEY), b"other")
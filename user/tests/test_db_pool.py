@@ -0,0 +1,190 @@
+"""
+Tests for the database connection pool.
+"""
+
+import os
+import runpy
+import sqlite3
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase
+
+from core.db import pool as db_pool
+from core.db.backends.postgresql.base import DatabaseWrapper
+from core.db.pool import ConnectionPool
+
+CONFIG = os.path.join(settings.BASE_DIR, "core", "config", "database.py")
+
+
+def connect():
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test connections are reused, bounded and replaced."""
+
+    def test_reuse(self):
+        pool = ConnectionPool("test")
+
+        first = pool.acquire(connect)
+        pool.release(first)
+        second = pool.acquire(connect)
+
+        self.assertIs(first, second)
+        self.assertEqual(pool.stats()["opened"], 1)
+        self.assertEqual(pool.stats()["in_use"], 1)
+
+    def test_waits_for_release(self):
+        pool = ConnectionPool("test", max_size=1, timeout=5)
+        first = pool.acquire(connect)
+        acquired = []
+        thread = threading.Thread(target=lambda: acquired.append(pool.acquire(connect)))
+
+        thread.start()
+        threading.Timer(0.05, pool.release, [first]).start()
+        thread.join()
+
+        self.assertEqual(acquired, [first])
+        self.assertEqual(pool.stats()["waits"], 1)
+
+    def test_timeout(self):
+        pool = ConnectionPool("test", max_size=1, timeout=0.01)
+        pool.acquire(connect)
+
+        with self.assertRaises(OperationalError):
+            pool.acquire(connect)
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_failed_connect_frees_slot(self):
+        pool = ConnectionPool("test", max_size=1)
+
+        with self.assertRaises(sqlite3.OperationalError):
+            pool.acquire(mock.Mock(side_effect=sqlite3.OperationalError))
+        pool.acquire(connect)
+
+        self.assertEqual(pool.stats()["size"], 1)
+
+    def test_unusable_discarded(self):
+        pool = ConnectionPool("test")
+        first = pool.acquire(connect)
+
+        pool.release(first, reusable=False)
+
+        self.assertEqual(pool.stats()["size"], 0)
+        self.assertIsNot(pool.acquire(connect), first)
+
+    def test_broken_idle_replaced(self):
+        pool = ConnectionPool("test", check_after=0)
+        first = pool.acquire(connect)
+        pool.release(first)
+        # The database went away while the connection was idle.
+        first.close()
+
+        second = pool.acquire(connect)
+
+        self.assertIsNot(second, first)
+        self.assertEqual(pool.stats()["closed"], 1)
+
+    def test_max_lifetime(self):
+        pool = ConnectionPool("test", max_lifetime=0)
+        first = pool.acquire(connect)
+        pool.release(first)
+
+        self.assertIsNot(pool.acquire(connect), first)
+
+    def test_fork(self):
+        pool = ConnectionPool("test")
+        pool.release(pool.acquire(connect))
+
+        with mock.patch("os.getpid", return_value=os.getpid() + 1):
+            self.assertEqual(pool.stats()["idle"], 1)
+            pool.acquire(connect)
+
+        self.assertEqual(pool.stats()["opened"], 1)
+        self.assertEqual(pool.stats()["idle"], 0)
+
+
+class PooledDatabaseWrapperTests(SimpleTestCase):
+    """Test backends without a reuse check of their own ping the connection."""
+
+    def test_live_connection_reusable(self):
+        connection = connect()
+        wrapper = db_pool.PooledDatabaseWrapper()
+
+        self.assertTrue(wrapper.reusable(connection))
+        connection.close()
+        self.assertFalse(wrapper.reusable(connection))
+
+
+class PostgresBackendTests(SimpleTestCase):
+    """Test the pooled postgres backend hands connections back."""
+
+    def setUp(self):
+        self.addCleanup(db_pool._pools.pop, "pooled", None)
+        self.wrapper = DatabaseWrapper(
+            {
+                **settings.DATABASES["default"],
+                "ENGINE": "core.db.backends.postgresql",
+                "POOL": {"MAX_SIZE": 2},
+            },
+            "pooled",
+        )
+
+    def connection(self, transaction_status=0):
+        connection = mock.Mock(closed=0)
+        connection.info.transaction_status = transaction_status
+        return connection
+
+    def test_close_releases(self):
+        connection = self.connection()
+        self.wrapper.pool.acquire(lambda: connection)
+        self.wrapper.connection = connection
+
+        self.wrapper.close()
+
+        self.assertIsNone(self.wrapper.connection)
+        self.assertEqual(self.wrapper.pool.stats()["idle"], 1)
+        connection.close.assert_not_called()
+
+    def test_open_transaction_rolled_back(self):
+        connection = self.connection(transaction_status=2)
+
+        self.assertTrue(self.wrapper.reusable(connection))
+        connection.rollback.assert_called_once()
+
+    def test_closed_not_reusable(self):
+        connection = self.connection()
+        connection.closed = 1
+
+        self.assertFalse(self.wrapper.reusable(connection))
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    """Test persistent and pooled connections are configured from the environment."""
+
+    def load(self, **environ):
+        environ = {"DB_ENGINE": "postgresql", "DB_NAME": "api", **environ}
+        with mock.patch.dict(os.environ, environ):
+            return runpy.run_path(CONFIG)["DATABASES"]["default"]
+
+    def test_persistent_for_wsgi(self):
+        database = self.load(SERVER_INTERFACE="wsgi", DB_POOL_SIZE="0")
+
+        self.assertEqual(database["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual(database["CONN_MAX_AGE"], 60)
+        self.assertTrue(database["CONN_HEALTH_CHECKS"])
+
+    def test_pool(self):
+        database = self.load(SERVER_INTERFACE="asgi", DB_POOL_SIZE="8")
+
+        self.assertEqual(database["ENGINE"], "core.db.backends.postgresql")
+        self.assertEqual(database["CONN_MAX_AGE"], 0)
+        self.assertEqual(database["POOL"]["MAX_SIZE"], 8)
+
+    def test_sslmode(self):
+        database = self.load(ENVIRONMENT="staging", DB_SSLMODE="verify-full")
+
+        self.assertEqual(database["OPTIONS"], {"sslmode": "verify-full"})
@@ -0,0 +1,249 @@
+"""
+Tests for direct uploads to storage, signed by the API.
+"""
+
+import json
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+import cloudinary
+from cloudinary import utils
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.redis import get_redis
+from user import authentication
+from user.models import User
+from user.serializers import MyTokenObtainPairSerializer
+
+UPLOAD_URL = reverse("user:direct_upload")
+CONFIRM_URL = reverse("user:confirm_upload")
+NOTIFY_URL = reverse("user:upload_notify")
+
+
+class DirectUploadTests(TestCase):
+    """Test the upload flow against the local stand-in for Cloudinary."""
+
+    def setUp(self):
+        get_redis().flushdb()
+        cache.clear()
+        authentication._local_states.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, MEDIA_UPLOAD_BACKEND="user.media.LocalBackend"
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            password="goodpass",
+            birthday="2001-02-05T00:00:00Z",
+        )
+        self.other = User.objects.create_user(
+            email="other@example.com",
+            password="goodpass",
+            birthday="2001-02-05T00:00:00Z",
+        )
+
+    def auth(self, user):
+        token = MyTokenObtainPairSerializer.get_token(user).access_token
+        return {"Authorization": "Bearer {0}".format(token)}
+
+    def sign(self, user, field="avatar"):
+        res = self.client.post(
+            UPLOAD_URL,
+            {"field": field},
+            content_type="application/json",
+            headers=self.auth(user),
+        )
+        self.assertEqual(res.status_code, 200)
+        return res.json()
+
+    def upload(self, signed, name="me.png"):
+        return self.client.post(
+            signed["url"],
+            {**signed["fields"], "file": SimpleUploadedFile(name, b"png-bytes")},
+        )
+
+    def confirm(self, user, field, uploaded):
+        return self.client.post(
+            CONFIRM_URL,
+            {"field": field, **uploaded},
+            content_type="application/json",
+            headers=self.auth(user),
+        )
+
+    def test_upload_and_confirm(self):
+        signed = self.sign(self.user)
+
+        self.assertEqual(signed["url"], reverse("user:local_upload"))
+        self.assertTrue(
+            signed["fields"]["public_id"].startswith("test@example.com/avatar/")
+        )
+        self.assertIn("signature", signed["fields"])
+
+        res = self.upload(signed)
+        self.assertEqual(res.status_code, 200)
+        uploaded = res.json()
+        self.assertEqual(uploaded["public_id"], signed["fields"]["public_id"])
+
+        res = self.confirm(self.user, "avatar", uploaded)
+
+        self.assertEqual(res.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar.public_id, uploaded["public_id"])
+        self.assertEqual(
+            self.user.avatar_variants["thumb"]["webp"], uploaded["secure_url"]
+        )
+
+    def test_tampered_fields_rejected(self):
+        signed = self.sign(self.user)
+        signed["fields"]["public_id"] = "other@example.com/avatar/mine"
+
+        res = self.upload(signed)
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_format_not_allowed(self):
+        res = self.upload(self.sign(self.user), name="me.svg")
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_confirm_upload_of_another_user(self):
+        uploaded = self.upload(self.sign(self.other)).json()
+
+        res = self.confirm(self.user, "avatar", uploaded)
+
+        self.assertEqual(res.status_code, 400)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar.public_id, "default/avatar_default")
+
+    def test_confirm_for_another_field(self):
+        uploaded = self.upload(self.sign(self.user, "cover")).json()
+
+        res = self.confirm(self.user, "avatar", uploaded)
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_confirm_forged_signature(self):
+        uploaded = self.upload(self.sign(self.user)).json()
+        uploaded["version"] = "2"
+
+        res = self.confirm(self.user, "avatar", uploaded)
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_older_upload_not_attached(self):
+        older = self.upload(self.sign(self.user)).json()
+        newer = self.upload(self.sign(self.user)).json()
+        self.assertEqual(self.confirm(self.user, "avatar", newer).status_code, 200)
+
+        res = self.confirm(self.user, "avatar", older)
+
+        self.assertEqual(res.status_code, 400)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar.public_id, newer["public_id"])
+
+    def test_needs_authentication(self):
+        res = self.client.post(UPLOAD_URL, {"field": "avatar"})
+
+        self.assertEqual(res.status_code, 401)
+
+
+class UploadNotificationTests(TestCase):
+    """Test Cloudinary's notification attaches a direct upload."""
+
+    def setUp(self):
+        get_redis().flushdb()
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            password="goodpass",
+            birthday="2001-02-05T00:00:00Z",
+        )
+        config = mock.patch.dict(
+            cloudinary.config().__dict__,
+            {"cloud_name": "demo", "api_key": "key", "api_secret": "secret"},
+        )
+        config.start()
+        self.addCleanup(config.stop)
+
+    def notify(self, body, timestamp=None, secret="secret"):
+        timestamp = str(timestamp or int(time.time()))
+        body = json.dumps(body)
+        return self.client.post(
+            NOTIFY_URL,
+            body,
+            content_type="application/json",
+            headers={
+                "X-Cld-Timestamp": timestamp,
+                "X-Cld-Signature": utils.compute_hex_hash(body + timestamp + secret),
+            },
+        )
+
+    def sign(self):
+        return self.client.post(
+            UPLOAD_URL,
+            {"field": "cover"},
+            content_type="application/json",
+            headers={
+                "Authorization": "Bearer {0}".format(
+                    MyTokenObtainPairSerializer.get_token(self.user).access_token
+                )
+            },
+        ).json()
+
+    def test_signed_direct_upload(self):
+        signed = self.sign()
+
+        self.assertEqual(
+            signed["url"], "https://api.cloudinary.com/v1_1/demo/image/upload"
+        )
+        self.assertEqual(signed["fields"]["api_key"], "key")
+        self.assertIn("c_fill,h_160,q_auto,w_480/webp", signed["fields"]["eager"])
+        self.assertEqual(
+            signed["fields"]["transformation"], "c_limit,h_1920,q_auto:eco,w_1920"
+        )
+
+    def test_notification(self):
+        public_id = self.sign()["fields"]["public_id"]
+
+        res = self.notify(
+            {
+                "public_id": public_id,
+                "version": 5,
+                "format": "png",
+                "eager": [{"secure_url": "https://cdn/{0}".format(i)} for i in range(9)],
+            }
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.cover.public_id, public_id)
+        self.assertEqual(self.user.cover_variants["thumb"]["avif"], "https://cdn/0")
+
+    def test_notification_of_older_upload_ignored(self):
+        older = self.sign()["fields"]["public_id"]
+        self.sign()
+
+        res = self.notify({"public_id": older, "version": 5, "format": "png"})
+
+        self.assertEqual(res.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.cover.public_id, "default/cover_default")
+
+    def test_notification_rejected(self):
+        body = {"public_id": "test@example.com/cover/abc", "version": 5}
+
+        self.assertEqual(self.notify(body, secret="guess").status_code, 400)
+        self.assertEqual(self.notify(body, timestamp=1).status_code, 400)
+        body["public_id"] = "nobody@example.com/cover/abc"
+        self.assertEqual(self.notify(body).status_code, 400)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.cover.public_id, "default/cover_default")
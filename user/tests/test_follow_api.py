@@ -0,0 +1,112 @@
+"""
+Tests for the follow API.
+"""
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user.models import User
+
+FOLLOW_URL = reverse("user:follow_user")
+UNFOLLOW_URL = reverse("user:unfollow_user")
+
+
+def create_user(email):
+    return User.objects.create_user(
+        email=email, password="goodpass", birthday="2001-02-05T00:00:00Z"
+    )
+
+
+class FollowApiTests(TestCase):
+    """Test following users and listing follow relations."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user("test@example.com")
+        self.other = create_user("other@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_follow_updates_counts(self):
+        """Test following twice only counts once."""
+        self.client.post(FOLLOW_URL, {"userId": self.other.pk})
+        res = self.client.post(FOLLOW_URL, {"userId": self.other.pk})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.user.following_count, 1)
+        self.assertEqual(self.other.followers_count, 1)
+
+    def test_unfollow_updates_counts(self):
+        """Test unfollowing removes the edge and the counts."""
+        self.client.post(FOLLOW_URL, {"userId": self.other.pk})
+        self.client.post(UNFOLLOW_URL, {"userId": self.other.pk})
+        res = self.client.post(UNFOLLOW_URL, {"userId": self.other.pk})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.followers_count, 0)
+        self.assertFalse(self.user.follow.exists())
+
+    def test_follow_errors(self):
+        """Test following yourself or an unknown user fails."""
+        res = self.client.post(FOLLOW_URL, {"userId": self.user.pk})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(FOLLOW_URL, {"userId": self.other.pk + 1})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_profile_has_counts_not_follow_list(self):
+        """Test the profile carries counters instead of the follow ids."""
+        self.client.post(FOLLOW_URL, {"userId": self.other.pk})
+
+        url = reverse("user:people_profile", args=[self.other.pk])
+        data = self.client.get(url).json()
+
+        self.assertNotIn("follow", data)
+        self.assertEqual(data["followers_count"], 1)
+
+    def test_followers_paginated(self):
+        """Test followers are listed page by page."""
+        for number in range(3):
+            follower = create_user("follower{0}@example.com".format(number))
+            self.client.force_authenticate(user=follower)
+            self.client.post(FOLLOW_URL, {"userId": self.other.pk})
+
+        url = reverse("user:followers", args=[self.other.pk])
+        res = self.client.get(url, {"page_size": 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 2)
+        self.assertIsNotNone(res.data["next"])
+        res = self.client.get(res.data["next"])
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertIsNone(res.data["next"])
+
+    def test_followers_newest_first(self):
+        """Test followers are ordered by when they followed."""
+        first = create_user("first@example.com")
+        second = create_user("second@example.com")
+        for follower in (first, second):
+            self.client.force_authenticate(user=follower)
+            self.client.post(FOLLOW_URL, {"userId": self.other.pk})
+
+        url = reverse("user:followers", args=[self.other.pk])
+        res = self.client.get(url)
+
+        self.assertEqual(
+            [user["id"] for user in res.data["results"]], [second.pk, first.pk]
+        )
+
+    def test_following_listed(self):
+        """Test the users someone follows are listed."""
+        self.client.post(FOLLOW_URL, {"userId": self.other.pk})
+
+        url = reverse("user:following", args=[self.user.pk])
+        res = self.client.get(url)
+
+        self.assertEqual([user["id"] for user in res.data["results"]], [self.other.pk])
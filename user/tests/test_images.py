@@ -0,0 +1,202 @@
+"""
+Tests for the normalization of uploaded images.
+"""
+
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from celery.exceptions import Retry, SoftTimeLimitExceeded
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from user import images, media
+from user.models import User
+from user.tasks import process_media_upload
+
+
+def encode(image, format, **options):
+    output = io.BytesIO()
+    image.save(output, format=format, **options)
+    return output.getvalue()
+
+
+def normalize_in(field_name, data, results):
+    results.put(
+        len(images.normalize_upload(field_name, ContentFile(data, "a.jpg")).read())
+    )
+
+
+def photo(size=(400, 200), orientation=None):
+    image = Image.effect_noise(size, 64).convert("RGB")
+    exif = Image.Exif()
+    exif[0x010F] = "Phone"  # Make
+    if orientation:
+        exif[0x0112] = orientation
+    return encode(image, "JPEG", quality=95, exif=exif)
+
+
+class NormalizeTests(SimpleTestCase):
+    """Test images are made upright, stripped and brought down in size."""
+
+    def normalize(self, data, max_size=(100, 100), max_pixels=10**6):
+        return images.normalize(data, max_size, max_pixels, 85)
+
+    def test_downsized_upright_and_stripped(self):
+        # Orientation 6: stored landscape, shown rotated a quarter turn.
+        data, extension = self.normalize(photo(orientation=6))
+
+        self.assertEqual(extension, "jpg")
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(image.size, (50, 100))
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_small_image_keeps_its_size(self):
+        data, extension = self.normalize(encode(Image.new("RGBA", (20, 10)), "PNG"))
+
+        self.assertEqual(extension, "png")
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual((image.size, image.mode), ((20, 10), "RGBA"))
+
+    def test_other_formats_written_as_jpeg(self):
+        data, extension = self.normalize(encode(Image.new("RGB", (20, 10)), "BMP"))
+
+        self.assertEqual(extension, "jpg")
+        self.assertEqual(data[:2], b"\xff\xd8")
+
+    def test_animation_kept(self):
+        frames = [Image.new("RGB", (200, 200), color) for color in ("red", "blue")]
+        gif = encode(frames[0], "GIF", save_all=True, append_images=frames[1:])
+
+        self.assertEqual(self.normalize(gif), (gif, "gif"))
+
+    def test_too_many_pixels(self):
+        with self.assertRaises(images.ImageRejected):
+            self.normalize(photo(), max_pixels=1000)
+
+    def test_inspect_reads_the_header_only(self):
+        file = io.BytesIO(photo(size=(4000, 3000)))
+        file.seek(100)
+
+        with self.assertRaises(images.ImageRejected):
+            images.inspect(file, max_pixels=10**6)
+        self.assertEqual(file.tell(), 0)
+        with self.assertRaises(images.ImageRejected):
+            images.inspect(io.BytesIO(b"not an image"), max_pixels=10**6)
+        images.inspect(file, max_pixels=12 * 10**6)
+
+
+@override_settings(MEDIA_UPLOAD_BACKEND="user.media.LocalBackend")
+class NormalizeUploadTests(TestCase):
+    """Test the media worker normalizes uploads."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.staging_root = os.path.join(media_root, "staging")
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, MEDIA_STAGING_ROOT=self.staging_root
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            password="goodpass",
+            birthday="2001-02-05T00:00:00Z",
+        )
+
+    def sample(self, name):
+        return REGISTRY.get_sample_value(name, {"field": "avatar"}) or 0
+
+    def stage(self, data):
+        staged_name = media.staging_storage().save("upload.jpg", ContentFile(data))
+        User.objects.filter(pk=self.user.pk).update(avatar_pending=staged_name)
+        return staged_name
+
+    def test_upload_normalized(self):
+        data = photo(size=(3000, 2000))
+        saved = self.sample("media_upload_bytes_saved_sum")
+
+        values = media.process_upload(User, self.user.pk, "avatar", self.stage(data))
+
+        self.assertIsNotNone(values)
+        self.user.refresh_from_db()
+        stored = self.user.avatar.public_id + ".jpg"
+        with media.default_storage.open(stored) as file, Image.open(file) as image:
+            self.assertEqual(image.size, (1024, 683))
+        self.assertGreater(self.sample("media_upload_bytes_saved_sum"), saved)
+
+    def test_rejected_upload_dropped(self):
+        rejected = self.sample("media_uploads_rejected_total")
+
+        values = media.process_upload(User, self.user.pk, "avatar", self.stage(b"no"))
+
+        self.assertIsNone(values)
+        self.assertEqual(os.listdir(self.staging_root), [])
+        self.assertEqual(self.sample("media_uploads_rejected_total"), rejected + 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar.public_id, "default/avatar_default")
+
+    @override_settings(MEDIA_MAX_PIXELS=1000)
+    def test_bomb_refused_on_request(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        res = client.patch(
+            reverse("user:update_profile"),
+            {"avatar": SimpleUploadedFile("me.jpg", photo())},
+            format="multipart",
+        )
+
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("avatar", res.json())
+        self.assertFalse(os.path.exists(self.staging_root))
+
+    def test_normalizes_in_daemonic_process(self):
+        """Test normalization works in a prefork Celery child, which is daemonic."""
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        process = context.Process(
+            target=normalize_in, args=("avatar", photo(), results), daemon=True
+        )
+
+        process.start()
+        process.join(30)
+
+        self.assertEqual(process.exitcode, 0)
+        self.assertGreater(results.get(timeout=1), 0)
+
+    def test_slow_upload_dropped(self):
+        staged = self.stage(photo())
+
+        with mock.patch.object(
+            images, "normalize_upload", side_effect=SoftTimeLimitExceeded()
+        ):
+            values = media.process_upload(User, self.user.pk, "avatar", staged)
+
+        self.assertIsNone(values)
+        self.assertEqual(os.listdir(self.staging_root), [])
+
+    def test_staged_file_removed_when_task_gives_up(self):
+        staged = self.stage(photo())
+        task = process_media_upload
+
+        with mock.patch.object(
+            media.LocalBackend, "upload", side_effect=OSError("unreachable")
+        ):
+            with self.assertRaises(Retry):
+                task.apply((self.user.pk, "avatar", staged), retries=0)
+            self.assertEqual(os.listdir(self.staging_root), [os.path.basename(staged)])
+
+            with self.assertRaises(OSError):
+                task.apply((self.user.pk, "avatar", staged), retries=task.max_retries)
+
+        self.assertEqual(os.listdir(self.staging_root), [])
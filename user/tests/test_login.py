@@ -0,0 +1,129 @@
+"""
+Tests for the async login and password check.
+"""
+
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from redis.exceptions import ConnectionError
+from rest_framework import status
+
+from core.redis import get_redis
+from user import authentication, hashing
+from user.logins import PENDING_KEY, flush_last_logins, record_login
+from user.models import User
+from user.serializers import MyTokenObtainPairSerializer
+
+LOGIN_URL = reverse("user:login")
+VALIDATE_PASSWORD_URL = reverse("user:validate_password")
+
+
+class AsyncLoginTests(TestCase):
+    """Test logins hash off the event loop and defer the last_login write."""
+
+    def setUp(self):
+        get_redis().flushdb()
+        cache.clear()
+        authentication._local_states.clear()
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            password="goodpass",
+            birthday="2001-02-05T00:00:00Z",
+        )
+
+    def test_json_login_defers_last_login(self):
+        """Test a login leaves last_login to the batched flush."""
+        res = self.client.post(
+            LOGIN_URL,
+            {"email": "test@example.com", "password": "goodpass"},
+            content_type="application/json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()["id"], self.user.pk)
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+        self.assertTrue(get_redis().hexists(PENDING_KEY, self.user.pk))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(flush_last_logins(), 1)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+        self.assertFalse(get_redis().exists(PENDING_KEY))
+
+    def test_last_login_written_without_redis(self):
+        """Test a login is not lost while Redis is unreachable."""
+        with mock.patch.object(get_redis(), "hset", side_effect=ConnectionError()):
+            record_login(self.user.pk)
+
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    def test_failed_flush_kept(self):
+        """Test login times survive a flush that could not write them."""
+        get_redis().hset(PENDING_KEY, self.user.pk, "2024-01-01T00:00:00+00:00")
+
+        with mock.patch.object(User.objects, "bulk_update", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                flush_last_logins()
+
+        self.assertEqual(flush_last_logins(), 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_login.year, 2024)
+        self.assertEqual(flush_last_logins(), 0)
+
+    def test_login_missing_fields(self):
+        """Test missing credentials are rejected before any lookup."""
+        with self.assertNumQueries(0):
+            res = self.client.post(LOGIN_URL, {"email": "test@example.com"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("password", res.json())
+
+    def test_inactive_user_cannot_login(self):
+        """Test inactive accounts get the same error as a wrong password."""
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        res = self.client.post(
+            LOGIN_URL, {"email": "test@example.com", "password": "goodpass"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res.json()["detail"], "Wrong Email or Password")
+
+    def test_hashing_runs_in_pool(self):
+        """Test password checks do not run on the event loop thread."""
+        threads = []
+        check = hashing.check_password
+
+        def record_thread(*args):
+            threads.append(threading.current_thread().name)
+            return check(*args)
+
+        with mock.patch.object(hashing, "check_password", record_thread):
+            self.client.post(
+                LOGIN_URL, {"email": "test@example.com", "password": "goodpass"}
+            )
+
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith("password-hashing"))
+
+    def test_validate_password(self):
+        """Test the password check needs a token and reports the result."""
+        token = MyTokenObtainPairSerializer.get_token(self.user).access_token
+        headers = {"HTTP_AUTHORIZATION": "Bearer {0}".format(token)}
+
+        valid = self.client.post(
+            VALIDATE_PASSWORD_URL, {"password": "goodpass"}, **headers
+        )
+        invalid = self.client.post(
+            VALIDATE_PASSWORD_URL, {"password": "badpass"}, **headers
+        )
+        anonymous = self.client.post(VALIDATE_PASSWORD_URL, {"password": "goodpass"})
+
+        self.assertEqual(valid.json(), {"status": True})
+        self.assertEqual(invalid.json(), {"status": False})
+        self.assertEqual(anonymous.status_code, status.HTTP_401_UNAUTHORIZED)
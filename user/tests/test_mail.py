@@ -0,0 +1,146 @@
+"""
+Tests for the batched email dispatcher.
+"""
+
+from smtplib import SMTPRecipientsRefused
+from unittest import mock
+
+from django.conf import settings
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.redis import get_redis
+from user.mail import (
+    DISPATCH_LOCK_KEY,
+    PROCESSING_KEY,
+    dispatch_emails,
+    email_outcome,
+    queue_email,
+)
+from user.models import User
+
+REQUEST_RESET_URL = reverse("user:request_reset_password")
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+    rejected = set()
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        for message in messages:
+            if set(message.to) & self.rejected:
+                raise SMTPRecipientsRefused(message.to)
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND="user.tests.test_mail.CountingBackend", EMAIL_RETRY_BACKOFF=0
+)
+class MailDispatchTests(TestCase):
+    """Test queued emails share a connection and retry on failure."""
+
+    def setUp(self):
+        get_redis().flushdb()
+        CountingBackend.opened = 0
+        CountingBackend.rejected = set()
+
+    def test_batch_uses_one_connection(self):
+        """Test emails queued within the window go over one connection."""
+        with mock.patch("user.mail.schedule_dispatch"):
+            ids = [
+                queue_email("Subject", "<p>Hi</p>", ["user{0}@example.com".format(i)])
+                for i in range(3)
+            ]
+
+        self.assertEqual(dispatch_emails(), {"sent": 3, "retrying": 0, "failed": 0})
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(mail.outbox[0].content_subtype, "html")
+        self.assertEqual(email_outcome(ids[0]), {"status": "sent", "attempts": 1})
+
+    def test_failure_does_not_block_batch(self):
+        """Test one rejected email is retried while the others are sent."""
+        CountingBackend.rejected = {"bad@example.com"}
+        with mock.patch("user.mail.schedule_dispatch"):
+            bad = queue_email("Subject", "Body", ["bad@example.com"])
+            good = queue_email("Subject", "Body", ["good@example.com"])
+
+        with mock.patch("user.tasks.dispatch_emails_task.apply_async") as retry:
+            counts = dispatch_emails()
+
+        self.assertEqual(counts, {"sent": 1, "retrying": 1, "failed": 0})
+        self.assertEqual(email_outcome(good)["status"], "sent")
+        self.assertEqual(email_outcome(bad)["status"], "retrying")
+        self.assertIn("bad@example.com", email_outcome(bad)["error"])
+        retry.assert_called_once()
+
+    @override_settings(EMAIL_MAX_RETRIES=2)
+    def test_gives_up_after_retries(self):
+        """Test an email that keeps failing is retried then marked failed."""
+        CountingBackend.rejected = {"bad@example.com"}
+
+        message_id = queue_email("Subject", "Body", ["bad@example.com"])
+
+        self.assertEqual(email_outcome(message_id)["status"], "failed")
+        self.assertEqual(email_outcome(message_id)["attempts"], 3)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_retry_succeeds(self):
+        """Test an email that failed once is sent by the retry."""
+        CountingBackend.rejected = {"flaky@example.com"}
+        with mock.patch("user.tasks.dispatch_emails_task.apply_async"):
+            message_id = queue_email("Subject", "Body", ["flaky@example.com"])
+            dispatch_emails()
+        CountingBackend.rejected = set()
+
+        dispatch_emails()
+
+        self.assertEqual(email_outcome(message_id), {"status": "sent", "attempts": 2})
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_reset_password_request_sends_email(self):
+        """Test the reset password email goes through the dispatcher."""
+        User.objects.create_user(
+            email="test@example.com",
+            password="goodpass",
+            birthday="2001-02-05T00:00:00Z",
+        )
+
+        self.client.post(REQUEST_RESET_URL, {"email": "test@example.com"})
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["test@example.com"])
+
+    def test_batch_of_crashed_dispatcher_is_sent(self):
+        """Test messages taken by a dispatcher that died are not lost."""
+        with mock.patch("user.mail.schedule_dispatch"):
+            message_id = queue_email("Subject", "Body", ["user@example.com"])
+            with mock.patch("user.mail.send_batch", side_effect=SystemExit):
+                with self.assertRaises(SystemExit):
+                    dispatch_emails()
+
+            self.assertEqual(len(mail.outbox), 0)
+            self.assertEqual(get_redis().llen(PROCESSING_KEY), 1)
+
+            counts = dispatch_emails()
+
+        self.assertEqual(counts["sent"], 1)
+        self.assertEqual(email_outcome(message_id)["status"], "sent")
+        self.assertEqual(get_redis().llen(PROCESSING_KEY), 0)
+
+    def test_one_dispatcher_at_a_time(self):
+        """Test a dispatch waits while another one holds the batch."""
+        get_redis().set(DISPATCH_LOCK_KEY, "other")
+        with mock.patch("user.mail.schedule_dispatch") as schedule:
+            queue_email("Subject", "Body", ["user@example.com"])
+
+            self.assertEqual(dispatch_emails()["sent"], 0)
+
+        self.assertEqual(len(mail.outbox), 0)
+        schedule.assert_called_with(settings.EMAIL_BATCH_WINDOW)
@@ -0,0 +1,224 @@
+"""
+Tests for the user media pipeline.
+"""
+
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import cloudinary
+from cloudinary import CloudinaryResource
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import media
+from user.models import User
+from user.serializers import UserProfileSerializer, UserSummarySerializer
+
+UPDATE_PROFILE_URL = reverse("user:update_profile")
+
+
+def image_file(name, size=(8, 8), format="PNG", **options):
+    output = io.BytesIO()
+    Image.new("RGB", size, "red").save(output, format=format, **options)
+    return SimpleUploadedFile(name, output.getvalue())
+
+
+class MediaPipelineTests(TestCase):
+    """Test uploads are staged on the request and finished by the worker."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.staging_root = os.path.join(self.media_root, "staging")
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            MEDIA_STAGING_ROOT=self.staging_root,
+            MEDIA_UPLOAD_BACKEND="user.media.LocalBackend",
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            password="goodpass",
+            first_name="Test",
+            last_name="Name",
+            birthday="2001-02-05T00:00:00Z",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, **files):
+        return self.client.patch(UPDATE_PROFILE_URL, files, format="multipart")
+
+    def test_upload_is_staged_and_previous_asset_kept(self):
+        """Test the request returns before the file reaches the backend."""
+        self.user.avatar = "image/upload/v1/old_avatar.jpg"
+        self.user.save()
+
+        res = self.upload(avatar=image_file("me.jpg", format="JPEG"))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar.public_id, "old_avatar")
+        self.assertEqual(len(os.listdir(self.staging_root)), 1)
+
+    def test_worker_writes_back_uploaded_asset(self):
+        """Test the committed upload is sent to the backend and saved."""
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.upload(cover=image_file("me.png"))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.cover.public_id.startswith("test@example.com/cover/"))
+        self.assertEqual(self.user.cover.format, "png")
+        self.assertEqual(os.listdir(self.staging_root), [])
+        stored = os.path.join(self.media_root, self.user.cover.public_id + ".png")
+        with Image.open(stored) as uploaded:
+            self.assertEqual((uploaded.format, uploaded.size), ("PNG", (8, 8)))
+        # The local backend derives nothing, every variant is the original.
+        self.assertEqual(
+            set(self.user.cover_variants), set(settings.MEDIA_VARIANTS["cover"])
+        )
+        self.assertEqual(
+            self.user.cover_variants["thumb"]["webp"],
+            self.user.cover_variants["full"]["jpg"],
+        )
+        self.assertTrue(self.user.cover_variants["thumb"]["webp"].endswith(".png"))
+
+    def test_older_upload_finishing_late_not_written(self):
+        """Test an upload processed after a newer one leaves the newer asset."""
+        with mock.patch("user.tasks.process_media_upload.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.upload(avatar=image_file("old.png"))
+            with self.captureOnCommitCallbacks(execute=True):
+                self.upload(avatar=image_file("new.png"))
+        older, newer = [call.args for call in delay.call_args_list]
+
+        self.assertIsNotNone(media.process_upload(User, *newer))
+        self.assertIsNone(media.process_upload(User, *older))
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar_pending, newer[2])
+        self.assertEqual(os.listdir(self.staging_root), [])
+        stored = os.listdir(os.path.join(self.media_root, "test@example.com/avatar"))
+        self.assertEqual(stored, [self.user.avatar.public_id.rpartition("/")[2] + ".png"])
+
+    def test_new_user_upload_starts_with_placeholder(self):
+        """Test a user created with a file gets the placeholder first."""
+        user = User.objects.create_user(
+            email="new@example.com",
+            password="goodpass",
+            birthday="2001-02-05T00:00:00Z",
+            avatar=image_file("me.jpg", format="JPEG"),
+        )
+
+        user.refresh_from_db()
+        self.assertEqual(user.avatar.public_id, "default/avatar_default")
+
+
+@override_settings(
+    MEDIA_VARIANTS={
+        "avatar": {
+            "thumb": {"width": 64, "height": 64, "crop": "thumb"},
+            "full": {"width": 1024, "crop": "limit"},
+        }
+    },
+    MEDIA_VARIANT_FORMATS=["webp", "jpg"],
+)
+class MediaVariantTests(TestCase):
+    """Test variants are derived at upload and listed in the payloads."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            password="goodpass",
+            birthday="2001-02-05T00:00:00Z",
+        )
+        self.field = User._meta.get_field("avatar")
+
+    def test_upload_requests_eager_variants(self):
+        options = media.upload_options(self.user, self.field)
+
+        self.assertEqual(
+            options["eager"],
+            [
+                {
+                    "width": 64,
+                    "height": 64,
+                    "crop": "thumb",
+                    "format": "webp",
+                    "quality": "auto",
+                },
+                {
+                    "width": 64,
+                    "height": 64,
+                    "crop": "thumb",
+                    "format": "jpg",
+                    "quality": "auto",
+                },
+                {"width": 1024, "crop": "limit", "format": "webp", "quality": "auto"},
+                {"width": 1024, "crop": "limit", "format": "jpg", "quality": "auto"},
+            ],
+        )
+
+    def test_uploaded_variants_from_eager_results(self):
+        resource = CloudinaryResource(
+            "me",
+            metadata={
+                "eager": [{"secure_url": "https://cdn/{0}".format(i)} for i in range(4)]
+            },
+        )
+
+        self.assertEqual(
+            media.uploaded_variants(resource, "avatar"),
+            {
+                "thumb": {"webp": "https://cdn/0", "jpg": "https://cdn/1"},
+                "full": {"webp": "https://cdn/2", "jpg": "https://cdn/3"},
+            },
+        )
+
+    def test_stored_variants_in_payloads(self):
+        self.user.avatar_variants = {
+            "thumb": {"webp": "https://cdn/t.webp", "jpg": "https://cdn/t.jpg"},
+            "full": {"webp": "https://cdn/f.webp", "jpg": "https://cdn/f.jpg"},
+        }
+
+        profile = UserProfileSerializer(self.user).data
+        summary = UserSummarySerializer(self.user).data
+
+        self.assertEqual(
+            profile["avatar_srcset"],
+            {
+                "webp": "https://cdn/t.webp 64w, https://cdn/f.webp 1024w",
+                "jpg": "https://cdn/t.jpg 64w, https://cdn/f.jpg 1024w",
+            },
+        )
+        self.assertNotIn("avatar_variants", profile)
+        self.assertEqual(
+            summary["avatar_thumb"],
+            {"webp": "https://cdn/t.webp", "jpg": "https://cdn/t.jpg"},
+        )
+
+    def test_placeholder_urls_built_once(self):
+        media.variant_urls.cache_clear()
+        with mock.patch.dict(cloudinary.config().__dict__, {"cloud_name": "demo"}):
+            first = UserSummarySerializer(self.user).data["avatar_thumb"]
+            UserSummarySerializer(self.user).data
+        media.variant_urls.cache_clear()
+
+        self.assertEqual(
+            first["webp"],
+            (
+                "https://res.cloudinary.com/demo/image/upload/"
+                "c_thumb,h_64,q_auto,w_64/v1/default/avatar_default.webp"
+            ),
+        )
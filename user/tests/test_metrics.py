@@ -0,0 +1,165 @@
+"""
+Tests for the Prometheus metrics.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+from urllib.request import urlopen
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY, generate_latest
+from rest_framework.test import APIClient
+
+from core.celery import serve_worker_metrics
+from core.metrics import metrics_registry
+from user.models import User
+
+PROFILE_URL = reverse("user:profile")
+METRICS_URL = reverse("metrics")
+
+WORKER = """
+import django
+django.setup()
+from core.metrics import RESPONSES
+RESPONSES.labels("GET", "user/profile", 200).inc()
+"""
+
+# A child of `celery -A core worker` rejecting an upload in its task.
+CELERY_CHILD = """
+import sys
+sys.argv = ["celery", "-A", "core", "worker"]
+import core.celery
+import django
+django.setup()
+from django.core.files.base import ContentFile
+from user import images
+try:
+    images.normalize_upload("avatar", ContentFile(b"not an image", "a.jpg"))
+except images.ImageRejected:
+    pass
+"""
+
+
+class MetricsTests(TestCase):
+    """Test requests are recorded per route and exposed on /metrics."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            password="goodpass",
+            birthday="2001-02-05T00:00:00Z",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_recorded(self):
+        """Test latency, status, queries and size are recorded for the route."""
+        route = "user/<int:pk>/followers"
+        responses = self.sample(
+            "http_responses_total", method="GET", route=route, status="200"
+        )
+        queries = self.sample("http_request_db_queries_sum", route=route)
+
+        res = self.client.get(reverse("user:followers", args=[self.user.pk]))
+
+        self.assertEqual(
+            self.sample("http_responses_total", method="GET", route=route, status="200"),
+            responses + 1,
+        )
+        self.assertGreater(
+            self.sample("http_request_db_queries_sum", route=route), queries
+        )
+        self.assertGreaterEqual(
+            self.sample("http_response_size_bytes_sum", route=route), len(res.content)
+        )
+
+    def test_unmatched_routes_share_a_label(self):
+        """Test 404s do not create a series per path."""
+        before = self.sample(
+            "http_responses_total", method="GET", route="<unmatched>", status="404"
+        )
+
+        self.client.get("/no-such-page-1")
+        self.client.get("/no-such-page-2")
+
+        self.assertEqual(
+            self.sample(
+                "http_responses_total", method="GET", route="<unmatched>", status="404"
+            ),
+            before + 2,
+        )
+
+    @override_settings(DEBUG=True)
+    def test_metrics_endpoint(self):
+        """Test the metrics are exposed in the Prometheus text format."""
+        self.client.get(PROFILE_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b"http_request_duration_seconds_bucket", res.content)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        """Test the endpoint needs the token when one is configured."""
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=False)
+    def test_metrics_closed_without_token(self):
+        """Test the endpoint is closed outside DEBUG when no token is set."""
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+
+
+class MultiprocessMetricsTests(TestCase):
+    """Test samples of several workers are added up."""
+
+    def test_workers_aggregated(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(
+                os.environ,
+                PROMETHEUS_MULTIPROC_DIR=directory,
+                DJANGO_SETTINGS_MODULE="core.settings",
+            )
+            for _ in range(2):
+                subprocess.run([sys.executable, "-c", WORKER], env=env, check=True)
+
+            with mock.patch.dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directory):
+                output = generate_latest(metrics_registry()).decode()
+
+        self.assertIn(
+            'http_responses_total{method="GET",route="user/profile",status="200"} 2.0',
+            output,
+        )
+
+
+class CeleryMetricsTests(TestCase):
+    """Test samples recorded in Celery tasks are served by the worker."""
+
+    def test_task_samples_scraped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(
+                os.environ,
+                CELERY_METRICS_DIR=directory,
+                DJANGO_SETTINGS_MODULE="core.settings",
+            )
+            env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+            subprocess.run([sys.executable, "-c", CELERY_CHILD], env=env, check=True)
+
+            with mock.patch.dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directory):
+                server, _ = serve_worker_metrics(0)
+            self.addCleanup(server.server_close)
+            self.addCleanup(server.shutdown)
+            url = "http://127.0.0.1:{0}/metrics".format(server.server_port)
+            with urlopen(url) as response:
+                output = response.read().decode()
+
+        self.assertIn('media_uploads_rejected_total{field="avatar"} 1.0', output)
@@ -0,0 +1,101 @@
+"""
+Tests for the keyset pagination of list endpoints.
+"""
+
+import base64
+import json
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user.models import Follow, User
+
+
+class KeysetPaginationTests(TestCase):
+    """Test deep pages cost the same as the first one."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="test@example.com", password="goodpass", birthday="2001-02-05"
+        )
+        followers = User.objects.bulk_create(
+            [
+                User(
+                    email="f{0}@example.com".format(i),
+                    username="f{0}".format(i),
+                    birthday="2001-02-05",
+                )
+                for i in range(30)
+            ]
+        )
+        # Every edge shares the same timestamp, so id alone breaks the ties.
+        created = timezone.now()
+        Follow.objects.bulk_create(
+            [Follow(follower=follower, followee=cls.user) for follower in followers]
+        )
+        Follow.objects.update(created=created)
+        cls.url = reverse("user:followers", args=[cls.user.pk])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def get_page(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.json(), [query["sql"] for query in queries]
+
+    def test_page_n_costs_like_page_1(self):
+        """Test every page is one query without OFFSET, over the index."""
+        data, first_sql = self.get_page(self.url, page_size=5)
+        seen = [row["id"] for row in data["results"]]
+        while data["next"]:
+            data, sql = self.get_page(data["next"])
+            seen.extend(row["id"] for row in data["results"])
+
+            self.assertEqual(len(sql), len(first_sql))
+            self.assertNotIn("OFFSET", sql[0])
+
+        self.assertEqual(len(seen), 30)
+        self.assertEqual(len(set(seen)), 30)
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql[0])
+                plan = " ".join(str(row) for row in cursor.fetchall())
+            self.assertIn("follow_followee_keyset_idx", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_previous_page(self):
+        """Test the previous link returns the page before."""
+        first, _ = self.get_page(self.url, page_size=5)
+        self.assertIsNone(first["previous"])
+        second, _ = self.get_page(first["next"])
+
+        back, _ = self.get_page(second["previous"])
+
+        self.assertEqual(back["results"], first["results"])
+        self.assertIsNone(back["previous"])
+        self.assertIsNotNone(back["next"])
+
+    def test_page_size_capped(self):
+        """Test the page size cannot exceed MAX_PAGE_SIZE."""
+        with self.settings(MAX_PAGE_SIZE=10):
+            data, _ = self.get_page(self.url, page_size=1000)
+
+        self.assertEqual(len(data["results"]), 10)
+
+    def test_invalid_cursor_values(self):
+        """Test cursors with values of the wrong type are not found."""
+        for position in (["garbage", 1], [{"x": 1}, 1], ["2024-01-01T00:00:00", "abc"]):
+            cursor = base64.urlsafe_b64encode(json.dumps({"p": position}).encode())
+
+            res = self.client.get(self.url, {"cursor": cursor.decode()})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND, position)
@@ -0,0 +1,147 @@
+"""
+Tests for the websocket presence service.
+"""
+
+import time
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.asgi import application
+from core.redis import get_redis
+from user import presence
+from user.models import User
+from user.notifications import notify_user
+
+ONLINE_URL = reverse("user:online_status")
+
+
+def create_user(email):
+    return User.objects.create_user(
+        email=email, password="goodpass", birthday="2001-02-05T00:00:00Z"
+    )
+
+
+class PresenceTests(TestCase):
+    """Test presence is kept in Redis and flushed in batches."""
+
+    def setUp(self):
+        get_redis().flushdb()
+        self.user = create_user("test@example.com")
+        self.other = create_user("other@example.com")
+
+    def test_flush_writes_only_changes(self):
+        """Test one flush writes the users whose state changed."""
+        presence.connect(self.user.pk, "a")
+        presence.connect(self.user.pk, "b")
+        presence.disconnect(self.user.pk, "a")
+
+        with self.assertNumQueries(2):
+            presence.flush_presence()
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.online)
+        with self.assertNumQueries(1):
+            presence.flush_presence()
+
+    def test_flush_marks_expired_users_offline(self):
+        """Test users whose heartbeat expired are marked offline."""
+        User.objects.filter(pk=self.other.pk).update(online=True)
+
+        presence.flush_presence()
+
+        self.other.refresh_from_db()
+        self.assertFalse(self.other.online)
+
+    def test_expired_key_keeps_every_socket(self):
+        """Test a user stays online while one of their sockets is open."""
+        presence.connect(self.user.pk, "a")
+        presence.connect(self.user.pk, "b")
+        get_redis().delete(presence.presence_key(self.user.pk))
+
+        presence.heartbeat(self.user.pk, "a")
+        presence.heartbeat(self.user.pk, "b")
+        self.assertFalse(presence.disconnect(self.user.pk, "a"))
+
+        self.assertTrue(presence.is_online(self.user.pk))
+        self.assertTrue(presence.disconnect(self.user.pk, "b"))
+        self.assertFalse(presence.is_online(self.user.pk))
+
+    def test_silent_socket_expires(self):
+        """Test a socket that stopped sending heartbeats no longer counts."""
+        presence.connect(self.user.pk, "a")
+        with mock.patch("time.time", return_value=time.time() + 3600):
+            presence.connect(self.user.pk, "b")
+            self.assertTrue(presence.disconnect(self.user.pk, "b"))
+
+    def test_disconnect_keeps_new_socket(self):
+        """Test a socket opened while the last one closes keeps the user online."""
+        presence.connect(self.user.pk, "a")
+        redis = get_redis()
+        sadd = redis.sadd
+
+        def connect_meanwhile(*args):
+            redis.zadd(presence.presence_key(self.user.pk), {"b": time.time() + 60})
+            return sadd(*args)
+
+        with mock.patch.object(redis, "sadd", side_effect=connect_meanwhile):
+            self.assertTrue(presence.disconnect(self.user.pk, "a"))
+
+        self.assertTrue(presence.is_online(self.user.pk))
+
+    def test_online_status_api(self):
+        """Test the bulk status is answered from Redis."""
+        presence.connect(self.other.pk, "a")
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        with self.assertNumQueries(0):
+            res = client.post(
+                ONLINE_URL, {"ids": [self.user.pk, self.other.pk]}, format="json"
+            )
+
+        self.assertEqual(res.json(), {str(self.user.pk): False, str(self.other.pk): True})
+
+
+class PresenceConsumerTests(TransactionTestCase):
+    """Test the presence websocket."""
+
+    def setUp(self):
+        get_redis().flushdb()
+        self.user = create_user("test@example.com")
+
+    def communicator(self, token):
+        return WebsocketCommunicator(
+            application,
+            "/ws/presence?token={0}".format(token),
+            headers=[(b"host", b"localhost")],
+        )
+
+    async def test_socket_tracks_presence_and_relays_events(self):
+        """Test a socket marks the user online and receives their events."""
+        communicator = self.communicator(AccessToken.for_user(self.user))
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertTrue(presence.is_online(self.user.pk))
+
+        await communicator.send_json_to({"type": "heartbeat"})
+        await communicator.receive_nothing()
+        await sync_to_async(notify_user)(self.user.pk, "ping", {"ok": True})
+        self.assertEqual(
+            await communicator.receive_json_from(),
+            {"event": "ping", "data": {"ok": True}},
+        )
+
+        await communicator.disconnect()
+        self.assertFalse(presence.is_online(self.user.pk))
+
+    async def test_socket_without_token_rejected(self):
+        """Test anonymous sockets are closed."""
+        connected, _ = await self.communicator("invalid").connect()
+
+        self.assertFalse(connected)
@@ -0,0 +1,143 @@
+"""
+Tests for the serialized profile cache.
+"""
+
+import asyncio
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user.cache import aget_profile, bump_version, get_profile, lock_key, profile_key
+from user.models import User
+
+UPDATE_PROFILE_URL = reverse("user:update_profile")
+
+
+def cache_requests(result):
+    return (
+        REGISTRY.get_sample_value("user_profile_cache_requests_total", {"result": result})
+        or 0
+    )
+
+
+class ProfileCacheTests(TestCase):
+    """Test profiles are served from the cache and invalidated on writes."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            password="goodpass",
+            first_name="Test",
+            last_name="Name",
+            birthday="2001-02-05T00:00:00Z",
+        )
+        self.url = reverse("user:people_profile", args=[self.user.pk])
+        self.client = APIClient()
+
+    def test_profile_served_from_cache(self):
+        """Test the second read does not touch the database."""
+        hits = cache_requests("hit")
+        self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()["email"], self.user.email)
+        self.assertEqual(cache_requests("hit"), hits + 1)
+
+    def test_missing_profile_not_cached(self):
+        """Test an unknown user is a 404 every time."""
+        url = reverse("user:people_profile", args=[self.user.pk + 1])
+
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_profile_update_invalidates_cache(self):
+        """Test the updated profile is visible right after the update."""
+        self.client.get(self.url)
+        self.client.force_authenticate(user=self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(UPDATE_PROFILE_URL, {"first_name": "Changed"})
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.json()["first_name"], "Changed")
+
+    def test_expired_profile_refreshed_by_one_caller(self):
+        """Test callers get the stale copy while another one refreshes it."""
+        get_profile(self.user.pk, lambda: {"first_name": "Stale"})
+        entry = cache.get(profile_key(self.user.pk))
+        entry["expires"] = time.time() - 1
+        cache.set(profile_key(self.user.pk), entry)
+        cache.add(lock_key(self.user.pk), 1)
+
+        data = get_profile(self.user.pk, lambda: self.fail("rendered twice"))
+
+        self.assertEqual(data, {"first_name": "Stale"})
+        cache.delete(lock_key(self.user.pk))
+        data = get_profile(self.user.pk, lambda: {"first_name": "Fresh"})
+        self.assertEqual(data, {"first_name": "Fresh"})
+
+    def test_cold_miss_rendered_once(self):
+        """Test concurrent misses after an invalidation render the profile once."""
+        get_profile(self.user.pk, lambda: {"first_name": "Old"})
+        bump_version(self.user.pk)
+        renders = []
+
+        def render():
+            renders.append(1)
+            time.sleep(0.2)
+            return {"first_name": "New"}
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(get_profile(self.user.pk, render))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(renders), 1)
+        self.assertEqual(results, [{"first_name": "New"}] * 5)
+
+    def test_async_cold_miss_rendered_once(self):
+        """Test concurrent async misses render the profile once."""
+        renders = []
+
+        async def render():
+            renders.append(1)
+            await asyncio.sleep(0.2)
+            return {"first_name": "New"}
+
+        async def read_all():
+            return await asyncio.gather(
+                *(aget_profile(self.user.pk, render) for _ in range(5))
+            )
+
+        results = asyncio.run(read_all())
+
+        self.assertEqual(len(renders), 1)
+        self.assertEqual(results, [{"first_name": "New"}] * 5)
+
+    def test_waiters_render_when_lock_released(self):
+        """Test callers stop waiting once the renderer gave up."""
+        cache.add(lock_key(self.user.pk), 1)
+        threading.Timer(0.1, cache.delete, [lock_key(self.user.pk)]).start()
+
+        started = time.monotonic()
+        data = get_profile(self.user.pk, lambda: {"first_name": "Fresh"})
+
+        self.assertEqual(data, {"first_name": "Fresh"})
+        self.assertLess(time.monotonic() - started, 1)
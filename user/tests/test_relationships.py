@@ -0,0 +1,134 @@
+"""
+Tests for the batch relationship lookup.
+"""
+
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.redis import get_redis
+from user import follows
+from user.follows import follow, rebuild_follow_cache
+from user.models import Follow, User
+
+RELATIONSHIPS_URL = reverse("user:relationships")
+
+
+def create_user(email):
+    return User.objects.create_user(
+        email=email, password="goodpass", birthday="2001-02-05T00:00:00Z"
+    )
+
+
+class RelationshipsApiTests(TestCase):
+    """Test follow flags are answered from Redis sets or one query."""
+
+    def setUp(self):
+        get_redis().flushdb()
+        self.user = create_user("test@example.com")
+        self.followed = create_user("followed@example.com")
+        self.follower = create_user("follower@example.com")
+        self.friend = create_user("friend@example.com")
+        Follow.objects.create(follower=self.user, followee=self.followed)
+        Follow.objects.create(follower=self.follower, followee=self.user)
+        Follow.objects.create(follower=self.user, followee=self.friend)
+        Follow.objects.create(follower=self.friend, followee=self.user)
+        self.ids = [self.followed.pk, self.follower.pk, self.friend.pk]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def assertRelationships(self, data):
+        self.assertEqual(
+            data[str(self.followed.pk)],
+            {"following": True, "followed_by": False, "mutual": False},
+        )
+        self.assertEqual(
+            data[str(self.follower.pk)],
+            {"following": False, "followed_by": True, "mutual": False},
+        )
+        self.assertEqual(
+            data[str(self.friend.pk)],
+            {"following": True, "followed_by": True, "mutual": True},
+        )
+
+    def test_cold_cache_uses_one_query(self):
+        """Test a cold cache is answered with a single query and warmed."""
+        with mock.patch("user.tasks.rebuild_follow_cache_task.delay") as delay:
+            with self.assertNumQueries(1):
+                res = self.client.post(
+                    RELATIONSHIPS_URL, {"ids": self.ids}, format="json"
+                )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertRelationships(res.json())
+        delay.assert_called_once_with(self.user.pk)
+
+    def test_warm_cache_skips_database(self):
+        """Test warm sets answer without touching the database."""
+        rebuild_follow_cache(self.user.pk)
+
+        with self.assertNumQueries(0):
+            res = self.client.post(RELATIONSHIPS_URL, {"ids": self.ids}, format="json")
+
+        self.assertRelationships(res.json())
+
+    def test_follow_updates_warm_cache(self):
+        """Test follow writes are applied to the warm sets."""
+        call_command("rebuild_follow_cache", "--user", self.user.pk, stdout=mock.Mock())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            follow(self.user, self.follower)
+        with self.assertNumQueries(0):
+            res = self.client.post(RELATIONSHIPS_URL, {"ids": self.ids}, format="json")
+
+        self.assertTrue(res.json()[str(self.follower.pk)]["mutual"])
+
+    def rebuild_while(self, change):
+        """Rebuild the sets, calling change as the rebuild reads the followers."""
+        filter = Follow.objects.filter
+
+        def read(*args, **kwargs):
+            if "followee_id" in kwargs:
+                change()
+            return filter(*args, **kwargs)
+
+        with mock.patch.object(Follow.objects, "filter", side_effect=read):
+            return rebuild_follow_cache(self.user.pk)
+
+    def test_edge_cached_during_rebuild_kept(self):
+        """Test an edge cached after the rebuild read the database survives it."""
+
+        def follow_once():
+            if not Follow.objects.filter(followee=self.follower).exists():
+                Follow.objects.create(follower=self.user, followee=self.follower)
+                follows.cache_edge(self.user.pk, self.follower.pk, True)
+
+        self.assertTrue(self.rebuild_while(follow_once))
+
+        members = get_redis().smembers(follows.following_key(self.user.pk))
+        self.assertIn(str(self.follower.pk).encode(), members)
+        self.assertEqual(get_redis().keys("follows:*:following:*"), [])
+
+    def test_rebuild_gives_up_while_follows_change(self):
+        """Test a rebuild that never sees a quiet moment leaves the sets cold."""
+
+        def cache_edge():
+            follows.cache_edge(self.user.pk, self.followed.pk, True)
+
+        self.assertFalse(self.rebuild_while(cache_edge))
+
+        redis = get_redis()
+        self.assertFalse(redis.sismember(follows.following_key(self.user.pk), 0))
+        self.assertEqual(redis.keys("follows:*:following:*"), [])
+
+    def test_too_many_ids_rejected(self):
+        """Test the lookup size is bounded."""
+        res = self.client.post(
+            RELATIONSHIPS_URL, {"ids": list(range(1, 502))}, format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,113 @@
+"""
+Tests for the orjson and MessagePack renderers and parsers.
+"""
+
+import datetime
+import decimal
+
+import msgpack
+from cloudinary import CloudinaryResource
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.redis import get_redis
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+from user import authentication
+from user.models import User
+from user.serializers import MyTokenObtainPairSerializer
+
+PROFILE_URL = reverse("user:profile")
+RELATIONSHIPS_URL = reverse("user:relationships")
+
+
+class RendererTests(TestCase):
+    """Test the fast renderers produce what DRF's JSONRenderer did."""
+
+    def setUp(self):
+        self.data = {
+            "created": datetime.datetime(
+                2023, 2, 5, 17, 0, 0, 123456, tzinfo=datetime.timezone.utc
+            ),
+            "birthday": datetime.date(2001, 2, 5),
+            "price": decimal.Decimal("1.50"),
+            "avatar": CloudinaryResource(
+                "avatar/abc",
+                format="jpg",
+                version=12,
+                type="upload",
+                resource_type="image",
+            ),
+            7: "int key",
+        }
+
+    def test_json_matches_drf(self):
+        """Test datetime, Decimal and CloudinaryResource values."""
+        data = dict(self.data)
+        data["avatar"] = data["avatar"].get_prep_value()
+
+        self.assertEqual(ORJSONRenderer().render(self.data), JSONRenderer().render(data))
+
+    def test_msgpack_round_trip(self):
+        """Test MessagePack carries the same values as the JSON payload."""
+        packed = msgpack.unpackb(
+            MessagePackRenderer().render(self.data), strict_map_key=False
+        )
+
+        self.assertEqual(packed["created"], "2023-02-05T17:00:00.123456Z")
+        self.assertEqual(packed["birthday"], "2001-02-05")
+        self.assertEqual(packed["price"], 1.5)
+        self.assertEqual(packed["avatar"], "image/upload/v12/avatar/abc.jpg")
+
+
+class NegotiationTests(TestCase):
+    """Test clients pick MessagePack through Accept and Content-Type."""
+
+    def setUp(self):
+        get_redis().flushdb()
+        cache.clear()
+        authentication._local_states.clear()
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            password="goodpass",
+            birthday="2001-02-05T00:00:00Z",
+        )
+        self.client = APIClient()
+        token = MyTokenObtainPairSerializer.get_token(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer {0}".format(token))
+
+    def test_profile_as_msgpack(self):
+        """Test the profile is rendered as MessagePack when accepted."""
+        res = self.client.get(PROFILE_URL, HTTP_ACCEPT="application/msgpack")
+
+        self.assertEqual(res["Content-Type"], "application/msgpack")
+        data = msgpack.unpackb(res.content)
+        self.assertEqual(data["email"], "test@example.com")
+        self.assertEqual(data, self.client.get(PROFILE_URL).json())
+
+    def test_msgpack_request_body(self):
+        """Test a MessagePack request body is parsed."""
+        other = User.objects.create_user(
+            email="other@example.com",
+            password="goodpass",
+            birthday="2001-02-05T00:00:00Z",
+        )
+
+        res = self.client.post(
+            RELATIONSHIPS_URL,
+            msgpack.packb({"ids": [other.pk]}),
+            content_type="application/msgpack",
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(res.json()[str(other.pk)]["following"])
+
+    def test_invalid_msgpack_rejected(self):
+        """Test a malformed body is a 400."""
+        res = self.client.post(
+            RELATIONSHIPS_URL, b"\xc1", content_type="application/msgpack"
+        )
+
+        self.assertEqual(res.status_code, 400)
@@ -0,0 +1,148 @@
+"""
+Tests for routing reads to replicas, with a second sqlite database standing
+in for the replica.
+"""
+
+import os
+import runpy
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.db import router
+from user import authentication
+from user.models import User
+from user.serializers import MyTokenObtainPairSerializer
+
+REPLICA = "replica"
+PROFILE_URL = reverse("user:profile")
+LIST_URL = reverse("user:user_list")
+UPDATE_PROFILE_URL = reverse("user:update_profile")
+CONFIG = os.path.join(settings.BASE_DIR, "core", "config", "database.py")
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA], REPLICA_MAX_LAG=5)
+class ReplicaRoutingTests(TestCase):
+    """Test which database reads go to."""
+
+    databases = {"default", REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings[REPLICA] = {
+            **connections.settings["default"],
+            "NAME": os.path.join(cls.directory.name, "replica.sqlite3"),
+        }
+        call_command("migrate", database=REPLICA, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        cls.directory.cleanup()
+
+    def setUp(self):
+        cache.clear()
+        authentication._local_states.clear()
+        router._lags.clear()
+        self.user, self.other = [
+            User.objects.create_user(
+                email=email,
+                password="goodpass",
+                first_name="Fresh",
+                birthday="2001-02-05T00:00:00Z",
+            )
+            for email in ("test@example.com", "other@example.com")
+        ]
+        # The replica has not replayed the latest change yet.
+        for user in (self.user, self.other):
+            user.first_name = "Stale"
+            user.save(using=REPLICA, force_insert=True)
+            user.first_name = "Fresh"
+        token = MyTokenObtainPairSerializer.get_token(self.user).access_token
+        self.headers = {"Authorization": "Bearer {0}".format(token)}
+
+    def first_name(self):
+        """First name of the other user, as a search finds it."""
+        res = self.client.get(
+            LIST_URL, {"search": "other@example.com"}, headers=self.headers
+        )
+        self.assertEqual(res.status_code, 200)
+        return res.json()["results"][0]["first_name"]
+
+    def test_safe_request_reads_replica(self):
+        self.assertEqual(self.first_name(), "Stale")
+
+    def test_outside_request_reads_primary(self):
+        self.assertEqual(User.objects.get(pk=self.user.pk).first_name, "Fresh")
+
+    def test_reads_stick_to_primary_after_write(self):
+        res = self.client.patch(
+            UPDATE_PROFILE_URL,
+            {"first_name": "Updated"},
+            content_type="application/json",
+            headers=self.headers,
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(cache.get(router.pin_key(self.user.pk)))
+        self.assertEqual(self.first_name(), "Fresh")
+
+    def test_profile_cached_from_primary(self):
+        res = self.client.get(PROFILE_URL, headers=self.headers)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["first_name"], "Fresh")
+
+    def test_lagging_replica_skipped(self):
+        with mock.patch("core.db.router.measure_lag", return_value=60):
+            self.assertEqual(self.first_name(), "Fresh")
+
+    def test_unreachable_replica_skipped(self):
+        with mock.patch("core.db.router.measure_lag", side_effect=DatabaseError):
+            self.assertEqual(self.first_name(), "Fresh")
+        self.assertEqual(router.replica_lag(REPLICA), float("inf"))
+
+    def test_lag_measured_once_per_interval(self):
+        with mock.patch("core.db.router.measure_lag", return_value=0) as measure_lag:
+            self.first_name()
+            cache.clear()
+            self.first_name()
+
+        measure_lag.assert_called_once()
+
+
+class ReplicaConfigTests(SimpleTestCase):
+    """Test replicas are configured from the environment."""
+
+    def test_postgres_replicas(self):
+        environ = {
+            "DB_ENGINE": "postgresql",
+            "DB_HOST": "primary",
+            "DB_PORT": "5432",
+            "DB_REPLICAS": "replica-a,replica-b:5433",
+        }
+        with mock.patch.dict(os.environ, environ):
+            config = runpy.run_path(CONFIG)
+
+        self.assertEqual(config["DATABASE_REPLICAS"], ["replica1", "replica2"])
+        databases = config["DATABASES"]
+        self.assertEqual(
+            (databases["replica1"]["HOST"], databases["replica1"]["PORT"]),
+            ("replica-a", "5432"),
+        )
+        self.assertEqual(
+            (databases["replica2"]["HOST"], databases["replica2"]["PORT"]),
+            ("replica-b", "5433"),
+        )
+        self.assertEqual(databases["replica1"]["TEST"], {"MIRROR": "default"})
@@ -0,0 +1,93 @@
+"""
+Tests for the user search.
+"""
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user.models import Follow, User
+
+SEARCH_URL = reverse("user:user_list")
+
+
+def create_user(email, first_name="", last_name="", **kwargs):
+    return User.objects.create_user(
+        email=email,
+        password="goodpass",
+        first_name=first_name,
+        last_name=last_name,
+        birthday="2001-02-05T00:00:00Z",
+        **kwargs
+    )
+
+
+class UserSearchTests(TestCase):
+    """Test the search ranks, excludes in SQL and pages by keyset."""
+
+    def setUp(self):
+        self.user = create_user("searcher@example.com", "Anna", "Smith")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def search(self, query, **params):
+        return self.client.get(SEARCH_URL, {"search": query, **params})
+
+    def ids(self, res):
+        return [row["id"] for row in res.json()["results"]]
+
+    def test_ranking(self):
+        """Test exact emails, then name prefixes, then substrings."""
+        substring = create_user("a@example.com", "Joanna")
+        prefix = create_user("b@example.com", "Annabel")
+        exact = create_user("anna@example.com")
+
+        res = self.search("anna@example.com")
+        self.assertEqual(self.ids(res), [exact.pk])
+
+        res = self.search("anna")
+        self.assertEqual(self.ids(res), [prefix.pk, exact.pk, substring.pk])
+
+    def test_excludes_self_followed_and_inactive(self):
+        """Test the searcher, followed and inactive users are left out."""
+        followed = create_user("tom1@example.com", "Tom")
+        inactive = create_user("tom2@example.com", "Tom", is_active=False)
+        other = create_user("tom3@example.com", "Tom")
+        Follow.objects.create(follower=self.user, followee=followed)
+
+        res = self.search("tom")
+        self.assertEqual(self.ids(res), [other.pk])
+        self.assertNotIn(inactive.pk, self.ids(res))
+        self.assertEqual(self.ids(self.search("searcher")), [])
+
+    def test_keyset_pages(self):
+        """Test pages follow each other without gaps or repeats."""
+        users = [create_user("bob{0}@example.com".format(i), "Bob") for i in range(5)]
+
+        seen = []
+        res = self.search("bob", page_size=2)
+        while True:
+            seen.extend(self.ids(res))
+            if res.json()["next"] is None:
+                break
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(res.json()["next"])
+            selects = [q for q in queries if q["sql"].startswith("SELECT")]
+            self.assertEqual(len(selects), 1)
+
+        self.assertEqual(seen, sorted([user.pk for user in users], reverse=True))
+
+    def test_short_query_rejected(self):
+        """Test queries too short for the index are rejected."""
+        res = self.search("ab")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor is a 404 like other paginators."""
+        res = self.search("bob", cursor="not-a-cursor")
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,135 @@
+"""
+Tests for the Sentry sampling and initialization.
+"""
+
+import os
+import runpy
+from datetime import datetime, timedelta
+from unittest import mock
+
+import sentry_sdk
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from core import sentry
+
+START = datetime(2023, 2, 5, 17, 0, 0)
+CONFIG = os.path.join(settings.BASE_DIR, "core", "config", "sentry.py")
+
+
+def transaction(path, status=200, seconds=0.05):
+    return {
+        "type": "transaction",
+        "start_timestamp": START,
+        "timestamp": START + timedelta(seconds=seconds),
+        "tags": {"http.status_code": str(status)},
+        "contexts": {"trace": {"status": "ok" if status < 400 else "internal_error"}},
+        "request": {"url": "http://testserver" + path},
+    }
+
+
+class TracesSamplingTests(SimpleTestCase):
+    """Test transactions are kept by route, status and duration."""
+
+    def test_hot_routes_down_sampled(self):
+        self.assertEqual(sentry.sample_rate(transaction("/health-check")), 0.0)
+        self.assertEqual(sentry.sample_rate(transaction("/user/profile")), 0.01)
+
+    def test_other_routes_use_default_rate(self):
+        with self.settings(SENTRY_TRACES_SAMPLE_RATE=0.2):
+            self.assertEqual(sentry.sample_rate(transaction("/user/register")), 0.2)
+            self.assertEqual(sentry.sample_rate(transaction("/not-a-route")), 0.2)
+
+    def test_errors_and_slow_requests_kept(self):
+        self.assertEqual(sentry.sample_rate(transaction("/health-check", 500)), 1.0)
+        self.assertEqual(sentry.sample_rate(transaction("/user/profile", seconds=5)), 1.0)
+
+    def test_client_errors_raised_to_floor(self):
+        with self.settings(SENTRY_TRACES_CLIENT_ERROR_RATE=0.5):
+            self.assertEqual(sentry.sample_rate(transaction("/user/profile", 401)), 0.5)
+
+    def test_task_errors_kept(self):
+        event = {"contexts": {"trace": {"status": "internal_error"}}}
+
+        self.assertEqual(sentry.sample_rate(event), 1.0)
+
+    def test_before_send_drops_unsampled(self):
+        with mock.patch("core.sentry.random.random", return_value=0.5):
+            self.assertIsNone(
+                sentry.before_send_transaction(transaction("/user/profile"), {})
+            )
+            event = transaction("/user/profile", 500)
+            self.assertIs(sentry.before_send_transaction(event, {}), event)
+
+    @override_settings(SENTRY_TRACES_UPGRADE_RATE=0.5)
+    def test_recorded_by_route(self):
+        def sampled(**context):
+            return sentry.traces_sampler({"parent_sampled": None, **context})
+
+        self.assertEqual(sampled(wsgi_environ={"PATH_INFO": "/health-check"}), 0.5)
+        self.assertEqual(sampled(asgi_scope={"path": "/user/profile"}), 0.5)
+        with self.settings(SENTRY_TRACES_SAMPLE_RATE=0.8):
+            self.assertEqual(sampled(asgi_scope={"path": "/user/register"}), 0.8)
+        self.assertEqual(sampled(celery_job={"task": "user.tasks.send_email"}), 0.5)
+        self.assertIs(sentry.traces_sampler({"parent_sampled": True}), True)
+
+    @override_settings(SENTRY_TRACES_UPGRADE_RATE=0.5)
+    def test_recorded_transactions_thinned_to_route_rate(self):
+        with mock.patch("core.sentry.random.random", return_value=0.019):
+            event = transaction("/user/profile")
+            self.assertIs(sentry.before_send_transaction(event, {}), event)
+        with mock.patch("core.sentry.random.random", return_value=0.021):
+            self.assertIsNone(sentry.before_send_transaction(event, {}))
+
+    def test_unsampled_route_errors_kept(self):
+        """Test errors and slow requests of a route at 0.0 are sent."""
+        context = {"parent_sampled": None, "wsgi_environ": {"PATH_INFO": "/health-check"}}
+        self.assertEqual(sentry.traces_sampler(context), 1.0)
+
+        with mock.patch("core.sentry.random.random", return_value=0.999):
+            for event in (
+                transaction("/health-check", 500),
+                transaction("/health-check", seconds=5),
+            ):
+                self.assertIs(sentry.before_send_transaction(event, {}), event)
+        with mock.patch("core.sentry.random.random", return_value=0.0):
+            self.assertIsNone(
+                sentry.before_send_transaction(transaction("/health-check"), {})
+            )
+
+    def test_route_rates_from_environment(self):
+        environ = {"SENTRY_TRACES_ROUTE_RATES": "user:profile=0.05, user:register=1"}
+        with mock.patch.dict(os.environ, environ):
+            rates = runpy.run_path(CONFIG)["SENTRY_TRACES_ROUTE_RATES"]
+
+        self.assertEqual(rates["user:profile"], 0.05)
+        self.assertEqual(rates["user:register"], 1.0)
+        self.assertEqual(rates["health_check"], 0.0)
+
+
+class InitSentryTests(SimpleTestCase):
+    """Test Sentry starts only when asked to."""
+
+    def setUp(self):
+        patcher = mock.patch.object(sentry, "_initialized", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_settings_import_has_no_side_effect(self):
+        self.assertIsNone(sentry_sdk.Hub.current.client)
+
+    @override_settings(SENTRY_DSN=None)
+    def test_no_dsn(self):
+        with mock.patch("sentry_sdk.init") as init:
+            sentry.init_sentry()
+
+        init.assert_not_called()
+
+    @override_settings(SENTRY_DSN="https://key@example.com/1")
+    def test_initialized_once(self):
+        with mock.patch("sentry_sdk.init") as init:
+            sentry.init_sentry()
+            sentry.init_sentry()
+
+        init.assert_called_once()
+        self.assertIs(init.call_args.kwargs["traces_sampler"], sentry.traces_sampler)
@@ -0,0 +1,136 @@
+"""
+Tests for the production server profile.
+"""
+
+import os
+import runpy
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from redis.exceptions import ConnectionError
+
+from core import server
+
+CONFIG = os.path.join(settings.BASE_DIR, "gunicorn-cfg.py")
+
+
+class SizingTests(SimpleTestCase):
+    """Test workers are sized from the CPUs and memory of the container."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+
+    def write(self, path, content):
+        path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(content + "\n")
+
+    def test_worker_count(self):
+        self.assertEqual(server.worker_count("asgi", 4), 4)
+        self.assertEqual(server.worker_count("wsgi", 4), 9)
+        self.assertEqual(server.worker_count("wsgi", 4, memory=512 * 2**20), 2)
+        self.assertEqual(server.worker_count("asgi", 4, memory=2**20), 1)
+
+    def test_cgroup_v2_limits(self):
+        self.write("cpu.max", "150000 100000")
+        self.write("memory.max", str(2**30))
+
+        with mock.patch("os.sched_getaffinity", return_value=set(range(8))):
+            self.assertEqual(server.available_cpus(self.root), 2)
+        self.assertEqual(server.available_memory(self.root), 2**30)
+
+    def test_cgroup_v1_limits(self):
+        self.write("cpu/cpu.cfs_quota_us", "50000")
+        self.write("cpu/cpu.cfs_period_us", "100000")
+        self.write("memory/memory.limit_in_bytes", str(2**29))
+
+        self.assertEqual(server.available_cpus(self.root), 1)
+        self.assertEqual(server.available_memory(self.root), 2**29)
+
+    def test_unlimited(self):
+        self.write("cpu.max", "max 100000")
+        self.write("memory.max", "max")
+
+        with mock.patch("os.sched_getaffinity", return_value={0, 1, 2}):
+            self.assertEqual(server.available_cpus(self.root), 3)
+        self.assertGreater(server.available_memory(self.root), 0)
+
+
+class ConfigTests(SimpleTestCase):
+    """Test the gunicorn configuration."""
+
+    def load(self, **environ):
+        with mock.patch.dict(os.environ, environ):
+            return runpy.run_path(CONFIG)
+
+    def test_asgi(self):
+        config = self.load(SERVER_INTERFACE="asgi", WEB_CONCURRENCY="")
+
+        self.assertEqual(config["worker_class"], "uvicorn.workers.UvicornWorker")
+        self.assertEqual(config["wsgi_app"], "core.asgi:application")
+        self.assertTrue(config["preload_app"])
+        self.assertGreaterEqual(config["workers"], 1)
+        self.assertEqual(config["max_requests_jitter"], config["max_requests"] // 10)
+
+    def test_wsgi_overrides(self):
+        config = self.load(
+            SERVER_INTERFACE="wsgi",
+            WEB_CONCURRENCY="3",
+            GUNICORN_THREADS="8",
+            PORT="9000",
+        )
+
+        self.assertEqual(config["worker_class"], "gthread")
+        self.assertEqual(config["wsgi_app"], "core.wsgi:application")
+        self.assertEqual((config["workers"], config["threads"]), (3, 8))
+        self.assertEqual(config["bind"], "0.0.0.0:9000")
+
+    def test_ready_file(self):
+        ready_file = os.path.join(tempfile.gettempdir(), "test-gunicorn.ready")
+        config = self.load(SERVER_READY_FILE=ready_file)
+
+        config["post_worker_init"](mock.Mock(pid=1))
+        self.assertTrue(os.path.exists(ready_file))
+        config["on_exit"](None)
+        self.assertFalse(os.path.exists(ready_file))
+
+    def test_ready_file_removed_with_last_worker(self):
+        ready_file = os.path.join(tempfile.gettempdir(), "test-gunicorn.ready")
+        config = self.load(SERVER_READY_FILE=ready_file)
+        self.addCleanup(config["on_exit"], None)
+        first, second = mock.Mock(pid=1), mock.Mock(pid=2)
+        config["post_worker_init"](first)
+        config["post_worker_init"](second)
+
+        with mock.patch("prometheus_client.multiprocess.mark_process_dead"):
+            config["worker_exit"](None, first)
+            config["child_exit"](None, first)
+            self.assertTrue(os.path.exists(ready_file))
+            # Killed without running worker_exit.
+            config["child_exit"](None, second)
+
+        self.assertFalse(os.path.exists(ready_file))
+        self.assertEqual(config["live_workers"](), [])
+
+
+class ReadyTests(TestCase):
+    """Test the readiness probe checks the backing services."""
+
+    def test_ready(self):
+        res = self.client.get(reverse("ready"))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {"status": "ready"})
+
+    def test_redis_down(self):
+        with mock.patch("home.views.get_redis") as get_redis:
+            get_redis.return_value.ping.side_effect = ConnectionError()
+            res = self.client.get(reverse("ready"))
+
+        self.assertEqual(res.status_code, 503)
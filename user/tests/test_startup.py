@@ -0,0 +1,92 @@
+"""
+Tests for the cold start of the settings.
+"""
+
+import subprocess
+import sys
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.hosts import InternalIPs
+from user.management.commands.startup_profile import (
+    SETTINGS_BUDGET,
+    parse_importtime,
+    profile_startup,
+)
+
+IMPORT_TIME = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     core.config.cache
+import time:       200 |        300 |   core.config
+import time:       400 |        700 | core.development
+import time:       500 |        500 | socket
+"""
+
+
+class StartupTests(SimpleTestCase):
+    """Test importing the settings stays cheap."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.runs = [profile_startup("core.settings") for _ in range(3)]
+
+    def test_within_budget(self):
+        fastest = min(phases["settings"] for phases, _ in self.runs)
+
+        self.assertLessEqual(fastest, SETTINGS_BUDGET)
+
+    def test_integrations_not_loaded(self):
+        _, roots = self.runs[0]
+        settings = next(root for root in roots if root.name == "core.settings")
+        loaded = {name.split(".")[0] for name in settings.names()}
+
+        for package in ("celery", "cloudinary", "daphne", "sentry_sdk", "twisted"):
+            self.assertNotIn(package, loaded)
+
+    def test_no_dns_lookup(self):
+        script = (
+            "import socket\n"
+            "def lookup(*args):\n"
+            "    raise SystemExit('DNS lookup on import')\n"
+            "socket.gethostbyname_ex = socket.gethostbyname = lookup\n"
+            "import core.settings\n"
+        )
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_parse_importtime(self):
+        (development, socket) = parse_importtime(IMPORT_TIME)
+
+        self.assertEqual(development.name, "core.development")
+        self.assertEqual(development.cumulative, 0.7)
+        self.assertEqual(
+            list(development.names()),
+            ["core.development", "core.config", "core.config.cache"],
+        )
+        self.assertEqual(socket.children, [])
+
+
+class InternalIPsTests(SimpleTestCase):
+    """Test the debug toolbar addresses are resolved on first use."""
+
+    def test_listed_address(self):
+        ips = InternalIPs(["127.0.0.1"])
+
+        with mock.patch("socket.gethostbyname_ex") as lookup:
+            self.assertIn("127.0.0.1", ips)
+
+        lookup.assert_not_called()
+
+    def test_gateways(self):
+        ips = InternalIPs(["127.0.0.1"])
+
+        with mock.patch(
+            "socket.gethostbyname_ex", return_value=("web", [], ["172.18.0.5"])
+        ) as lookup:
+            self.assertIn("172.18.0.1", ips)
+            self.assertNotIn("172.18.0.5", ips)
+
+        lookup.assert_called_once()
@@ -2,13 +2,20 @@
 Tests for the user API.
 """
 
+from unittest import mock
+
 from django.core import serializers
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from user import authentication
 from user.models import User
+from user.serializers import MyTokenObtainPairSerializer
 
 REGISTER_URL = reverse("user:register")
 LOGIN_URL = reverse("user:login")
@@ -35,7 +42,7 @@ class UnAuthenticatedUserApiTests(TestCase):
 
         res = self.client.post(LOGIN_URL, payload)
 
-        self.assertIn("access", res.data)
+        self.assertIn("access", res.json())
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
     def test_login_bad_password(self):
@@ -53,7 +60,7 @@ class UnAuthenticatedUserApiTests(TestCase):
         payload = {"email": "test@example.com", "password": "badpass"}
         res = self.client.post(LOGIN_URL, payload)
 
-        self.assertNotIn("access", res.data)
+        self.assertNotIn("access", res.json())
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
     def test_login_email_not_found(self):
@@ -61,7 +68,7 @@ class UnAuthenticatedUserApiTests(TestCase):
         payload = {"email": "test@example.com", "password": "pass123"}
         res = self.client.post(LOGIN_URL, payload)
 
-        self.assertNotIn("access", res.data)
+        self.assertNotIn("access", res.json())
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
     def test_my_profile_unauthorized(self):
@@ -86,7 +93,7 @@ class UnAuthenticatedUserApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
         user = User.objects.get(email=payload["email"])
         self.assertTrue(user.check_password(payload["password"]))
-        self.assertNotIn("password", res.data)
+        self.assertNotIn("password", res.json())
 
     def test_user_with_email_exists_error(self):
         """Test error returned if user with email exists."""
@@ -104,6 +111,21 @@ class UnAuthenticatedUserApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_other_integrity_error_not_reported_as_taken_email(self):
+        """Test only a conflict on the email is reported as a taken email."""
+        payload = {
+            "email": "test@example.com",
+            "password": "testpass123",
+            "confirm_password": "testpass123",
+            "gender": "male",
+            "birthday": "2001-02-05",
+        }
+        error = IntegrityError("NOT NULL constraint failed: User.birthday")
+
+        with mock.patch.object(User.objects, "acreate_user", side_effect=error):
+            with self.assertRaises(IntegrityError):
+                self.client.post(REGISTER_URL, payload)
+
     def test_password_too_short_error(self):
         """Test an error is returned if password less than 5 chars."""
         payload = {
@@ -138,6 +160,56 @@ class UnAuthenticatedUserApiTests(TestCase):
         self.assertFalse(user_exists)
 
 
+class RegistrationWriteTests(TransactionTestCase):
+    """Test registration stays a single write."""
+
+    payload = {
+        "email": "test@example.com",
+        "password": "testpass123",
+        "confirm_password": "testpass123",
+        "first_name": "Test",
+        "last_name": "Name",
+        "gender": "male",
+        "birthday": "2001-02-05T00:00:00Z",
+    }
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def post_and_capture(self, payload):
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.post(REGISTER_URL, payload)
+        # sqlite logs the BEGIN/COMMIT that postgres issues implicitly.
+        statements = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"] not in ("BEGIN", "COMMIT", "ROLLBACK")
+        ]
+        return res, statements
+
+    def test_register_user_is_single_insert(self):
+        """Test registering runs one INSERT with the default images set."""
+        res, statements = self.post_and_capture(self.payload)
+
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith("INSERT"))
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        user = User.objects.get(email=self.payload["email"])
+        self.assertEqual(user.avatar.public_id, "default/avatar_default")
+        self.assertEqual(user.cover.public_id, "default/cover_default")
+
+    def test_register_email_exists_ignoring_case(self):
+        """Test an email differing only in case is rejected."""
+        self.client.post(REGISTER_URL, self.payload)
+        payload = dict(self.payload, email="TEST@example.com")
+
+        res, statements = self.post_and_capture(payload)
+
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(User.objects.count(), 1)
+
+
 class AuthenticatedUserApiTests(TestCase):
     """Test API requests that require authentication."""
 
@@ -150,14 +222,18 @@ class AuthenticatedUserApiTests(TestCase):
             "gender": "1",
             "birthday": "2001-02-05",
         }
+        cache.clear()
+        authentication._local_states.clear()
         self.user = User.objects.create_user(**self.payload)
         self.client = APIClient()
 
     def test_retrieve_profile_success(self):
         """Test retrieving profile for authenticated user."""
-        self.client.force_authenticate(user=self.user)
+        token = MyTokenObtainPairSerializer.get_token(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer {0}".format(token))
         res = self.client.get(PROFILE_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()["email"], self.payload["email"])
 
     def test_retrieve_profile_failed(self):
         """Test retrieving profile for Unauthenticated user."""
@@ -171,7 +247,7 @@ class AuthenticatedUserApiTests(TestCase):
             "password": "goodpass",
         }
         res = self.client.post(LOGIN_URL, payload)
-        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + res.data["access"])
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + res.json()["access"])
         res = self.client.get(PROFILE_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
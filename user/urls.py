@@ -1,23 +1,40 @@
 from django.urls import path
 
 from user.views import (
+    ConfirmUploadView,
+    DirectUploadView,
+    FollowersListView,
+    FollowingListView,
+    FollowUserView,
+    LocalUploadView,
+    LoginView,
     MyProfileView,
-    MyTokenObtainPairView,
+    OnlineStatusView,
+    RegisterView,
+    RelationshipsView,
     RequestForgotPassword,
     ResetForgotPassword,
+    UnFollowUserView,
     UpdateMyProfileView,
+    UploadNotificationView,
     UserProfileView,
-    UserRegisterAPIView,
+    UsersListView,
     ValidatePassword,
 )
 
 app_name = "user"
 urlpatterns = [
-    # path("/list", UsersListView.as_view(), name="user_list"),
-    path("/register", UserRegisterAPIView.as_view(), name="register"),
-    path("/login", MyTokenObtainPairView.as_view(), name="login"),
+    path("/list", UsersListView.as_view(), name="user_list"),
+    path("/register", RegisterView.as_view(), name="register"),
+    path("/login", LoginView.as_view(), name="login"),
     path("/profile", MyProfileView.as_view(), name="profile"),
     path("/profile/update", UpdateMyProfileView.as_view(), name="update_profile"),
+    path("/profile/upload", DirectUploadView.as_view(), name="direct_upload"),
+    path("/profile/upload/confirm", ConfirmUploadView.as_view(), name="confirm_upload"),
+    path(
+        "/profile/upload/notify", UploadNotificationView.as_view(), name="upload_notify"
+    ),
+    path("/profile/upload/local", LocalUploadView.as_view(), name="local_upload"),
     path("/profile/<int:pk>", UserProfileView.as_view(), name="people_profile"),
     path("/validate/password", ValidatePassword.as_view(), name="validate_password"),
     path(
@@ -30,9 +47,12 @@ urlpatterns = [
         ResetForgotPassword.as_view(),
         name="reset_password",
     ),
-    # path("/follow", FollowUserView.as_view(), name="follow_user"),
-    # path("/unfollow", UnFollowUserView.as_view(), name="unfollow_user"),
-    # path("/follows/<int:pk>", FollowUserRetrieveView.as_view(), name="follow_people"),
+    path("/follow", FollowUserView.as_view(), name="follow_user"),
+    path("/unfollow", UnFollowUserView.as_view(), name="unfollow_user"),
+    path("/<int:pk>/followers", FollowersListView.as_view(), name="followers"),
+    path("/<int:pk>/following", FollowingListView.as_view(), name="following"),
+    path("/relationships", RelationshipsView.as_view(), name="relationships"),
+    path("/online", OnlineStatusView.as_view(), name="online_status"),
     # path("/mute", MuteNotifyUserView.as_view(), name="mute_user"),
     # path("/unmute", UnMuteNotifyUserView.as_view(), name="unmute_user"),
     # path("/mutes/<int:pk>", MuteNotifyUserRetrieveView.as_view(), name="mute_people"),
@@ -1,8 +1,25 @@
+import json
+from functools import partial
+
+import msgpack
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.tokens import default_token_generator
-from django.core.signing import Signer
-from django.db.models import Q
+from django.core.signing import BadSignature, Signer
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    IntegrityError,
+    OperationalError,
+    router,
+    transaction,
+)
+from django.db.models import F, Q
+from django.http import JsonResponse
 from django.template.loader import get_template
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, generics, status
 from rest_framework.decorators import api_view, permission_classes
@@ -11,26 +28,131 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 
+from core.db.router import bind_user
+from core.renderers import render_response
+from user import media
+from user.authentication import StatelessJWTAuthentication, aauthenticate, full_user
+from user.cache import aget_profile, ainvalidate_profile, invalidate_profile
+from user.follows import follow, relationships, unfollow
+from user.hashing import acheck_password, arun_default_hasher, run_hasher
+from user.logins import record_login
+from user.mail import queue_email
 from user.models import User
+from user.pagination import FollowPagination, UserSearchPagination
+from user.presence import online_status
+from user.search import (
+    MIN_QUERY_LENGTH,
+    is_query_canceled,
+    search_users,
+    set_search_timeout,
+)
 from user.serializers import (
-    FollowUserSerializer,
+    ConfirmUploadSerializer,
+    DirectUploadSerializer,
     MuteNotifyUserSerializer,
     MyTokenObtainPairSerializer,
+    UserIdsSerializer,
     UserProfileSerializer,
     UserSerializer,
+    UserSummarySerializer,
 )
 
 # from friend.models import Friend
-from user.tasks import send_email
 
 signer = Signer(salt="extra")
 
 
+def parse_body(request):
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return {}
+    elif request.content_type == "application/msgpack":
+        try:
+            data = msgpack.unpackb(request.body, raw=False)
+        except (msgpack.UnpackException, ValueError, TypeError):
+            return {}
+    else:
+        return request.POST
+    return data if isinstance(data, dict) else {}
+
+
+def unauthorized(request):
+    return render_response(
+        request,
+        {"detail": "Authentication credentials were not provided."},
+        status=status.HTTP_401_UNAUTHORIZED,
+        headers={"WWW-Authenticate": 'Bearer realm="api"'},
+    )
+
+
+def is_email_taken(exc):
+    """
+    Whether an IntegrityError comes from a unique constraint on the email:
+    the case-insensitive index, or email and username (set to the email)
+    themselves. postgres reports the constraint name, sqlite only a message.
+    """
+    diag = getattr(exc.__cause__, "diag", None)
+    name = getattr(diag, "constraint_name", None) or str(exc)
+    return "email" in name or "username" in name
+
+
+def not_found(request):
+    return render_response(
+        request, {"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND
+    )
+
+
+async def render_profile(user_id):
+    # Read from the primary: a lagging replica could put a profile older
+    # than the last invalidation back in the cache, for the whole timeout.
+    user = await User.objects.using(DEFAULT_DB_ALIAS).aget(pk=user_id)
+    return UserProfileSerializer(user).data
+
+
 # Create your views here.
 class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
 
 
+@method_decorator(csrf_exempt, name="dispatch")
+class LoginView(View):
+    """
+    Async MyTokenObtainPairView. The password is checked in the hashing pool
+    and last_login is recorded for the next batched write.
+    """
+
+    async def post(self, request):
+        data = parse_body(request)
+        errors = {
+            field: ["This field is required."]
+            for field in (User.USERNAME_FIELD, "password")
+            if not data.get(field)
+        }
+        if errors:
+            return JsonResponse(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        user = await User.objects.filter(
+            **{User.USERNAME_FIELD: data[User.USERNAME_FIELD]}
+        ).afirst()
+        if user is None:
+            await arun_default_hasher(data["password"])
+        elif user.is_active and await acheck_password(user, data["password"]):
+            await sync_to_async(record_login, thread_sensitive=False)(user.pk)
+            return JsonResponse(MyTokenObtainPairSerializer.token_data(user))
+        return JsonResponse(
+            {
+                "detail": str(
+                    MyTokenObtainPairSerializer.default_error_messages[
+                        "no_active_account"
+                    ]
+                )
+            },
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+
+
 class TestAPIView(APIView):
     def post(self, request):
         serializer = UserSerializer(data=request.data, many=False)
@@ -40,44 +162,56 @@ class TestAPIView(APIView):
         return Response("OK", status=status.HTTP_201_CREATED)
 
 
-class UserRegisterAPIView(generics.CreateAPIView):
-    queryset = User.objects.all()
-    serializer_class = UserSerializer
-
-    def create(self, request, *args, **kwargs):
-        """
-        data = {
-            'first_name': 'Clark',
-            'last_name': 'Le',
-            'email': '',
-            'password': 'Lnha2001',
-            'confirm_password': 'Lnha2001',
-            'gender': 'female',
-            'birthday': '2023-02-09T17:00:00.000Z'
-        }
-        """
-        if User.objects.filter(email=request.data["email"]).exists():
-            return Response("Your email existed!", status=status.HTTP_400_BAD_REQUEST)
-        elif len(request.data["password"]) < 6:
-            return Response(
+@method_decorator(csrf_exempt, name="dispatch")
+class RegisterView(View):
+    """
+    Async registration. The password is hashed in the hashing pool and the
+    user is saved with a single INSERT, a taken email is caught by the
+    case-insensitive unique index.
+
+    data = {
+        'first_name': 'Clark',
+        'last_name': 'Le',
+        'email': '',
+        'password': 'Lnha2001',
+        'confirm_password': 'Lnha2001',
+        'gender': 'female',
+        'birthday': '2023-02-09T17:00:00.000Z'
+    }
+    """
+
+    async def post(self, request):
+        data = parse_body(request)
+        password = data.get("password") or ""
+        if len(password) < 6:
+            return render_response(
+                request,
                 "Password must be at least 6 characters!",
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        elif request.data["password"] != request.data["confirm_password"]:
-            return Response(
-                "Confirm Password does not match!", status=status.HTTP_400_BAD_REQUEST
+        elif password != data.get("confirm_password"):
+            return render_response(
+                request,
+                "Confirm Password does not match!",
+                status=status.HTTP_400_BAD_REQUEST,
             )
-        else:
-            serializer = self.get_serializer(data=request.data)
-            serializer.is_valid(raise_exception=True)
-            self.perform_create(serializer)
-            print(serializer.data)
-            headers = self.get_success_headers(serializer.data)
-            return Response(
-                {"token": serializer.data["id"]},
-                status=status.HTTP_201_CREATED,
-                headers=headers,
+        serializer = UserSerializer(data=data)
+        if not serializer.is_valid():
+            return render_response(
+                request, serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            user = await User.objects.acreate_user(**serializer.validated_data)
+        except IntegrityError as exc:
+            if not is_email_taken(exc):
+                raise
+            return render_response(
+                request, "Your email existed!", status=status.HTTP_400_BAD_REQUEST
             )
+        bind_user(user.pk)
+        return render_response(
+            request, {"token": user.pk}, status=status.HTTP_201_CREATED
+        )
 
 
 @api_view(["GET"])
@@ -88,26 +222,35 @@ def getMyProfile(request):
     return Response(serializer.data, status.HTTP_200_OK)
 
 
-class MyProfileView(generics.RetrieveAPIView):
-    permission_classes = [IsAuthenticated]
-    serializer_class = UserProfileSerializer
+class MyProfileView(View):
+    """Profile of the authenticated user, from the profile cache."""
 
-    def get_object(self):
-        return self.request.user
+    async def get(self, request):
+        user = await aauthenticate(request)
+        if user is None:
+            return unauthorized(request)
+        data = await aget_profile(user.pk, partial(render_profile, user.pk))
+        return render_response(request, data)
 
 
-class UserProfileView(generics.RetrieveAPIView):
-    queryset = User.objects.all()
-    serializer_class = UserProfileSerializer
-    lookup_field = "pk"
+class UserProfileView(View):
+    """Public profile of any user, from the profile cache."""
+
+    async def get(self, request, pk):
+        try:
+            data = await aget_profile(pk, partial(render_profile, pk))
+        except User.DoesNotExist:
+            return not_found(request)
+        return render_response(request, data)
 
 
 class UpdateMyProfileView(generics.UpdateAPIView):
+    authentication_classes = [StatelessJWTAuthentication]
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        return full_user(self.request.user)
 
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop("partial", False)
@@ -115,6 +258,7 @@ class UpdateMyProfileView(generics.UpdateAPIView):
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
+        invalidate_profile(instance.pk)
 
         if getattr(instance, "_prefetched_objects_cache", None):
             # If 'prefetch_related' has been applied to a queryset, we need to
@@ -124,153 +268,297 @@ class UpdateMyProfileView(generics.UpdateAPIView):
         return Response(serializer.data)
 
 
-class ValidatePassword(APIView):
+class DirectUploadView(APIView):
+    """Signed parameters to upload an avatar or cover straight to storage."""
+
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, format=None):
-        password = request.data.get("password", None)
-        print(request.data)
-        user = User.objects.get(email=request.user.email)
+        serializer = DirectUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        field = User._meta.get_field(serializer.validated_data["field"])
         return Response(
-            data={"status": user.check_password(password)}, status=status.HTTP_200_OK
+            media.direct_upload(User, request.user, field), status=status.HTTP_200_OK
         )
 
 
-class RequestForgotPassword(APIView):
+class ConfirmUploadView(APIView):
+    """Attach a direct upload with the response the client got from storage."""
+
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
     def post(self, request, format=None):
-        email = request.data["email"]
-        if User.objects.filter(email=email).exists():
-            user = User.objects.get(email__exact=email)
-
-            # Reset password email
-            current_site = settings.FRONT_END_HOST
-            mail_subject = "Reset Your Password"
-            uid = signer.sign(int(user.pk))
-            token = default_token_generator.make_token(user)
-            context_message = {
-                "user": user,
-                "domain": current_site,
-                "uid": uid,
-                "token": token,
-            }
-            messages = get_template("email_rest_password.html").render(
-                context_message
-            )  # noqa: 501
-            send_email.delay(mail_subject, messages, recipients=[email])
-            # send_email = EmailMessage(mail_subject, messages, to=[email])
-            # send_email.content_subtype = 'html'
-            # send_email.send(fail_silently=False)
-            data = {
-                "status": True,
-                "message": "Password reset email has been sent to your email address.",
-                "uid": uid,
-                "token": token,
-            }
-        else:
+        serializer = ConfirmUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = dict(serializer.validated_data)
+        field = User._meta.get_field(data.pop("field"))
+        try:
+            values = media.confirm_upload(User, request.user, field, **data)
+        except ValueError as error:
+            return Response(
+                data={"status": "400", "message": str(error)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(values, status=status.HTTP_200_OK)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class UploadNotificationView(View):
+    """Receive the result of a direct upload posted by Cloudinary."""
+
+    def post(self, request, format=None):
+        try:
+            media.receive_notification(
+                User,
+                request.body.decode(),
+                request.headers.get("X-Cld-Timestamp", ""),
+                request.headers.get("X-Cld-Signature", ""),
+            )
+        except ValueError as error:
+            return JsonResponse(
+                {"status": "400", "message": str(error)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return JsonResponse({"status": "200", "message": "OK"})
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class LocalUploadView(View):
+    """The upload API of Cloudinary while MEDIA_UPLOAD_BACKEND is LocalBackend."""
+
+    def post(self, request, format=None):
+        if not isinstance(media.get_backend(), media.LocalBackend):
+            return JsonResponse({"error": {"message": "Not found."}}, status=404)
+        try:
+            data = media.receive_local_upload(request.POST.dict(), request.FILES["file"])
+        except (KeyError, ValueError) as error:
+            return JsonResponse(
+                {"error": {"message": str(error)}}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return JsonResponse(data)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class ValidatePassword(View):
+    async def post(self, request, format=None):
+        user = await aauthenticate(request)
+        if user is None:
+            return unauthorized(request)
+        password = parse_body(request).get("password") or ""
+        user = await User.objects.only("password").aget(pk=user.pk)
+        return JsonResponse(
+            {"status": await acheck_password(user, password)},
+            status=status.HTTP_200_OK,
+        )
+
+
+def send_reset_password_email(user, uid, token):
+    context_message = {
+        "user": user,
+        "domain": settings.FRONT_END_HOST,
+        "uid": uid,
+        "token": token,
+    }
+    messages = get_template("email_rest_password.html").render(context_message)
+    queue_email("Reset Your Password", messages, recipients=[user.email])
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class RequestForgotPassword(View):
+    async def post(self, request):
+        email = parse_body(request).get("email")
+        user = await User.objects.filter(email=email).afirst() if email else None
+        if user is None:
             data = {"status": False, "message": "Account does not exist!"}
-        return Response(data, status=status.HTTP_200_OK)
+            return render_response(request, data)
 
+        uid = signer.sign(int(user.pk))
+        token = default_token_generator.make_token(user)
+        await sync_to_async(send_reset_password_email, thread_sensitive=False)(
+            user, uid, token
+        )
+        data = {
+            "status": True,
+            "message": "Password reset email has been sent to your email address.",
+            "uid": uid,
+            "token": token,
+        }
+        return render_response(request, data)
 
-class ResetForgotPassword(APIView):
-    def get(self, request, uidb64, token, format=None):
-        print(uidb64)
-        print(token)
+
+@method_decorator(csrf_exempt, name="dispatch")
+class ResetForgotPassword(View):
+    async def get_user(self, uidb64, token):
+        """The user of a reset link, None when it is forged or expired."""
         try:
             uid = int(signer.unsign(uidb64))
-            user = User.objects.get(id=uid)
-        except (TypeError, ValueError, OverflowError, User.DoesNotExist):
-            user = None
-
-        if user is not None and default_token_generator.check_token(user, token):
+        except (BadSignature, TypeError, ValueError, OverflowError):
+            return None
+        user = await User.objects.filter(pk=uid).afirst()
+        if user is None or not default_token_generator.check_token(user, token):
+            return None
+        return user
+
+    async def get(self, request, uidb64, token):
+        if await self.get_user(uidb64, token) is not None:
             data = {"status": True, "message": "Please reset your password"}
         else:
             data = {"status": False, "message": "This link has been expired!"}
-        return Response(data, status=status.HTTP_200_OK)
+        return render_response(request, data)
 
-    def post(self, request, uidb64, token, format=None):
-        password = request.data["password"]
-        confirm_password = request.data["confirm_password"]
-        if password == confirm_password:
-            uid = int(signer.unsign(uidb64))
-            user = User.objects.get(id=uid)
-            user.set_password(password)
-            user.save()
-            data = {
-                "status": 1,
-                "message": (
-                    "Reset your password successfully. You can login your account now!"
-                ),
-            }
-        else:
+    async def post(self, request, uidb64, token):
+        data = parse_body(request)
+        password = data.get("password")
+        if not password or password != data.get("confirm_password"):
             data = {
                 "status": -1,
                 "message": "Your new password and the confirmation is not equal!",
             }
-        return Response(data, status=status.HTTP_200_OK)
+            return render_response(request, data)
+
+        user = await self.get_user(uidb64, token)
+        if user is None:
+            data = {"status": -1, "message": "This link has been expired!"}
+            return render_response(request, data)
+
+        bind_user(user.pk)
+        user.password = await run_hasher(make_password, password)
+        user.token_version += 1
+        await user.asave(update_fields=["password", "token_version"])
+        await ainvalidate_profile(user.pk)
+        data = {
+            "status": 1,
+            "message": (
+                "Reset your password successfully. You can login your account now!"
+            ),
+        }
+        return render_response(request, data)
 
 
-# class UsersListView(generics.ListAPIView):
-#     permission_classes = [IsAuthenticated]
-#     queryset = User.objects.all()
-#     serializer_class = UserSerializer
-#     filter_backends = [filters.SearchFilter]
-#     search_fields = ["email", "first_name", "last_name"]
-
-#     def get_queryset(self):
-#         user = self.request.user
-#         friends_queries = Friend.objects.filter(status=True).filter(
-#             Q(requestID=user.id) | Q(responseID=user.id)
-#         )
-#         friend = [user.id]
-#         for friend_query in friends_queries:
-#             if friend_query.responseID == user:
-#                 friend.append(friend_query.requestID.id)
-#             if friend_query.requestID == user:
-#                 friend.append(friend_query.responseID.id)
-#         return self.queryset.exclude(id__in=friend)
-
-
-# class FollowUserView(APIView):
-#     permission_classes = [IsAuthenticated]
+class UsersListView(generics.ListAPIView):
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    serializer_class = UserSummarySerializer
+    pagination_class = UserSearchPagination
 
-#     def post(self, request, format=None):
-#         userId = request.data.get("userId", None)
-#         try:
-#             user = User.objects.get(pk=userId)
-#             request.user.follow.add(user)
-#             return Response(
-#                 data={"status": "200", "message": "OK"}, status=status.HTTP_200_OK
-#             )
-#         except User.DoesNotExist:
-#             return Response(
-#                 data={"status": "404", "message": "NOT_FOUND"},
-#                 status=status.HTTP_404_NOT_FOUND,
-#             )
+    def get_queryset(self):
+        return search_users(self.request.user.pk, self.query).using(self.using)
+
+    def list(self, request, *args, **kwargs):
+        self.query = request.query_params.get("search", "").strip()
+        if len(self.query) < MIN_QUERY_LENGTH:
+            return Response(
+                data={
+                    "status": "400",
+                    "message": "Search needs at least %d characters!" % MIN_QUERY_LENGTH,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        # The timeout is set on the connection the search runs on, which may
+        # be a replica.
+        self.using = router.db_for_read(User)
+        try:
+            with transaction.atomic(using=self.using):
+                set_search_timeout(self.using)
+                return super().list(request, *args, **kwargs)
+        except OperationalError as exc:
+            if not is_query_canceled(exc):
+                raise
+            return Response(
+                data={"status": "503", "message": "Search took too long!"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
 
 
-# class UnFollowUserView(APIView):
-#     permission_classes = [IsAuthenticated]
+class FollowUserView(APIView):
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
 
-#     def post(self, request, format=None):
-#         userId = request.data.get("userId", None)
-#         try:
-#             user = User.objects.get(pk=userId)
-#             request.user.follow.remove(user)
-#             return Response(
-#                 data={"status": "200", "message": "OK"}, status=status.HTTP_200_OK
-#             )
-#         except User.DoesNotExist:
-#             return Response(
-#                 data={"status": "404", "message": "NOT_FOUND"},
-#                 status=status.HTTP_404_NOT_FOUND,
-#             )
+    def post(self, request, format=None):
+        userId = request.data.get("userId", None)
+        try:
+            user = User.objects.only("id").get(pk=userId)
+        except (User.DoesNotExist, ValueError):
+            return Response(
+                data={"status": "404", "message": "NOT_FOUND"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        if user.pk == request.user.pk:
+            return Response(
+                data={"status": "400", "message": "You can not follow yourself!"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        follow(request.user, user)
+        return Response(
+            data={"status": "200", "message": "OK"}, status=status.HTTP_200_OK
+        )
 
 
-# class FollowUserRetrieveView(generics.RetrieveAPIView):
-#     permission_classes = [IsAuthenticated]
-#     queryset = User.objects.all()
-#     serializer_class = FollowUserSerializer
-#     lookup_field = "pk"
+class UnFollowUserView(APIView):
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, format=None):
+        userId = request.data.get("userId", None)
+        try:
+            user = User.objects.only("id").get(pk=userId)
+        except (User.DoesNotExist, ValueError):
+            return Response(
+                data={"status": "404", "message": "NOT_FOUND"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        unfollow(request.user, user)
+        return Response(
+            data={"status": "200", "message": "OK"}, status=status.HTTP_200_OK
+        )
+
+
+class FollowersListView(generics.ListAPIView):
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    serializer_class = UserSummarySerializer
+    pagination_class = FollowPagination
+
+    def get_queryset(self):
+        return User.objects.filter(following_edges__followee=self.kwargs["pk"]).annotate(
+            followed_at=F("following_edges__created"), edge_id=F("following_edges__id")
+        )
+
+
+class FollowingListView(generics.ListAPIView):
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    serializer_class = UserSummarySerializer
+    pagination_class = FollowPagination
+
+    def get_queryset(self):
+        return User.objects.filter(follower_edges__follower=self.kwargs["pk"]).annotate(
+            followed_at=F("follower_edges__created"), edge_id=F("follower_edges__id")
+        )
+
+
+class RelationshipsView(APIView):
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, format=None):
+        serializer = UserIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data["ids"]))
+        return Response(relationships(request.user.pk, ids), status=status.HTTP_200_OK)
+
+
+class OnlineStatusView(APIView):
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, format=None):
+        serializer = UserIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data["ids"]))
+        return Response(online_status(ids), status=status.HTTP_200_OK)
 
 
 # class MuteNotifyUserView(APIView):